@@ -1,4 +1,4 @@
-from flask import Flask
+from flask import Flask, Request, current_app
 from config import Config
 from dotenv import load_dotenv
 from flask_sqlalchemy import SQLAlchemy
@@ -13,13 +13,27 @@ migrate = Migrate()
 login_manager = LoginManager()
 jwt = JWTManager()
 
+class AppRequest(Request):
+    """Request with a larger body limit for the batch upload endpoint"""
+    
+    @property
+    def max_content_length(self):
+        if self.endpoint == 'api.upload_document_batch':
+            return current_app.config['BATCH_MAX_CONTENT_LENGTH']
+        return super().max_content_length
+
 def create_app():
     # Load environment variables
     load_dotenv()
     
     app = Flask(__name__)
+    app.request_class = AppRequest
     app.config.from_object(Config)
     
+    # Structured, queue-backed logging with per-request IDs
+    from app import log
+    log.init_app(app)
+    
     # Initialize extensions with app
     db.init_app(app)
     migrate.init_app(app, db)
@@ -27,13 +41,18 @@ def create_app():
     jwt.init_app(app)
     
     # Ensure upload directory exists
-    os.makedirs(os.path.join(app.static_folder, 'uploads'), exist_ok=True)
+    os.makedirs(app.config['UPLOAD_FOLDER'], exist_ok=True)
     
     # Import models and routes
     from app.models import User, Document, Conversation, Message
     from app.routes.auth import auth
     from app.routes.main import main
     from app.routes.api import api
+    from app.models.ingestion_queue import ingestion_queue
+    from app.models.session_cache import session_cache
+    from app.models.answer_cache import answer_cache
+    from app.models.semantic_cache import semantic_cache
+    from app.models.metrics import metrics
     
     # Set up login manager configuration
     login_manager.login_view = 'auth.login'
@@ -60,4 +79,13 @@ def create_app():
     app.register_blueprint(auth)
     app.register_blueprint(api, url_prefix='/api')
     
+    # Bound the memory used by loaded AI sessions
+    session_cache.init_app(app)
+    answer_cache.init_app(app)
+    semantic_cache.init_app(app)
+    metrics.init_app(app)
+    
+    # Start background PDF processing
+    ingestion_queue.init_app(app)
+    
     return app
\ No newline at end of file
@@ -0,0 +1,33 @@
+from sqlalchemy.ext.asyncio import create_async_engine, async_sessionmaker
+
+# Sync driver prefix -> async driver used by the ASGI serving path
+ASYNC_DRIVERS = {
+    'mysql+pymysql': 'mysql+aiomysql',
+    'mysql': 'mysql+aiomysql',
+    'sqlite': 'sqlite+aiosqlite',
+    'postgresql': 'postgresql+asyncpg',
+    'postgresql+psycopg2': 'postgresql+asyncpg'
+}
+
+
+def get_async_database_uri(database_uri):
+    """Translate a sync SQLAlchemy URI to the matching async driver"""
+    scheme, separator, rest = database_uri.partition('://')
+    if scheme not in ASYNC_DRIVERS:
+        raise ValueError(f"No async driver configured for {scheme}")
+    return ASYNC_DRIVERS[scheme] + separator + rest
+
+
+def create_async_session_factory(app):
+    """Create an AsyncSession factory for the app's database (same tables as db.session)"""
+    database_uri = app.config.get('ASYNC_SQLALCHEMY_DATABASE_URI') or \
+        get_async_database_uri(app.config['SQLALCHEMY_DATABASE_URI'])
+
+    engine_options = {'pool_pre_ping': True}
+    if not database_uri.startswith('sqlite'):
+        engine_options['pool_size'] = app.config.get('ASYNC_DB_POOL_SIZE', 10)
+        engine_options['pool_recycle'] = 3600
+
+    engine = create_async_engine(database_uri, **engine_options)
+    # Objects stay usable after commit; handlers return them straight to the client
+    return async_sessionmaker(engine, expire_on_commit=False)
@@ -0,0 +1,136 @@
+"""
+Structured logging for the app.
+
+Records from every `app.*` logger go through a QueueHandler, so a request
+thread only appends to an in-memory queue; a single listener thread formats
+them (JSON lines by default) and writes them to stdout. Every record carries
+the request ID of the request that produced it, taken from the X-Request-ID
+header or generated, and echoed back in the response.
+"""
+import atexit
+import contextvars
+import json
+import logging
+import logging.handlers
+import queue
+import sys
+import uuid
+
+REQUEST_ID_HEADER = 'X-Request-ID'
+
+# Set per request; context variables follow both request threads and asyncio tasks
+request_id_var = contextvars.ContextVar('request_id', default='-')
+
+# LogRecord attributes that are not user-supplied `extra` fields
+STANDARD_ATTRIBUTES = set(logging.LogRecord('', 0, '', 0, '', (), None).__dict__) | {'message', 'asctime', 'request_id'}
+
+_listener = None
+
+
+class RequestIdFilter(logging.Filter):
+    def filter(self, record):
+        record.request_id = request_id_var.get()
+        return True
+
+
+class JsonFormatter(logging.Formatter):
+    """One JSON object per line; `extra` fields passed to the logger become keys"""
+
+    def format(self, record):
+        entry = {
+            'time': self.formatTime(record, '%Y-%m-%dT%H:%M:%S'),
+            'level': record.levelname,
+            'logger': record.name,
+            'request_id': getattr(record, 'request_id', '-'),
+            'message': record.getMessage()
+        }
+        for key, value in record.__dict__.items():
+            if key not in STANDARD_ATTRIBUTES and not key.startswith('_'):
+                entry[key] = value
+        if record.exc_info:
+            entry['exception'] = self.formatException(record.exc_info)
+        return json.dumps(entry, default=str, ensure_ascii=False)
+
+
+def new_request_id(incoming=None):
+    """Use the caller's request ID when it looks sane, otherwise generate one"""
+    if incoming and len(incoming) <= 128 and incoming.isprintable():
+        return incoming
+    return uuid.uuid4().hex
+
+
+def configure_logging(level='INFO', log_format='json', stream=None):
+    """Send `app.*` logs through a queue to one writer thread; safe to call more than once"""
+    global _listener
+    logger = logging.getLogger('app')
+    logger.setLevel(level)
+
+    if _listener is None:
+        handler = logging.StreamHandler(stream or sys.stdout)
+        if log_format == 'json':
+            handler.setFormatter(JsonFormatter())
+        else:
+            handler.setFormatter(logging.Formatter(
+                '%(asctime)s %(levelname)s [%(request_id)s] %(name)s: %(message)s'))
+
+        log_queue = queue.SimpleQueue()
+        queue_handler = logging.handlers.QueueHandler(log_queue)
+        # The request ID must be read on the logging thread, before the record is queued
+        queue_handler.addFilter(RequestIdFilter())
+
+        _listener = logging.handlers.QueueListener(log_queue, handler)
+        _listener.start()
+        atexit.register(_listener.stop)
+
+        logger.handlers = [queue_handler]
+        logger.propagate = False
+    return logger
+
+
+def init_app(app):
+    from flask import request, g
+    from flask.logging import default_handler
+
+    configure_logging(app.config.get('LOG_LEVEL', 'INFO'), app.config.get('LOG_FORMAT', 'json'))
+    # The Flask app logger is also named 'app'; don't write its records twice
+    app.logger.removeHandler(default_handler)
+
+    @app.before_request
+    def assign_request_id():
+        g.request_id = new_request_id(request.headers.get(REQUEST_ID_HEADER))
+        request_id_var.set(g.request_id)
+
+    @app.after_request
+    def echo_request_id(response):
+        request_id = g.get('request_id')
+        if request_id:
+            response.headers[REQUEST_ID_HEADER] = request_id
+        return response
+
+
+class RequestIdMiddleware:
+    """ASGI middleware doing the same for the async routes; the ID is passed on to the mounted Flask app"""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope['type'] != 'http':
+            return await self.app(scope, receive, send)
+
+        header_name = REQUEST_ID_HEADER.lower().encode('latin-1')
+        headers = [(name, value) for name, value in scope['headers'] if name != header_name]
+        incoming = dict(scope['headers']).get(header_name, b'').decode('latin-1')
+        request_id = new_request_id(incoming)
+        request_id_var.set(request_id)
+        encoded = request_id.encode('latin-1')
+        scope = dict(scope, headers=headers + [(header_name, encoded)])
+
+        async def send_with_request_id(message):
+            if message['type'] == 'http.response.start':
+                response_headers = [(name, value) for name, value in message.get('headers', [])
+                                    if name.lower() != header_name]
+                message = dict(message, headers=response_headers + [(header_name, encoded)])
+            await send(message)
+
+        return await self.app(scope, receive, send_with_request_id)
@@ -0,0 +1,89 @@
+from collections import OrderedDict
+import re
+import threading
+import time
+
+
+class AnswerCache:
+    """
+    In-process cache of AI answers per document, keyed by normalized question text.
+
+    Only answers that depend on nothing but the document and the question
+    are cached: fallback-mode answers, and LangChain answers to the first
+    question of a session (follow-ups are rewritten using chat history).
+    Entries are keyed by Document.index_key, so documents sharing content
+    share answers, and carry the version of the index they were answered
+    from (IndexStore.version); a lookup with another version misses, so an
+    index rebuilt by any worker retires its answers in every worker. They
+    expire after ttl seconds, the least recently used are dropped above
+    max_entries, and invalidate() drops a document's entries at once.
+    """
+
+    def __init__(self, max_entries=5000, ttl=24 * 60 * 60):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.entries = OrderedDict()  # (document_key, question) -> (entry, stored_at)
+        self.hits = 0
+        self.misses = 0
+        self.invalidations = 0
+        self._lock = threading.Lock()
+
+    def init_app(self, app):
+        self.max_entries = app.config.get('ANSWER_CACHE_MAX_ENTRIES', self.max_entries)
+        self.ttl = app.config.get('ANSWER_CACHE_TTL_SECONDS', self.ttl)
+
+    @staticmethod
+    def normalize_question(question):
+        """Lowercase, drop punctuation and collapse whitespace so trivial variations share an entry"""
+        return ' '.join(re.sub(r'[^\w\s]', ' ', question.lower()).split())
+
+    def get(self, document_key, question, version=None):
+        """Return the cached {'answer', 'chunk_ids'} for a question on this index version, or None"""
+        key = (document_key, self.normalize_question(question))
+        with self._lock:
+            item = self.entries.get(key)
+            if item is not None and (item[0]['version'] != version or time.monotonic() - item[1] > self.ttl):
+                del self.entries[key]
+                item = None
+            if item is None:
+                self.misses += 1
+                return None
+            self.entries.move_to_end(key)
+            self.hits += 1
+            return item[0]
+
+    def set(self, document_key, question, answer, chunk_ids=None, version=None):
+        key = (document_key, self.normalize_question(question))
+        with self._lock:
+            self.entries[key] = ({'answer': answer, 'chunk_ids': list(chunk_ids or []), 'version': version},
+                                 time.monotonic())
+            self.entries.move_to_end(key)
+            while len(self.entries) > self.max_entries:
+                self.entries.popitem(last=False)
+
+    def invalidate(self, document_key):
+        """Drop every cached answer for a document"""
+        with self._lock:
+            stale = [key for key in self.entries if key[0] == document_key]
+            for key in stale:
+                del self.entries[key]
+            if stale:
+                self.invalidations += 1
+
+    def clear(self):
+        with self._lock:
+            self.entries.clear()
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'entries': len(self.entries),
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_rate': round(self.hits / lookups, 4) if lookups else 0.0,
+                'invalidations': self.invalidations
+            }
+
+
+answer_cache = AnswerCache()
@@ -0,0 +1,70 @@
+import mmap
+import os
+
+import numpy as np
+
+BLOB_FILENAME = 'chunks.bin'
+OFFSETS_FILENAME = 'chunk_offsets.npy'
+
+
+class ChunkStore:
+    """
+    Read-only sequence of chunk texts backed by files in an index directory.
+
+    The texts are stored as one contiguous UTF-8 blob (chunks.bin) plus the
+    byte offset of every chunk boundary (chunk_offsets.npy), and both are
+    opened with mmap. Every worker process maps the same physical pages from
+    the page cache, and a chunk only becomes a Python str when it is indexed,
+    e.g. for the top-k results of a search.
+    """
+
+    def __init__(self, blob, offsets):
+        self.blob = blob
+        self.offsets = offsets
+
+    @staticmethod
+    def write(directory, chunks):
+        """Write chunks (any iterable of str) to directory, one chunk at a time"""
+        offsets = [0]
+        with open(os.path.join(directory, BLOB_FILENAME), 'wb') as f:
+            for chunk in chunks:
+                data = chunk.encode('utf-8')
+                f.write(data)
+                offsets.append(offsets[-1] + len(data))
+        np.save(os.path.join(directory, OFFSETS_FILENAME), np.array(offsets, dtype=np.uint64))
+
+    @staticmethod
+    def exists(directory):
+        return os.path.exists(os.path.join(directory, OFFSETS_FILENAME))
+
+    @classmethod
+    def open(cls, directory):
+        offsets = np.load(os.path.join(directory, OFFSETS_FILENAME), mmap_mode='r')
+        with open(os.path.join(directory, BLOB_FILENAME), 'rb') as f:
+            # mmap refuses empty files; a document without text has no chunks to map
+            if os.fstat(f.fileno()).st_size == 0:
+                return cls(b'', offsets)
+            # The mapping stays valid after the file is closed, or replaced by a newer index
+            blob = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        return cls(blob, offsets)
+
+    def __len__(self):
+        return len(self.offsets) - 1
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return [self[i] for i in range(*index.indices(len(self)))]
+        if index < 0:
+            index += len(self)
+        if not 0 <= index < len(self):
+            raise IndexError('chunk index out of range')
+        return self.blob[int(self.offsets[index]):int(self.offsets[index + 1])].decode('utf-8')
+
+    def __iter__(self):
+        for index in range(len(self)):
+            yield self[index]
+
+    @property
+    def nbytes(self):
+        """Size of the mapped files; shared page cache rather than per-worker heap"""
+        return len(self.blob) + self.offsets.nbytes
@@ -3,13 +3,18 @@ from datetime import datetime, timezone
 
 class Conversation(db.Model):
     __tablename__ = 'conversations'
+    __table_args__ = (
+        db.Index('ix_conversations_user_id_updated_at', 'user_id', 'updated_at', 'id'),
+    )
     
     id = db.Column(db.BigInteger, primary_key=True, autoincrement=True)
     user_id = db.Column(db.BigInteger, db.ForeignKey('users.id'), nullable=False)
-    document_id = db.Column(db.BigInteger, db.ForeignKey('documents.id'), nullable=False)
+    document_id = db.Column(db.BigInteger, db.ForeignKey('documents.id'), nullable=False, index=True)
     title = db.Column(db.String(255), nullable=False, default='New Conversation')
-    created_at = db.Column(db.DateTime, default=datetime.now(timezone.utc))
-    updated_at = db.Column(db.DateTime, default=datetime.now(timezone.utc), onupdate=datetime.now(timezone.utc))
+    created_at = db.Column(db.DateTime, nullable=False, default=lambda: datetime.now(timezone.utc))
+    # Sort key of the conversation listing and its keyset cursors, so never NULL
+    updated_at = db.Column(db.DateTime, nullable=False, default=lambda: datetime.now(timezone.utc),
+                           onupdate=lambda: datetime.now(timezone.utc))
     is_active = db.Column(db.Boolean, default=True)
     
     # Relationships
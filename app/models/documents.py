@@ -3,6 +3,9 @@ from datetime import datetime, timezone
 
 class Document(db.Model):
     __tablename__ = 'documents'
+    __table_args__ = (
+        db.Index('ix_documents_user_id_upload_date', 'user_id', 'upload_date', 'id'),
+    )
 
     id = db.Column(db.BigInteger, primary_key=True, autoincrement=True)
     user_id = db.Column(db.BigInteger, db.ForeignKey('users.id'), nullable=False)
@@ -11,13 +14,24 @@ class Document(db.Model):
     file_path = db.Column(db.String(255), nullable=False)
     file_size = db.Column(db.Integer, nullable=False)  # Size in bytes
     mime_type = db.Column(db.String(100), nullable=False, default='application/pdf')
-    upload_date = db.Column(db.DateTime, default=datetime.now(timezone.utc))
+    upload_date = db.Column(db.DateTime, default=lambda: datetime.now(timezone.utc))
     processed = db.Column(db.Boolean, default=False)
-    session_id = db.Column(db.String(100), nullable=True)  # For API access
+    status = db.Column(db.String(20), nullable=False, default='pending', index=True)  # pending, queued, processing, ready, failed
+    progress = db.Column(db.Integer, nullable=False, default=0)  # Ingestion progress in percent
+    processing_error = db.Column(db.Text, nullable=True)
+    status_updated_at = db.Column(db.DateTime, nullable=True)
+    session_id = db.Column(db.String(100), nullable=True, index=True)  # For API access
     page_count = db.Column(db.Integer, nullable=True)
+    content_hash = db.Column(db.String(64), nullable=True, index=True)  # SHA-256 of the file, shared by duplicate uploads
+    batch_id = db.Column(db.String(36), nullable=True, index=True)  # Set on documents uploaded together through /api/documents/batch
     
     # Relationships
     user = db.relationship('User', backref=db.backref('documents', lazy=True))
     
+    @property
+    def index_key(self):
+        """Key of the persisted index; documents with the same content share one index"""
+        return self.content_hash or self.session_id
+    
     def __repr__(self):
         return f"<Document {self.filename} (User: {self.user_id})>"
\ No newline at end of file
@@ -0,0 +1,341 @@
+from array import array
+from functools import lru_cache
+import hashlib
+import math
+import os
+import re
+import sqlite3
+import threading
+import time
+
+from app.models.embedding_scheduler import ScheduledEmbeddings, get_embedding_scheduler
+
+# LangChain's vectorstores expect an Embeddings instance; the base class is optional
+try:
+    from langchain.embeddings.base import Embeddings
+except ImportError:
+    Embeddings = object
+
+_caches = {}
+_caches_lock = threading.Lock()
+_local_models = {}
+
+# Default CPU model for the 'huggingface' backend (needs sentence-transformers)
+DEFAULT_LOCAL_EMBEDDING_MODEL = 'sentence-transformers/all-MiniLM-L6-v2'
+
+
+class FakeEmbeddings(Embeddings):
+    """
+    Deterministic local embedder for tests and offline development.
+
+    Vectors are derived from a SHA-256 of the text, so the same text always
+    gets the same vector and no network access is needed. They carry no
+    meaning beyond identity.
+    """
+
+    def __init__(self, size=64):
+        self.size = size
+        self.model = f"fake-{size}"
+        self.calls = 0
+
+    def _embed(self, text):
+        values = []
+        counter = 0
+        while len(values) < self.size:
+            block = hashlib.sha256(f"{counter}:{text}".encode('utf-8')).digest()
+            values.extend(byte / 127.5 - 1.0 for byte in block)
+            counter += 1
+        return values[:self.size]
+
+    def embed_documents(self, texts):
+        self.calls += 1
+        return [self._embed(text) for text in texts]
+
+    def embed_query(self, text):
+        return self._embed(text)
+
+
+@lru_cache(maxsize=200000)
+def hash_feature(feature, size):
+    """(bucket, sign) of a hashing-embedder feature; chunks share most of their words, so each is hashed once"""
+    digest = hashlib.blake2b(feature.encode('utf-8'), digest_size=8).digest()
+    return int.from_bytes(digest[:4], 'little') % size, 1.0 if digest[4] & 1 else -1.0
+
+
+class HashingEmbeddings(Embeddings):
+    """
+    Local embedder using the hashing trick over words and character trigrams.
+
+    No model and no network: each feature is hashed (stably, across
+    processes) into one of `size` signed buckets and the vector is L2
+    normalized, so cosine similarity measures shared wording. Good enough
+    for near-duplicate questions and for tests; it does not understand
+    synonyms.
+    """
+
+    def __init__(self, size=512):
+        self.size = size
+        self.model = f"hashing-{size}"
+
+    def _features(self, text):
+        words = re.findall(r'\w+', text.lower())
+        for word in words:
+            yield word, 1.0
+            padded = f"#{word}#"
+            for i in range(len(padded) - 2):
+                yield padded[i:i + 3], 0.5
+
+    def _embed(self, text):
+        vector = [0.0] * self.size
+        for feature, weight in self._features(text):
+            bucket, sign = hash_feature(feature, self.size)
+            vector[bucket] += sign * weight
+        norm = math.sqrt(sum(value * value for value in vector))
+        return [value / norm for value in vector] if norm else vector
+
+    def embed_documents(self, texts):
+        return [self._embed(text) for text in texts]
+
+    def embed_query(self, text):
+        return self._embed(text)
+
+
+class EmbeddingCache:
+    """
+    Persistent embedding cache in a local SQLite file.
+
+    Vectors are stored as float32 blobs keyed by a SHA-256 of the model name
+    and the chunk text, so re-processing a document (or another document
+    sharing paragraphs) skips the embedding API for chunks seen before. The
+    file is bounded by max_bytes; the least recently used vectors are evicted
+    first. SQLite handles locking between gunicorn workers. Triggers keep the
+    total size in a one-row table, so checking the budget never scans the cache.
+    """
+
+    def __init__(self, path, max_bytes=512 * 1024 * 1024):
+        self.path = path
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        conn = self._connect()
+        try:
+            conn.isolation_level = None
+            conn.execute("PRAGMA journal_mode=WAL")
+            # One transaction, so no worker writes vectors between the size being counted and the triggers existing
+            conn.execute("BEGIN IMMEDIATE")
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS embeddings (
+                    key TEXT PRIMARY KEY,
+                    vector BLOB NOT NULL,
+                    last_used REAL NOT NULL
+                )
+            """)
+            conn.execute("CREATE INDEX IF NOT EXISTS ix_embeddings_last_used ON embeddings (last_used)")
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS cache_size (
+                    id INTEGER PRIMARY KEY CHECK (id = 0),
+                    entries INTEGER NOT NULL,
+                    bytes INTEGER NOT NULL
+                )
+            """)
+            # Counted once, for cache files written before the size table existed
+            conn.execute("""
+                INSERT OR IGNORE INTO cache_size (id, entries, bytes)
+                SELECT 0, COUNT(*), COALESCE(SUM(LENGTH(vector)), 0) FROM embeddings
+            """)
+            conn.execute("""
+                CREATE TRIGGER IF NOT EXISTS embeddings_size_insert AFTER INSERT ON embeddings BEGIN
+                    UPDATE cache_size SET entries = entries + 1, bytes = bytes + LENGTH(NEW.vector) WHERE id = 0;
+                END
+            """)
+            conn.execute("""
+                CREATE TRIGGER IF NOT EXISTS embeddings_size_update AFTER UPDATE OF vector ON embeddings BEGIN
+                    UPDATE cache_size SET bytes = bytes + LENGTH(NEW.vector) - LENGTH(OLD.vector) WHERE id = 0;
+                END
+            """)
+            conn.execute("""
+                CREATE TRIGGER IF NOT EXISTS embeddings_size_delete AFTER DELETE ON embeddings BEGIN
+                    UPDATE cache_size SET entries = entries - 1, bytes = bytes - LENGTH(OLD.vector) WHERE id = 0;
+                END
+            """)
+            conn.execute("COMMIT")
+        finally:
+            conn.close()
+
+    def _connect(self):
+        # One short-lived connection per call keeps the cache safe to share between threads
+        return sqlite3.connect(self.path, timeout=30)
+
+    @staticmethod
+    def make_key(model_name, text):
+        """Cache key for one chunk embedded by one model"""
+        return hashlib.sha256(f"{model_name}\0{text}".encode('utf-8')).hexdigest()
+
+    def get_many(self, keys):
+        """Return {key: vector} for the keys present in the cache and mark them as used"""
+        found = {}
+        unique_keys = list(dict.fromkeys(keys))
+        with self._connect() as conn:
+            # Stay well below SQLite's bound-parameter limit
+            for start in range(0, len(unique_keys), 500):
+                batch = unique_keys[start:start + 500]
+                placeholders = ','.join('?' * len(batch))
+                rows = conn.execute(
+                    f"SELECT key, vector FROM embeddings WHERE key IN ({placeholders})", batch)
+                for key, blob in rows:
+                    found[key] = array('f', blob).tolist()
+            if found:
+                now = time.time()
+                conn.executemany("UPDATE embeddings SET last_used = ? WHERE key = ?",
+                                 [(now, key) for key in found])
+
+        with self._lock:
+            self.hits += sum(1 for key in keys if key in found)
+            self.misses += sum(1 for key in keys if key not in found)
+        return found
+
+    def put_many(self, items):
+        """Store (key, vector) pairs, then evict old entries if the cache is over budget"""
+        now = time.time()
+        rows = [(key, array('f', vector).tobytes(), now) for key, vector in items]
+        if not rows:
+            return
+        with self._connect() as conn:
+            # An upsert rather than INSERT OR REPLACE, whose implicit delete would skip the size trigger
+            conn.executemany("""
+                INSERT INTO embeddings (key, vector, last_used) VALUES (?, ?, ?)
+                ON CONFLICT (key) DO UPDATE SET vector = excluded.vector, last_used = excluded.last_used
+            """, rows)
+            self._evict(conn)
+
+    def _evict(self, conn):
+        total = conn.execute("SELECT bytes FROM cache_size WHERE id = 0").fetchone()[0]
+        excess = total - self.max_bytes
+        if excess <= 0:
+            return
+
+        evicted = []
+        for key, size in conn.execute("SELECT key, LENGTH(vector) FROM embeddings ORDER BY last_used"):
+            evicted.append((key,))
+            excess -= size
+            if excess <= 0:
+                break
+        conn.executemany("DELETE FROM embeddings WHERE key = ?", evicted)
+
+    def stats(self):
+        """Hit/miss counters for this process plus the size of the shared cache"""
+        with self._connect() as conn:
+            entries, size = conn.execute("SELECT entries, bytes FROM cache_size WHERE id = 0").fetchone()
+        with self._lock:
+            return {
+                'hits': self.hits,
+                'misses': self.misses,
+                'entries': entries,
+                'bytes': size,
+                'max_bytes': self.max_bytes
+            }
+
+
+class CachedEmbeddings(Embeddings):
+    """Embeddings wrapper that serves document embeddings from an EmbeddingCache"""
+
+    def __init__(self, embedder, cache, model_name=None):
+        self.embedder = embedder
+        self.cache = cache
+        self.model_name = model_name or get_embedding_model_name(embedder)
+
+    def embed_documents(self, texts):
+        keys = [EmbeddingCache.make_key(self.model_name, text) for text in texts]
+        vectors = self.cache.get_many(keys)
+
+        # Embed each missing text once, even if it repeats within the batch
+        missing = {}
+        for key, text in zip(keys, texts):
+            if key not in vectors:
+                missing.setdefault(key, text)
+        if missing:
+            new_vectors = self.embedder.embed_documents(list(missing.values()))
+            new_items = list(zip(missing.keys(), new_vectors))
+            self.cache.put_many(new_items)
+            vectors.update(new_items)
+
+        return [vectors[key] for key in keys]
+
+    def embed_query(self, text):
+        # Questions rarely repeat verbatim, so queries go straight to the model
+        return self.embedder.embed_query(text)
+
+
+def get_embedding_cache(app=None):
+    """Return the EmbeddingCache configured for the current Flask app (one per file per process)"""
+    if app is None:
+        from flask import current_app
+        app = current_app
+    path = app.config['EMBEDDING_CACHE_PATH']
+    with _caches_lock:
+        if path not in _caches:
+            _caches[path] = EmbeddingCache(path, max_bytes=app.config.get('EMBEDDING_CACHE_MAX_BYTES',
+                                                                          512 * 1024 * 1024))
+        return _caches[path]
+
+
+def get_local_model_embeddings(model_name):
+    """A sentence-transformers model run on the CPU, loaded once per process"""
+    with _caches_lock:
+        if model_name not in _local_models:
+            try:
+                from langchain.embeddings import HuggingFaceEmbeddings
+                embedder = HuggingFaceEmbeddings(model_name=model_name)
+            except ImportError as e:
+                raise ValueError(f"Local embedding model needs sentence-transformers: {str(e)}")
+            _local_models[model_name] = embedder
+        return _local_models[model_name]
+
+
+def get_embedding_backend(app=None):
+    """
+    The configured embedding backend. 'auto' uses OpenAI when an API key is
+    set and the local hashing embedder otherwise, so deployments without
+    network access still get semantic retrieval.
+    """
+    backend = (app.config.get('EMBEDDING_BACKEND') if app else None) or os.getenv('EMBEDDING_BACKEND', 'auto')
+    if backend == 'auto':
+        return 'openai' if os.getenv('OPENAI_API_KEY') else 'hashing'
+    return backend
+
+
+def get_embedding_model_name(embedder):
+    """Name identifying the vectors an embedder produces (stored with each index)"""
+    return getattr(embedder, 'model_name', None) or getattr(embedder, 'model', None) or type(embedder).__name__
+
+
+def get_embedder(app=None):
+    """Return the configured embedder, wrapped in the embedding cache when it is enabled"""
+    if app is None:
+        from flask import current_app, has_app_context
+        app = current_app if has_app_context() else None
+
+    backend = get_embedding_backend(app)
+    config = app.config if app else {}
+    if backend == 'fake':
+        embedder = FakeEmbeddings()
+    elif backend == 'hashing':
+        embedder = HashingEmbeddings(size=config.get('HASHING_EMBEDDING_SIZE', 768))
+    elif backend == 'huggingface':
+        embedder = get_local_model_embeddings(config.get('LOCAL_EMBEDDING_MODEL', DEFAULT_LOCAL_EMBEDDING_MODEL))
+    elif backend == 'openai':
+        if not os.getenv('OPENAI_API_KEY'):
+            raise ValueError("OpenAI API key not found. Please set OPENAI_API_KEY environment variable.")
+        # Token-budgeted batches sent concurrently, backing off on rate limits
+        embedder = ScheduledEmbeddings(get_embedding_scheduler(app))
+    else:
+        raise ValueError(f"Unknown embedding backend: {backend}")
+
+    if app is None or not app.config.get('EMBEDDING_CACHE_ENABLED', True):
+        return embedder
+    return CachedEmbeddings(embedder, get_embedding_cache(app))
@@ -0,0 +1,249 @@
+from concurrent.futures import ThreadPoolExecutor
+import json
+import logging
+import os
+import random
+import threading
+import time
+import urllib.error
+import urllib.request
+
+# LangChain's vectorstores expect an Embeddings instance; the base class is optional
+try:
+    from langchain.embeddings.base import Embeddings
+except ImportError:
+    Embeddings = object
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_EMBEDDING_MODEL = 'text-embedding-ada-002'
+DEFAULT_API_BASE = 'https://api.openai.com/v1'
+
+_scheduler = None
+_scheduler_lock = threading.Lock()
+
+
+class EmbeddingAPIError(Exception):
+    """The embeddings API rejected a request; retrying will not help"""
+
+
+class RetryableEmbeddingError(Exception):
+    """A request failed in a way that may succeed later (server error, network)"""
+
+    def __init__(self, message, retry_after=None):
+        super().__init__(message)
+        self.retry_after = retry_after
+
+
+class RateLimitError(RetryableEmbeddingError):
+    """The embeddings API answered 429"""
+
+
+def get_token_counter(model):
+    """Return a function counting tokens for a model; falls back to ~4 characters per token"""
+    try:
+        import tiktoken
+        encoding = tiktoken.encoding_for_model(model)
+        return lambda text: len(encoding.encode(text, disallowed_special=()))
+    except Exception as e:
+        # tiktoken missing, unknown model, or its BPE files can't be downloaded
+        logger.warning("Token counting falls back to an estimate: %s", e)
+        return lambda text: len(text) // 4 + 1
+
+
+class OpenAIEmbeddingClient:
+    """Minimal client for the OpenAI-compatible /embeddings endpoint"""
+
+    def __init__(self, api_key, model=DEFAULT_EMBEDDING_MODEL, base_url=None, timeout=60):
+        self.api_key = api_key
+        self.model = model
+        self.base_url = (base_url or DEFAULT_API_BASE).rstrip('/')
+        self.timeout = timeout
+
+    def embed(self, texts):
+        """Embed a list of texts in one request, returning vectors in input order"""
+        request = urllib.request.Request(
+            f"{self.base_url}/embeddings",
+            data=json.dumps({'model': self.model, 'input': texts}).encode('utf-8'),
+            headers={
+                'Authorization': f"Bearer {self.api_key}",
+                'Content-Type': 'application/json'
+            },
+            method='POST'
+        )
+        try:
+            with urllib.request.urlopen(request, timeout=self.timeout) as response:
+                payload = json.load(response)
+        except urllib.error.HTTPError as e:
+            detail = e.read().decode('utf-8', 'replace')[:500]
+            retry_after = parse_retry_after(e.headers.get('Retry-After'))
+            if e.code == 429:
+                raise RateLimitError(f"Embeddings rate limited: {detail}", retry_after)
+            if e.code >= 500:
+                raise RetryableEmbeddingError(f"Embeddings server error {e.code}: {detail}", retry_after)
+            raise EmbeddingAPIError(f"Embeddings request failed ({e.code}): {detail}")
+        except (urllib.error.URLError, TimeoutError, ConnectionError) as e:
+            raise RetryableEmbeddingError(f"Embeddings request failed: {str(e)}")
+
+        data = sorted(payload['data'], key=lambda item: item['index'])
+        if len(data) != len(texts):
+            raise EmbeddingAPIError(f"Expected {len(texts)} embeddings, got {len(data)}")
+        return [item['embedding'] for item in data]
+
+
+def parse_retry_after(value):
+    """Seconds from a Retry-After header, or None"""
+    try:
+        return max(0.0, float(value))
+    except (TypeError, ValueError):
+        return None
+
+
+class EmbeddingScheduler:
+    """
+    Sends embedding requests in token-budgeted batches, several at a time.
+
+    Texts are packed in order into batches of at most max_batch_tokens
+    tokens (counted with tiktoken) and max_batch_inputs inputs. Up to
+    max_concurrency batches are in flight. Concurrency adapts to the API:
+    a rate-limit or server error halves the limit and pauses every sender
+    until the backoff (Retry-After, else exponential with jitter) expires;
+    each run of successes raises the limit by one again. The scheduler is
+    shared by all ingestion threads in the process, so they share one budget.
+    """
+
+    def __init__(self, client, max_batch_tokens=8000, max_batch_inputs=512, max_concurrency=4,
+                 max_retries=6, base_backoff=1.0, max_backoff=60.0, token_counter=None):
+        self.client = client
+        self.max_batch_tokens = max_batch_tokens
+        self.max_batch_inputs = max_batch_inputs
+        self.max_concurrency = max_concurrency
+        self.max_retries = max_retries
+        self.base_backoff = base_backoff
+        self.max_backoff = max_backoff
+        self.count_tokens = token_counter or get_token_counter(getattr(client, 'model', DEFAULT_EMBEDDING_MODEL))
+
+        self.limit = max_concurrency
+        self.active = 0
+        self.resume_at = 0.0
+        self.successes = 0
+        self.throttled = 0
+        self._cond = threading.Condition()
+        self._executor = ThreadPoolExecutor(max_workers=max_concurrency, thread_name_prefix='embedding')
+
+    def make_batches(self, texts):
+        """Pack texts, in order, into lists that fit the token and input budgets"""
+        batches = []
+        batch = []
+        batch_tokens = 0
+        for text in texts:
+            tokens = self.count_tokens(text)
+            if batch and (batch_tokens + tokens > self.max_batch_tokens or len(batch) >= self.max_batch_inputs):
+                batches.append(batch)
+                batch = []
+                batch_tokens = 0
+            batch.append(text)
+            batch_tokens += tokens
+        if batch:
+            batches.append(batch)
+        return batches
+
+    def embed(self, texts):
+        """Embed texts, returning one vector per text in input order"""
+        futures = [self._executor.submit(self._send, batch) for batch in self.make_batches(texts)]
+        vectors = []
+        try:
+            for future in futures:
+                vectors.extend(future.result())
+        except Exception:
+            for future in futures:
+                future.cancel()
+            raise
+        return vectors
+
+    def _send(self, batch):
+        for attempt in range(self.max_retries + 1):
+            self._acquire()
+            try:
+                vectors = self.client.embed(batch)
+            except RetryableEmbeddingError as e:
+                self._release(error=e, attempt=attempt)
+                if attempt == self.max_retries:
+                    raise
+                logger.warning("Embedding batch retry %d/%d: %s", attempt + 1, self.max_retries, e)
+                continue
+            except Exception:
+                self._release()
+                raise
+            self._release()
+            return vectors
+
+    def _acquire(self):
+        with self._cond:
+            while True:
+                wait = self.resume_at - time.monotonic()
+                if wait <= 0 and self.active < self.limit:
+                    self.active += 1
+                    return
+                self._cond.wait(timeout=wait if wait > 0 else None)
+
+    def _release(self, error=None, attempt=0):
+        with self._cond:
+            self.active -= 1
+            if error is None:
+                # Additive increase: one more slot after a full round of successes
+                self.successes += 1
+                if self.successes >= self.limit and self.limit < self.max_concurrency:
+                    self.limit += 1
+                    self.successes = 0
+            else:
+                # Multiplicative decrease, and every sender waits out the backoff
+                self.throttled += 1
+                self.successes = 0
+                self.limit = max(1, self.limit // 2)
+                delay = error.retry_after
+                if delay is None:
+                    delay = min(self.max_backoff, self.base_backoff * 2 ** attempt) * random.uniform(0.5, 1.0)
+                self.resume_at = max(self.resume_at, time.monotonic() + delay)
+            self._cond.notify_all()
+
+    def stats(self):
+        with self._cond:
+            return {
+                'limit': self.limit,
+                'active': self.active,
+                'throttled': self.throttled
+            }
+
+
+class ScheduledEmbeddings(Embeddings):
+    """LangChain-compatible embeddings backed by an EmbeddingScheduler"""
+
+    def __init__(self, scheduler):
+        self.scheduler = scheduler
+        self.model = scheduler.client.model
+
+    def embed_documents(self, texts):
+        return self.scheduler.embed(list(texts))
+
+    def embed_query(self, text):
+        return self.scheduler.embed([text])[0]
+
+
+def get_embedding_scheduler(app=None):
+    """Return the process-wide scheduler for the OpenAI embeddings API"""
+    global _scheduler
+    config = app.config if app is not None else {}
+    with _scheduler_lock:
+        if _scheduler is None:
+            client = OpenAIEmbeddingClient(
+                os.getenv('OPENAI_API_KEY'),
+                model=config.get('EMBEDDING_MODEL', DEFAULT_EMBEDDING_MODEL),
+                base_url=config.get('EMBEDDING_API_BASE') or os.getenv('OPENAI_API_BASE')
+            )
+            _scheduler = EmbeddingScheduler(
+                client,
+                max_batch_tokens=config.get('EMBEDDING_BATCH_TOKENS', 8000),
+                max_concurrency=config.get('EMBEDDING_MAX_CONCURRENCY', 4)
+            )
+        return _scheduler
@@ -0,0 +1,193 @@
+import json
+import os
+import shutil
+import uuid
+from contextlib import contextmanager
+from datetime import datetime, timezone
+
+import numpy as np
+
+from app.models.pdf_processor import LANGCHAIN_AVAILABLE, FAISS
+from app.models.embedding_cache import get_embedder, get_embedding_model_name
+from app.models.chunk_store import ChunkStore
+from app.models.term_matrix import TermChunkMatrix
+from app.models.keyword_index import KeywordIndex
+
+# fcntl is POSIX only; on Windows we rely on the atomic directory rename alone
+try:
+    import fcntl
+except ImportError:
+    fcntl = None
+
+# Bump whenever the on-disk layout changes; indexes with another version are rebuilt.
+# 2: chunk store and term_matrix.<name>.npy arrays (replacing chunks.json and term_matrix.npz)
+# 3: keyword_index.<name>.npy arrays (replacing the JSON keyword index)
+INDEX_FORMAT_VERSION = 3
+
+# Arrays of the search indexes, saved as <prefix>.<name>.npy files; the mapped ones are opened with mmap
+TERM_MATRIX_ARRAYS = ('vocabulary', 'offsets', 'chunk_ids', 'chunk_count')
+KEYWORD_INDEX_ARRAYS = ('vocabulary', 'offsets', 'postings', 'chunk_lengths')
+MAPPED_ARRAYS = ('offsets', 'chunk_ids', 'postings', 'chunk_lengths')
+
+
+def save_arrays(directory, prefix, arrays):
+    for name, array in arrays.items():
+        np.save(os.path.join(directory, f'{prefix}.{name}.npy'), array)
+
+
+def load_arrays(directory, prefix, names):
+    """The arrays written by save_arrays, or None if they are not stored"""
+    if not os.path.exists(os.path.join(directory, f'{prefix}.{names[0]}.npy')):
+        return None
+    return {name: np.load(os.path.join(directory, f'{prefix}.{name}.npy'),
+                          mmap_mode='r' if name in MAPPED_ARRAYS else None)
+            for name in names}
+
+
+class IndexStore:
+    """
+    Persistent on-disk store for processed document indexes.
+
+    Each index gets a directory named after its key (Document.index_key:
+    the content hash, or the session_id for documents uploaded before
+    deduplication) holding the chunk store, the keyword index (enhanced
+    mode), the term x chunk matrix (simple mode) and the FAISS index. Writes go to a temporary directory that is
+    renamed into place, so other gunicorn workers never observe a
+    half-written index. Chunk texts and posting arrays are loaded with
+    mmap, so workers share their pages instead of each holding a copy.
+    """
+
+    def __init__(self, root):
+        self.root = root
+        os.makedirs(self.root, exist_ok=True)
+
+    def path_for(self, key):
+        """Return the index directory for a key"""
+        # Keys are hashes or uuids we generated, but never trust them as a path
+        safe_key = os.path.basename(str(key))
+        return os.path.join(self.root, safe_key)
+
+    def _read_manifest(self, key):
+        """The manifest of a complete index in the current format, or None"""
+        try:
+            with open(os.path.join(self.path_for(key), 'manifest.json'), 'r', encoding='utf-8') as f:
+                manifest = json.load(f)
+        except (FileNotFoundError, json.JSONDecodeError):
+            return None
+        # Indexes written in an older layout count as missing and get rebuilt
+        if manifest.get('version') != INDEX_FORMAT_VERSION:
+            return None
+        return manifest
+
+    def exists(self, key):
+        """Check whether a complete index is stored for a key"""
+        return self._read_manifest(key) is not None
+
+    def version(self, key):
+        """Creation time of the stored index, which changes whenever it is rebuilt; None if not stored"""
+        manifest = self._read_manifest(key)
+        return manifest.get('created_at') if manifest else None
+
+    @contextmanager
+    def lock(self, key):
+        """Exclusive cross-process lock for writers of one key"""
+        lock_path = os.path.join(self.root, f".{os.path.basename(str(key))}.lock")
+        with open(lock_path, 'a') as lock_file:
+            if fcntl:
+                fcntl.flock(lock_file, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                if fcntl:
+                    fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+    def save(self, key, vectorstore):
+        """Serialize a vectorstore (FAISS or simple dict) under a key"""
+        target = self.path_for(key)
+        tmp_dir = os.path.join(self.root, f".tmp-{uuid.uuid4()}")
+        os.makedirs(tmp_dir)
+
+        try:
+            manifest = {
+                'version': INDEX_FORMAT_VERSION,
+                'created_at': datetime.now(timezone.utc).isoformat()
+            }
+
+            if isinstance(vectorstore, dict):
+                manifest['type'] = vectorstore.get('type', 'simple')
+                manifest['error'] = vectorstore.get('error')
+                ChunkStore.write(tmp_dir, vectorstore.get('chunks', []))
+                if vectorstore.get('keyword_index') is not None:
+                    save_arrays(tmp_dir, 'keyword_index', vectorstore['keyword_index'].to_arrays())
+                if vectorstore.get('term_matrix') is not None:
+                    save_arrays(tmp_dir, 'term_matrix', vectorstore['term_matrix'].to_arrays())
+            else:
+                # LangChain FAISS vectorstore keeps the chunk texts in its docstore
+                manifest['type'] = 'faiss'
+                # Queries must be embedded by the same model as the chunks
+                manifest['embedding_model'] = get_embedding_model_name(get_embedder())
+                vectorstore.save_local(os.path.join(tmp_dir, 'faiss'))
+
+            # The manifest is written last and marks the index as complete
+            with open(os.path.join(tmp_dir, 'manifest.json'), 'w', encoding='utf-8') as f:
+                json.dump(manifest, f)
+
+            with self.lock(key):
+                if os.path.exists(target):
+                    stale_dir = os.path.join(self.root, f".stale-{uuid.uuid4()}")
+                    os.replace(target, stale_dir)
+                    shutil.rmtree(stale_dir, ignore_errors=True)
+                os.replace(tmp_dir, target)
+        except Exception:
+            shutil.rmtree(tmp_dir, ignore_errors=True)
+            raise
+
+    def load(self, key):
+        """Load a stored vectorstore for a key, or None if not stored"""
+        path = self.path_for(key)
+        manifest = self._read_manifest(key)
+        if manifest is None:
+            return None
+
+        if manifest.get('type') == 'faiss':
+            if not LANGCHAIN_AVAILABLE:
+                return None
+            try:
+                embeddings = get_embedder()
+            except ValueError:
+                # Stored index needs the embedding model to answer queries
+                return None
+            if manifest.get('embedding_model') not in (None, get_embedding_model_name(embeddings)):
+                # Built with another embedding backend; the caller rebuilds it
+                return None
+            return FAISS.load_local(os.path.join(path, 'faiss'), embeddings)
+
+        vectorstore = {
+            'chunks': ChunkStore.open(path),
+            'type': manifest.get('type', 'simple'),
+            'error': manifest.get('error')
+        }
+
+        arrays = load_arrays(path, 'keyword_index', KEYWORD_INDEX_ARRAYS)
+        if arrays is not None:
+            vectorstore['keyword_index'] = KeywordIndex.from_arrays(arrays)
+
+        arrays = load_arrays(path, 'term_matrix', TERM_MATRIX_ARRAYS)
+        if arrays is not None:
+            vectorstore['term_matrix'] = TermChunkMatrix.from_arrays(arrays)
+
+        return vectorstore
+
+    def delete(self, key):
+        """Remove the stored index for a key (callers sharing a key hold lock(key))"""
+        path = self.path_for(key)
+        if os.path.exists(path):
+            shutil.rmtree(path, ignore_errors=True)
+
+
+def get_index_store(app=None):
+    """Return the IndexStore configured for the current Flask app"""
+    if app is None:
+        from flask import current_app
+        app = current_app
+    return IndexStore(app.config['INDEX_FOLDER'])
@@ -0,0 +1,258 @@
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timezone, timedelta
+import logging
+import threading
+import time
+
+from sqlalchemy import or_
+
+from app import db
+from app.models.documents import Document
+from app.models.pdf_processor import PDFProcessor
+from app.models.index_store import get_index_store
+from app.models.metrics import metrics, TimedIterator
+from app.log import request_id_var
+
+logger = logging.getLogger(__name__)
+
+# Document.status values
+STATUS_PENDING = 'pending'        # Not queued; processed lazily on first question
+STATUS_QUEUED = 'queued'
+STATUS_PROCESSING = 'processing'
+STATUS_READY = 'ready'
+STATUS_FAILED = 'failed'
+
+ACTIVE_STATUSES = (STATUS_QUEUED, STATUS_PROCESSING)
+
+
+def build_vectorstore(file_path, progress_callback=None):
+    """Run the PDF pipeline (extract, chunk, index) for a stored file"""
+    def report(progress):
+        if progress_callback:
+            progress_callback(progress)
+
+    def page_progress(page_number, total_pages):
+        # Pages stream through chunking and indexing, so extraction tracks 5-85% of the job
+        report(5 + int(80 * page_number / max(total_pages, 1)))
+
+    # Pages are chunked and indexed as they are extracted; the full text is never built
+    with open(file_path, 'rb') as pdf_file:
+        pages = TimedIterator(PDFProcessor.iter_pdf_pages(pdf_file, progress_callback=page_progress))
+        chunks = TimedIterator(PDFProcessor.iter_text_chunks(pages))
+        start = time.perf_counter()
+        vectorstore = PDFProcessor.get_vectorstore(chunks)
+        total = time.perf_counter() - start
+    # The stages are interleaved: each one's time is its own minus that of the stage feeding it
+    metrics.observe('chunking', chunks.seconds - pages.seconds)
+    metrics.observe('index_build', total - chunks.seconds)
+    report(90)
+    return vectorstore
+
+
+class IngestionQueue:
+    """
+    Local background queue that runs the PDFProcessor pipeline out of band.
+
+    The documents table is the queue: a job is a Document row with status
+    'queued'. Workers claim a job with a conditional UPDATE, so several
+    gunicorn workers can share the same rows without processing a document
+    twice. Progress is written back to Document.progress for polling.
+    """
+
+    def __init__(self, app=None):
+        self.app = None
+        self.executor = None
+        self.listeners = []
+        self._scheduled = set()  # Document ids submitted to this process's executor and not yet run
+        self._sweeper = None
+        self._lock = threading.Lock()
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        self.app = app
+        self.max_workers = app.config.get('INGESTION_WORKERS', 2)
+        self.stale_after = timedelta(seconds=app.config.get('INGESTION_STALE_SECONDS', 30 * 60))
+        self.sweep_interval = app.config.get('INGESTION_SWEEP_SECONDS', 5 * 60)
+
+        # The server entry points call recover_on_start(); CLI commands and scripts that
+        # build the app (flask db upgrade, benchmarks) must not start background jobs
+        if app.config.get('INGESTION_RECOVER_ON_START', False):
+            self.recover_on_start()
+
+    def recover_on_start(self):
+        """Re-schedule interrupted jobs when a serving process starts, then keep sweeping for abandoned ones"""
+        self._recover_safely()
+        with self._lock:
+            if self._sweeper is None and self.sweep_interval:
+                self._sweeper = threading.Thread(target=self._sweep, name='ingestion-sweeper', daemon=True)
+                self._sweeper.start()
+
+    def _recover_safely(self, stale_only=False):
+        try:
+            with self.app.app_context():
+                try:
+                    self.recover(stale_only)
+                finally:
+                    db.session.remove()
+        except Exception as e:
+            # Database may not be migrated yet
+            logger.warning("Ingestion queue recovery skipped: %s", e)
+
+    def _sweep(self):
+        """Requeue jobs of workers that died mid-job without waiting for a server restart"""
+        while True:
+            time.sleep(self.sweep_interval)
+            self._recover_safely(stale_only=True)
+
+    def on_processed(self, listener):
+        """Register a callback(document_id, session_id) run after a job finishes"""
+        self.listeners.append(listener)
+        return listener
+
+    def _get_executor(self):
+        with self._lock:
+            if self.executor is None:
+                self.executor = ThreadPoolExecutor(max_workers=self.max_workers,
+                                                   thread_name_prefix='ingestion')
+            return self.executor
+
+    def enqueue(self, document):
+        """Mark a document as queued and schedule it on the worker pool"""
+        document.status = STATUS_QUEUED
+        document.progress = 0
+        document.processing_error = None
+        document.status_updated_at = datetime.now(timezone.utc)
+        db.session.commit()
+        self.schedule([document.id])
+
+    def schedule(self, document_ids):
+        """Fan out jobs for documents already committed with status 'queued' over the worker pool"""
+        # The jobs log under the request ID of the upload that queued them
+        request_id = request_id_var.get()
+        executor = self._get_executor()
+        for document_id in document_ids:
+            with self._lock:
+                self._scheduled.add(document_id)
+            executor.submit(self._run, document_id, request_id)
+
+    def mark_ready(self, document):
+        """Mark a document ready without a job, e.g. when its content is already indexed"""
+        document.status = STATUS_READY
+        document.progress = 100
+        document.processed = True
+        document.processing_error = None
+        document.status_updated_at = datetime.now(timezone.utc)
+        db.session.commit()
+
+    def recover(self, stale_only=False):
+        """
+        Re-schedule queued jobs and jobs abandoned by a dead worker.
+        With stale_only (the periodic sweep), queued jobs are only picked up once
+        untouched for stale_after, leaving fresh ones to the process that queued them.
+        """
+        stale_before = datetime.now(timezone.utc) - self.stale_after
+
+        Document.query.filter(
+            Document.status == STATUS_PROCESSING,
+            Document.status_updated_at < stale_before
+        ).update({'status': STATUS_QUEUED}, synchronize_session=False)
+        db.session.commit()
+
+        query = db.session.query(Document.id).filter(Document.status == STATUS_QUEUED)
+        if stale_only:
+            query = query.filter(or_(Document.status_updated_at < stale_before,
+                                     Document.status_updated_at.is_(None)))
+        with self._lock:
+            queued_ids = [row.id for row in query if row.id not in self._scheduled]
+        self.schedule(queued_ids)
+
+        if queued_ids:
+            logger.info("Ingestion queue recovered %d job(s)", len(queued_ids))
+
+    def _claim(self, document_id):
+        """Atomically move a job from queued to processing; False if someone else has it"""
+        claimed = Document.query.filter_by(id=document_id, status=STATUS_QUEUED).update({
+            'status': STATUS_PROCESSING,
+            'progress': 0,
+            'status_updated_at': datetime.now(timezone.utc)
+        }, synchronize_session=False)
+        db.session.commit()
+        return claimed == 1
+
+    def _set_progress(self, document_id, progress):
+        Document.query.filter_by(id=document_id).update({
+            'progress': progress,
+            'status_updated_at': datetime.now(timezone.utc)
+        }, synchronize_session=False)
+        db.session.commit()
+
+    def _drop_if_unreferenced(self, index_store, index_key):
+        """Delete an index just saved for content whose documents were all deleted while the job ran"""
+        # End the transaction first, so the check sees deletes committed by other requests
+        db.session.commit()
+        with index_store.lock(index_key):
+            referenced = db.session.query(Document.query.filter(
+                or_(Document.content_hash == index_key, Document.session_id == index_key)
+            ).exists()).scalar()
+            if not referenced:
+                # release_document_content already removed the file and found no index to delete
+                index_store.delete(index_key)
+        db.session.commit()
+
+    def _run(self, document_id, request_id='-'):
+        request_id_var.set(request_id)
+        with self.app.app_context():
+            try:
+                if not self._claim(document_id):
+                    return
+                self._process(document_id)
+            except Exception:
+                logger.exception("Ingestion worker error", extra={'document_id': document_id})
+                db.session.rollback()
+            finally:
+                db.session.remove()
+                with self._lock:
+                    self._scheduled.discard(document_id)
+
+    def _process(self, document_id):
+        document = Document.query.get(document_id)
+        if document is None:
+            # Deleted while queued
+            return
+        session_id = document.session_id
+        index_key = document.index_key
+        last_reported = [0]
+
+        def report(progress):
+            # Throttle progress writes to one commit per 5%
+            if progress - last_reported[0] >= 5:
+                last_reported[0] = progress
+                self._set_progress(document_id, progress)
+
+        try:
+            logger.info("Processing PDF for AI", extra={'document_id': document_id,
+                                                        'original_filename': document.original_filename})
+            vectorstore = build_vectorstore(document.file_path, progress_callback=report)
+            index_store = get_index_store(self.app)
+            index_store.save(index_key, vectorstore)
+            self._drop_if_unreferenced(index_store, index_key)
+
+            result = {'status': STATUS_READY, 'progress': 100, 'processed': True, 'processing_error': None}
+            logger.info("PDF processed successfully", extra={'document_id': document_id,
+                                                             'session_id': session_id})
+        except Exception as e:
+            logger.error("Error processing PDF for AI: %s", e, extra={'document_id': document_id})
+            db.session.rollback()
+            result = {'status': STATUS_FAILED, 'processed': False, 'processing_error': str(e)[:1000]}
+
+        # A conditional UPDATE, like _claim: the row may have been deleted while the job ran
+        result['status_updated_at'] = datetime.now(timezone.utc)
+        Document.query.filter_by(id=document_id).update(result, synchronize_session=False)
+        db.session.commit()
+
+        for listener in self.listeners:
+            listener(document_id, session_id)
+
+
+ingestion_queue = IngestionQueue()
@@ -0,0 +1,135 @@
+from array import array
+from collections import Counter
+import re
+import sys
+
+import numpy as np
+
+# Indexed words: 3+ ASCII letters, matched on the lower-cased text
+WORD_PATTERN = re.compile(r'\b[a-zA-Z]{3,}\b')
+
+# English and Indonesian words too common to rank chunks by
+STOPWORDS = frozenset({
+    'that', 'this', 'with', 'have', 'will', 'from', 'they', 'been', 'were', 'said', 'each', 'which',
+    'their', 'time', 'would', 'there', 'could', 'other', 'more', 'very', 'what', 'know', 'just',
+    'first', 'get', 'over', 'think', 'also', 'its', 'our', 'out', 'many', 'then', 'them', 'these',
+    'so', 'some', 'her', 'make', 'like', 'into', 'him', 'has', 'two', 'go', 'no', 'way', 'my',
+    'than', 'call', 'who', 'now', 'find', 'long', 'down', 'day', 'did', 'come', 'made', 'may',
+    'part', 'the', 'and', 'for', 'are', 'was', 'you', 'not', 'but', 'all', 'can', 'had', 'one',
+    'any', 'dan', 'ini', 'itu', 'apa', 'ada', 'yang', 'untuk', 'dari', 'dengan', 'dalam', 'adalah',
+    'pada', 'akan', 'atau', 'juga'
+})
+
+
+def index_terms(text):
+    """Term frequencies of the indexed words of a chunk"""
+    return Counter(word for word in WORD_PATTERN.findall(text.lower()) if word not in STOPWORDS)
+
+
+class KeywordIndex:
+    """
+    Compact inverted index for enhanced-mode BM25 search.
+
+    Terms are interned and numbered in first-seen order. The postings of
+    term t are postings[offsets[t]:offsets[t + 1]], pairs of
+    (chunk index delta, term frequency) in chunk order, all in one flat
+    array('I') instead of a Python list per posting. to_arrays() and
+    from_arrays() round-trip it through numpy arrays for the index store,
+    which memory-maps them.
+    """
+
+    def __init__(self, vocabulary, offsets, postings, chunk_lengths):
+        self.vocabulary = vocabulary
+        self.term_ids = {term: term_id for term_id, term in enumerate(vocabulary)}
+        self.offsets = offsets
+        self.postings = postings
+        self.chunk_lengths = chunk_lengths
+        # Zero-copy views for vectorized scoring
+        self._postings = np.frombuffer(postings, dtype=np.uint32) if isinstance(postings, array) else postings
+        self._chunk_lengths = np.frombuffer(chunk_lengths, dtype=np.uint32) \
+            if isinstance(chunk_lengths, array) else chunk_lengths
+        self.avg_chunk_length = (int(self._chunk_lengths.sum()) / len(chunk_lengths)) if len(chunk_lengths) else 0
+        self._length_norms = {}  # (k1, b) -> per-chunk BM25 length normalization
+
+    @classmethod
+    def build(cls, chunks):
+        """Index chunks in a single pass; chunks may be a list or a stream"""
+        builder = KeywordIndexBuilder()
+        for chunk in chunks:
+            builder.add(chunk)
+        return builder.finish()
+
+    @property
+    def chunk_count(self):
+        return len(self.chunk_lengths)
+
+    def term_postings(self, term):
+        """(chunk indexes, term frequencies) arrays of the chunks containing term"""
+        term_id = self.term_ids.get(term)
+        if term_id is None:
+            return None
+        pairs = self._postings[int(self.offsets[term_id]):int(self.offsets[term_id + 1])]
+        return np.cumsum(pairs[0::2], dtype=np.int64), pairs[1::2].astype(np.float64)
+
+    def length_norms(self, k1, b):
+        """BM25 length normalization k1 * (1 - b + b * length / avg_length) of every chunk, computed once per (k1, b)"""
+        norms = self._length_norms.get((k1, b))
+        if norms is None:
+            avg_chunk_length = self.avg_chunk_length or 1
+            norms = self._length_norms[(k1, b)] = k1 * (1 - b + b * self._chunk_lengths / avg_chunk_length)
+        return norms
+
+    @property
+    def nbytes(self):
+        """Heap bytes; arrays memory-mapped from an index directory live in the shared page cache"""
+        size = sum(sys.getsizeof(term) for term in self.vocabulary) + sys.getsizeof(self.term_ids)
+        for values in (self.offsets, self.postings, self.chunk_lengths):
+            if not isinstance(values, np.memmap):
+                size += values.itemsize * len(values)
+        return size + sum(norms.nbytes for norms in self._length_norms.values())
+
+    def to_arrays(self):
+        """Arrays for np.save; the vocabulary is stored as newline-separated UTF-8 bytes"""
+        return {
+            'vocabulary': np.frombuffer('\n'.join(self.vocabulary).encode('utf-8'), dtype=np.uint8),
+            'offsets': np.asarray(self.offsets, dtype=np.uint64),
+            'postings': np.asarray(self.postings, dtype=np.uint32),
+            'chunk_lengths': np.asarray(self.chunk_lengths, dtype=np.uint32)
+        }
+
+    @classmethod
+    def from_arrays(cls, arrays):
+        joined = bytes(arrays['vocabulary']).decode('utf-8')
+        vocabulary = [sys.intern(term) for term in joined.split('\n')] if joined else []
+        return cls(vocabulary, arrays['offsets'], arrays['postings'], arrays['chunk_lengths'])
+
+
+class KeywordIndexBuilder:
+    """Accumulates per-term delta-encoded postings while chunks stream in"""
+
+    def __init__(self):
+        self.term_ids = {}
+        self.term_postings = []
+        self.last_chunk = []
+        self.chunk_lengths = array('I')
+
+    def add(self, chunk):
+        chunk_idx = len(self.chunk_lengths)
+        term_counts = index_terms(chunk)
+        self.chunk_lengths.append(sum(term_counts.values()))
+        for term, term_frequency in term_counts.items():
+            term_id = self.term_ids.get(term)
+            if term_id is None:
+                term_id = self.term_ids[sys.intern(term)] = len(self.term_postings)
+                self.term_postings.append(array('I'))
+                self.last_chunk.append(0)
+            self.term_postings[term_id].extend((chunk_idx - self.last_chunk[term_id], term_frequency))
+            self.last_chunk[term_id] = chunk_idx
+
+    def finish(self):
+        offsets = array('Q', [0])
+        postings = array('I')
+        for term_postings in self.term_postings:
+            postings.extend(term_postings)
+            offsets.append(len(postings))
+        return KeywordIndex(list(self.term_ids), offsets, postings, self.chunk_lengths)
@@ -3,12 +3,15 @@ from datetime import datetime, timezone
 
 class Message(db.Model):
     __tablename__ = 'messages'
+    __table_args__ = (
+        db.Index('ix_messages_conversation_id_created_at', 'conversation_id', 'created_at', 'id'),
+    )
     
     id = db.Column(db.BigInteger, primary_key=True, autoincrement=True)
     conversation_id = db.Column(db.BigInteger, db.ForeignKey('conversations.id'), nullable=False)
     content = db.Column(db.Text, nullable=False)
     role = db.Column(db.String(10), nullable=False)  # 'user' or 'assistant'
-    created_at = db.Column(db.DateTime, default=datetime.now(timezone.utc))
+    created_at = db.Column(db.DateTime, default=lambda: datetime.now(timezone.utc))
     
     # Optional fields for tracking and analysis
     tokens_used = db.Column(db.Integer, nullable=True)
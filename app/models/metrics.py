@@ -0,0 +1,169 @@
+from bisect import bisect_left
+import threading
+import time
+
+# Pipeline stages timed by the app (label values of pdfchat_stage_duration_seconds)
+STAGES = ('pdf_open', 'page_extraction', 'chunking', 'index_build', 'retrieval', 'llm', 'db_commit')
+
+# Histogram bucket upper bounds in seconds; pages take milliseconds, LLM calls and large indexes take seconds
+DEFAULT_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120)
+
+
+class Histogram:
+    """Cumulative-bucket histogram with one series per label value"""
+
+    def __init__(self, buckets=DEFAULT_BUCKETS):
+        self.buckets = tuple(buckets)
+        self.series = {}  # label -> [bucket counts..., +Inf count, sum]
+        self._lock = threading.Lock()
+
+    def observe(self, label, value):
+        index = bisect_left(self.buckets, value)
+        with self._lock:
+            series = self.series.get(label)
+            if series is None:
+                series = self.series[label] = [0] * (len(self.buckets) + 1) + [0.0]
+            series[index] += 1
+            series[-1] += value
+
+    def snapshot(self):
+        with self._lock:
+            return {label: list(series) for label, series in self.series.items()}
+
+    def clear(self):
+        with self._lock:
+            self.series.clear()
+
+
+class StageTimer:
+    def __init__(self, metrics, stage):
+        self.metrics = metrics
+        self.stage = stage
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc_info):
+        self.metrics.observe(self.stage, time.perf_counter() - self.start)
+        return False
+
+
+class NullTimer:
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        return False
+
+
+NULL_TIMER = NullTimer()
+
+
+class TimedIterator:
+    """Iterator wrapper that adds up the time spent producing items (including upstream iterators)"""
+
+    def __init__(self, iterable):
+        self.iterator = iter(iterable)
+        self.seconds = 0.0
+
+    def __iter__(self):
+        return self
+
+    def __next__(self):
+        start = time.perf_counter()
+        try:
+            return next(self.iterator)
+        finally:
+            self.seconds += time.perf_counter() - start
+
+
+class Metrics:
+    """
+    Per-process stage timings exposed in Prometheus text format.
+
+    Stages are recorded with `with metrics.timer('chunking'):` or
+    metrics.observe(stage, seconds). While disabled (METRICS_ENABLED off,
+    the default) timer() returns a shared no-op context manager and
+    observe() returns at once, so instrumented code pays one attribute
+    check. Each worker process keeps its own numbers; scrape every worker.
+    """
+
+    def __init__(self, buckets=DEFAULT_BUCKETS):
+        self.enabled = False
+        self.stage_durations = Histogram(buckets)
+
+    def init_app(self, app):
+        self.enabled = app.config.get('METRICS_ENABLED', False)
+        if self.enabled:
+            self._time_commits()
+
+    def _time_commits(self):
+        """Time every commit of the app's SQLAlchemy session as the db_commit stage"""
+        from sqlalchemy import event
+        from app import db
+
+        if event.contains(db.session, 'before_commit', self._before_commit):
+            return
+        event.listen(db.session, 'before_commit', self._before_commit)
+        event.listen(db.session, 'after_commit', self._after_commit)
+
+    @staticmethod
+    def _before_commit(session):
+        session.info['commit_started'] = time.perf_counter()
+
+    def _after_commit(self, session):
+        start = session.info.pop('commit_started', None)
+        if start is not None:
+            self.observe('db_commit', time.perf_counter() - start)
+
+    def observe(self, stage, seconds):
+        if self.enabled:
+            self.stage_durations.observe(stage, seconds)
+
+    def timer(self, stage):
+        """Context manager recording the time spent in its block under stage"""
+        if not self.enabled:
+            return NULL_TIMER
+        return StageTimer(self, stage)
+
+    def clear(self):
+        self.stage_durations.clear()
+
+    @staticmethod
+    def format_labels(labels):
+        if not labels:
+            return ''
+        return '{' + ','.join(f'{key}="{value}"' for key, value in labels.items()) + '}'
+
+    @staticmethod
+    def format_metric(name, kind, help_text, samples):
+        """Prometheus text lines for one metric; samples are (labels dict, value) pairs"""
+        lines = [f"# HELP {name} {help_text}", f"# TYPE {name} {kind}"]
+        for labels, value in samples:
+            lines.append(f"{name}{Metrics.format_labels(labels)} {value}")
+        return lines
+
+    def render(self, extra_metrics=()):
+        """
+        The stage histogram plus extra_metrics in Prometheus text format.
+        extra_metrics are (name, kind, help, samples) tuples, e.g. cache counters.
+        """
+        name = 'pdfchat_stage_duration_seconds'
+        lines = [f"# HELP {name} Time spent in each pipeline stage",
+                 f"# TYPE {name} histogram"]
+        buckets = self.stage_durations.buckets
+        for stage, series in sorted(self.stage_durations.snapshot().items()):
+            cumulative = 0
+            for bound, count in zip(buckets + ('+Inf',), series):
+                cumulative += count
+                lines.append(f'{name}_bucket{{stage="{stage}",le="{bound}"}} {cumulative}')
+            lines.append(f'{name}_sum{{stage="{stage}"}} {series[-1]}')
+            lines.append(f'{name}_count{{stage="{stage}"}} {cumulative}')
+
+        for metric in extra_metrics:
+            lines.extend(self.format_metric(*metric))
+        return '\n'.join(lines) + '\n'
+
+
+metrics = Metrics()
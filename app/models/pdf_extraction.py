@@ -0,0 +1,147 @@
+from PyPDF2 import PdfReader
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+import logging
+import multiprocessing
+import os
+import threading
+import time
+
+from app.models.metrics import metrics
+
+logger = logging.getLogger(__name__)
+
+# Worker processes used for page-parallel extraction (1 disables it)
+PDF_EXTRACT_WORKERS = int(os.getenv('PDF_EXTRACT_WORKERS', min(os.cpu_count() or 1, 4)))
+# Files with fewer pages than this are extracted sequentially; pool overhead isn't worth it
+PDF_PARALLEL_MIN_PAGES = int(os.getenv('PDF_PARALLEL_MIN_PAGES', 32))
+# Pages handed to a worker per task; small enough to balance uneven pages
+PDF_PAGES_PER_TASK = int(os.getenv('PDF_PAGES_PER_TASK', 16))
+
+_process_pools = {}  # worker count -> ProcessPoolExecutor
+_process_pool_lock = threading.Lock()
+
+
+def clean_page_text(page_text):
+    """Collapse whitespace in the text extracted from one page"""
+    return ' '.join(page_text.split()) if page_text else ''
+
+
+def extract_page_range(file_path, start, end):
+    """Extract (cleaned text, seconds taken) for pages [start, end); runs inside worker processes"""
+    pdf_reader = PdfReader(file_path)
+    pages = []
+    for i in range(start, end):
+        started = time.perf_counter()
+        pages.append((clean_page_text(pdf_reader.pages[i].extract_text()), time.perf_counter() - started))
+    return pages
+
+
+def get_process_pool(workers):
+    """Return the shared extraction process pool of this size, creating it on first use"""
+    with _process_pool_lock:
+        pool = _process_pools.get(workers)
+        if pool is None:
+            # spawn rather than fork: the web process runs threads and holds DB connections
+            pool = ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context('spawn'))
+            _process_pools[workers] = pool
+        return pool
+
+
+def reset_process_pool(pool):
+    """Drop a broken pool so the next call starts a fresh one"""
+    with _process_pool_lock:
+        # Ingestion threads share the pool; another one may already have replaced it
+        for workers, current in list(_process_pools.items()):
+            if current is pool:
+                del _process_pools[workers]
+    # Its futures have all failed already; other pools' in-flight extractions are left alone
+    pool.shutdown(wait=False)
+
+
+def iter_pages_sequential(pdf_reader, progress_callback=None):
+    """Yield cleaned text for every page, extracted in the current process"""
+    total_pages = len(pdf_reader.pages)
+    for page_number, page in enumerate(pdf_reader.pages, 1):
+        with metrics.timer('page_extraction'):
+            page_text = clean_page_text(page.extract_text())
+        yield page_text
+        if progress_callback:
+            progress_callback(page_number, total_pages)
+
+
+def get_file_path(pdf_file):
+    """Return a filesystem path for pdf_file if worker processes can reopen it"""
+    if isinstance(pdf_file, (str, os.PathLike)):
+        path = os.fspath(pdf_file)
+    else:
+        path = getattr(pdf_file, 'name', None)
+    if isinstance(path, str) and os.path.isfile(path):
+        return path
+    return None
+
+
+def iter_pages(pdf_file, progress_callback=None, workers=None):
+    """
+    Yield cleaned text for every page of a PDF, one page at a time, in order.
+
+    Large files that live on disk are split into page ranges and extracted
+    by a process pool, each worker opening the file itself. Small files,
+    in-memory streams and workers=1 use the sequential path. Only a few
+    page ranges are in flight at once, so memory stays bounded by pages
+    rather than by document size.
+    """
+    workers = PDF_EXTRACT_WORKERS if workers is None else workers
+    with metrics.timer('pdf_open'):
+        pdf_reader = PdfReader(pdf_file)
+    total_pages = len(pdf_reader.pages)
+    file_path = get_file_path(pdf_file)
+
+    if workers <= 1 or total_pages < PDF_PARALLEL_MIN_PAGES or file_path is None:
+        yield from iter_pages_sequential(pdf_reader, progress_callback)
+        return
+
+    pages_done = 0
+    pool = get_process_pool(workers)
+    try:
+        for page_text in iter_pages_parallel(pool, file_path, total_pages, workers):
+            yield page_text
+            pages_done += 1
+            if progress_callback:
+                progress_callback(pages_done, total_pages)
+    except BrokenProcessPool as e:
+        # A worker died (e.g. OOM killed); recover and finish in this process
+        logger.warning("Parallel PDF extraction failed, continuing sequentially: %s", e)
+        reset_process_pool(pool)
+        for page_number in range(pages_done, total_pages):
+            with metrics.timer('page_extraction'):
+                page_text = clean_page_text(pdf_reader.pages[page_number].extract_text())
+            yield page_text
+            if progress_callback:
+                progress_callback(page_number + 1, total_pages)
+
+
+def iter_pages_parallel(pool, file_path, total_pages, workers):
+    """Extract page ranges on the process pool and yield their pages in order"""
+    ranges = iter(range(0, total_pages, PDF_PAGES_PER_TASK))
+    max_in_flight = workers * 2
+    in_flight = deque()
+
+    def submit_next():
+        start = next(ranges, None)
+        if start is not None:
+            end = min(start + PDF_PAGES_PER_TASK, total_pages)
+            in_flight.append(pool.submit(extract_page_range, file_path, start, end))
+
+    for _ in range(max_in_flight):
+        submit_next()
+
+    # Ranges are consumed in submission order, so pages come out in page order
+    while in_flight:
+        page_texts = in_flight.popleft().result()
+        submit_next()
+        for page_text, seconds in page_texts:
+            # Workers time their own pages; only this process records them
+            metrics.observe('page_extraction', seconds)
+            yield page_text
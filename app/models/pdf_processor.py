@@ -1,6 +1,34 @@
-from PyPDF2 import PdfReader
+from app.models.pdf_extraction import iter_pages
+from app.models.embedding_cache import get_embedder
+from app.models.metrics import metrics
+from app.models.term_matrix import TermChunkMatrix
+import asyncio
+import logging
 import os
+import queue
 import re
+import threading
+import time
+
+import numpy as np
+
+# Chunks handed to the embedder per FAISS add while streaming; the embedder
+# splits them into token-budgeted API requests that run concurrently
+EMBEDDING_BATCH_SIZE = int(os.getenv('EMBEDDING_BATCH_SIZE', 512))
+
+# clean_chunk_text: LangChain Document reprs (page_content='...', metadata={...},
+# source '...') left in answers, each with the marker word that must be present for
+# it to match, and page numbers on their own line at either end
+CHUNK_ARTIFACTS = (
+    ('page_content', re.compile(r'page_content[:\s]*[\'"]?', re.IGNORECASE)),
+    ('metadata', re.compile(r'metadata[:\s]*\{[^}]*\}', re.IGNORECASE)),
+    ('source', re.compile(r'source[:\s]*[\'"][^\'"]*[\'"]', re.IGNORECASE)),
+)
+LEADING_PAGE_NUMBER = re.compile(r'\s*\d+\s*\n')
+TRAILING_PAGE_NUMBER = re.compile(r'\n\s*\d+\s*$')
+CHUNK_STRIP_CHARS = '\'"[]{}()'
+
+logger = logging.getLogger(__name__)
 
 # Initialize langchain availability flag
 LANGCHAIN_AVAILABLE = False
@@ -14,10 +42,11 @@ try:
     from langchain.memory import ConversationBufferMemory
     from langchain.chains import ConversationalRetrievalChain
     from langchain.prompts import PromptTemplate
+    from langchain.callbacks.base import BaseCallbackHandler, AsyncCallbackHandler
     LANGCHAIN_AVAILABLE = True
-    print("Langchain components imported successfully")
+    logger.info("Langchain components imported successfully")
 except ImportError as e:
-    print(f"Warning: Langchain not available. AI functionality will be limited. Error: {e}")
+    logger.warning("Langchain not available. AI functionality will be limited. Error: %s", e)
     # Define dummy classes to prevent NameError
     RecursiveCharacterTextSplitter = None
     OpenAIEmbeddings = None
@@ -26,79 +55,176 @@ except ImportError as e:
     ConversationBufferMemory = None
     ConversationalRetrievalChain = None
     PromptTemplate = None
+    BaseCallbackHandler = object
+    AsyncCallbackHandler = object
+
+
+class StageTimingHandler(BaseCallbackHandler):
+    """Records retriever and LLM runs inside a chain call as the retrieval and llm stages"""
+
+    def __init__(self):
+        self.started = {}
+
+    def _start(self, run_id):
+        self.started[run_id] = time.perf_counter()
+
+    def _end(self, stage, run_id):
+        start = self.started.pop(run_id, None)
+        if start is not None:
+            metrics.observe(stage, time.perf_counter() - start)
+
+    def on_retriever_start(self, serialized, query, *, run_id, **kwargs):
+        self._start(run_id)
+
+    def on_retriever_end(self, documents, *, run_id, **kwargs):
+        self._end('retrieval', run_id)
+
+    def on_llm_start(self, serialized, prompts, *, run_id, **kwargs):
+        self._start(run_id)
+
+    def on_chat_model_start(self, serialized, messages, *, run_id, **kwargs):
+        self._start(run_id)
+
+    def on_llm_end(self, response, *, run_id, **kwargs):
+        self._end('llm', run_id)
+
+    def on_llm_error(self, error, *, run_id, **kwargs):
+        self.started.pop(run_id, None)
+
 
 class PDFProcessor:
     @staticmethod
-    def get_pdf_text(pdf_file):
-        """Extract text from PDF file with improved handling"""
-        text = ""
+    def iter_pdf_pages(pdf_file, progress_callback=None, workers=None):
+        """Yield the cleaned text of each PDF page, one page at a time"""
         try:
-            pdf_reader = PdfReader(pdf_file)
-            for page in pdf_reader.pages:
-                page_text = page.extract_text()
-                if page_text:
-                    # Membersihkan teks dari karakter yang tidak diinginkan
-                    cleaned_text = ' '.join(page_text.split())
-                    text += cleaned_text + "\n\n"  # Tambahkan pemisah antar halaman
+            # Halaman besar diekstrak paralel oleh process pool (lihat pdf_extraction)
+            yield from iter_pages(pdf_file, progress_callback=progress_callback, workers=workers)
         except Exception as e:
-            print(f"Error extracting text from PDF: {str(e)}")
+            logger.error("Error extracting text from PDF: %s", e)
             raise
-        return text    
+
+    @staticmethod
+    def get_pdf_text(pdf_file, progress_callback=None, workers=None):
+        """Extract text from PDF file with improved handling"""
+        # Tambahkan pemisah antar halaman
+        return "".join(page_text + "\n\n"
+                       for page_text in PDFProcessor.iter_pdf_pages(pdf_file, progress_callback, workers)
+                       if page_text)
     
     @staticmethod
     def get_text_chunks(text):
         """Split text into chunks using RecursiveCharacterTextSplitter for better results"""
+        return list(PDFProcessor.iter_text_chunks([text]))
+
+    @staticmethod
+    def iter_text_chunks(pages):
+        """
+        Split a stream of page texts into chunks, yielding each chunk as soon as it is complete.
+        Overlap is carried across page boundaries, so only about one chunk plus one page is held in memory.
+        """
         if LANGCHAIN_AVAILABLE:
-            try:
-                text_splitter = RecursiveCharacterTextSplitter(
-                    chunk_size=1000,
-                    chunk_overlap=420,
-                    length_function=len,
-                )
-                chunks = text_splitter.split_text(text)
-                return chunks
-            except Exception as e:
-                print(f"Error with langchain text splitter: {e}")
-                # Fallback to simple chunking
+            text_splitter = RecursiveCharacterTextSplitter(
+                chunk_size=1000,
+                chunk_overlap=420,
+                length_function=len,
+            )
+            # The last chunk of each split may continue on the next page, so it is re-split with it
+            carry = ""
+            for page_text in pages:
+                if not page_text:
+                    continue
+                chunks = text_splitter.split_text(carry + page_text + "\n\n")
+                if not chunks:
+                    continue
+                yield from chunks[:-1]
+                carry = chunks[-1] + "\n\n"
+            if carry.strip():
+                yield carry.strip()
+            return
         
-        # Simple chunking fallback
+        # Simple chunking fallback: fixed windows over the concatenated page texts
         chunk_size = 1000
         chunk_overlap = 200
-        chunks = []
+        step = chunk_size - chunk_overlap
+        buffer = ""
         
-        for i in range(0, len(text), chunk_size - chunk_overlap):
-            chunk = text[i:i + chunk_size]
-            if chunk.strip():
-                chunks.append(chunk)
+        for page_text in pages:
+            if not page_text:
+                continue
+            buffer += page_text + "\n\n"
+            start = 0
+            while len(buffer) - start >= chunk_size:
+                chunk = buffer[start:start + chunk_size]
+                if chunk.strip():
+                    yield chunk
+                start += step
+            # Keep only the unfinished tail (including the overlap) for the next page
+            buffer = buffer[start:]
         
-        return chunks    
+        for start in range(0, len(buffer), step):
+            chunk = buffer[start:start + chunk_size]
+            if chunk.strip():
+                yield chunk
     
     @staticmethod
     def get_vectorstore(text_chunks):
-        """Create vector store from text chunks"""
+        """Create vector store from text chunks (a list or a stream of chunks)"""
+        text_chunks = iter(text_chunks)
         if not LANGCHAIN_AVAILABLE:
+            chunks = list(text_chunks)
             return {
-                'chunks': text_chunks,
+                'chunks': chunks,
+                'term_matrix': TermChunkMatrix.build(chunks),
                 'type': 'simple',
                 'error': 'Langchain not available'
             }
-            
+        
+        chunks = []
         try:
-            # Check if OpenAI API key is available
-            if not os.getenv('OPENAI_API_KEY'):
-                raise ValueError("OpenAI API key not found. Please set OPENAI_API_KEY environment variable.")
+            # Chunks embedded before (same model, same text) come from the embedding cache
+            embeddings = get_embedder()
+            vectorstore = None
+            batch = []
             
-            embeddings = OpenAIEmbeddings()
-            vectorstore = FAISS.from_texts(texts=text_chunks, embedding=embeddings)
+            # Embed chunks in batches as they arrive instead of waiting for the whole document
+            for chunk in text_chunks:
+                chunks.append(chunk)
+                batch.append(chunk)
+                if len(batch) >= EMBEDDING_BATCH_SIZE:
+                    vectorstore = PDFProcessor.add_to_vectorstore(vectorstore, batch, embeddings,
+                                                                  start=len(chunks) - len(batch))
+                    batch = []
+            if batch:
+                vectorstore = PDFProcessor.add_to_vectorstore(vectorstore, batch, embeddings,
+                                                              start=len(chunks) - len(batch))
+            
+            if vectorstore is None:
+                raise ValueError("No text could be extracted from the document.")
+            if hasattr(embeddings, 'cache'):
+                stats = embeddings.cache.stats()
+                logger.info("Embedding cache: %d hits, %d misses, %d entries",
+                            stats['hits'], stats['misses'], stats['entries'])
             return vectorstore
         except Exception as e:
-            print(f"Error creating vector store: {str(e)}")
-            # Return simple fallback            
+            logger.error("Error creating vector store: %s", e)
+            # Return simple fallback with every chunk, including those not consumed yet
+            chunks.extend(text_chunks)
             return {
-                'chunks': text_chunks,
+                'chunks': chunks,
+                'term_matrix': TermChunkMatrix.build(chunks),
                 'type': 'simple',
                 'error': str(e)
-            }    
+            }
+
+    @staticmethod
+    def add_to_vectorstore(vectorstore, texts, embeddings, start=0):
+        """Add a batch of texts to a FAISS vectorstore, creating it on the first batch"""
+        # Each document remembers its chunk number, so answers can report which chunks they used
+        metadatas = [{'chunk': start + i} for i in range(len(texts))]
+        if vectorstore is None:
+            return FAISS.from_texts(texts=texts, embedding=embeddings, metadatas=metadatas)
+        vectorstore.add_texts(texts, metadatas=metadatas)
+        return vectorstore
         
     @staticmethod
     def get_conversation_chain(vectorstore):
@@ -120,12 +246,21 @@ class PDFProcessor:
                 'error': vectorstore.get('error', 'Simple mode - advanced AI not available')
             }
             
+        # Without an LLM, a FAISS index (e.g. from local embeddings) still gives semantic retrieval;
+        # answers are then composed from the most similar passages
+        if not os.getenv('OPENAI_API_KEY'):
+            return {
+                'vectorstore': vectorstore,
+                'type': 'semantic',
+                'ready': True,
+                'error': 'OpenAI API key not found - answering from the most similar passages'
+            }
+        
         try:
-            # Check if OpenAI API key is available
-            if not os.getenv('OPENAI_API_KEY'):
-                raise ValueError("OpenAI API key not found. Please set OPENAI_API_KEY environment variable.")
-            
-            llm = ChatOpenAI(temperature=0.1)  # Lower temperature for more consistent responses
+            # Lower temperature for more consistent responses; streaming lets callers receive tokens as they arrive
+            llm = ChatOpenAI(temperature=0.1, streaming=True)
+            # Separate non-streaming model for rewriting follow-up questions, so its tokens never reach the user
+            condense_llm = ChatOpenAI(temperature=0)
               # Custom prompt template to enhance retrieval of all information
             prompt_template = """
             Kamu adalah asisten AI yang membantu menjawab pertanyaan berdasarkan dokumen yang diberikan. 
@@ -153,7 +288,8 @@ class PDFProcessor:
             )
             
             memory = ConversationBufferMemory(
-                memory_key='chat_history', return_messages=True
+                memory_key='chat_history', return_messages=True,
+                output_key='answer'  # The chain also returns source documents
             )
             
             conversation_chain = ConversationalRetrievalChain.from_llm(
@@ -164,56 +300,147 @@ class PDFProcessor:
                                                        "fetch_k": 20,
                                                        "lambda_mult": 0.7}),  # Retrieve more documents
                 memory=memory,
+                condense_question_llm=condense_llm,
+                return_source_documents=True,
                 combine_docs_chain_kwargs={"prompt": PROMPT}
             )
             return conversation_chain
         except Exception as e:
-            print(f"Error creating conversation chain: {str(e)}")
+            logger.error("Error creating conversation chain: %s", e)
             return {
                 'vectorstore': vectorstore,
-                'type': 'simple',
+                'type': 'semantic',
                 'ready': True,  # Mark as ready for simple fallback mode
                 'error': str(e)
             }
     
+    @staticmethod
+    def get_chain_callbacks(*handlers):
+        """Callbacks for a chain call: the given handlers plus stage timing when metrics are enabled"""
+        if metrics.enabled:
+            return [*handlers, StageTimingHandler()]
+        return list(handlers)
+
+    @staticmethod
+    def stream_chain_response(conversation_chain, question):
+        """
+        Run a LangChain conversation chain, yielding ('token', text) as the LLM produces
+        the answer and finally ('result', chain_response).
+        """
+        events = queue.Queue()
+
+        class TokenQueueHandler(BaseCallbackHandler):
+            def on_llm_new_token(self, token, **kwargs):
+                events.put(('token', token))
+
+        def run_chain():
+            try:
+                callbacks = PDFProcessor.get_chain_callbacks(TokenQueueHandler())
+                events.put(('result', conversation_chain({'question': question}, callbacks=callbacks)))
+            except Exception as e:
+                events.put(('error', e))
+
+        threading.Thread(target=run_chain, daemon=True).start()
+        while True:
+            kind, value = events.get()
+            if kind == 'error':
+                raise value
+            yield kind, value
+            if kind == 'result':
+                return
+
+    @staticmethod
+    async def astream_chain_response(conversation_chain, question):
+        """Async version of stream_chain_response for the ASGI path; the LLM call runs on the event loop"""
+        events = asyncio.Queue()
+
+        class TokenQueueHandler(AsyncCallbackHandler):
+            async def on_llm_new_token(self, token, **kwargs):
+                await events.put(('token', token))
+
+        async def run_chain():
+            try:
+                callbacks = PDFProcessor.get_chain_callbacks(TokenQueueHandler())
+                await events.put(('result', await conversation_chain.acall({'question': question},
+                                                                           callbacks=callbacks)))
+            except Exception as e:
+                await events.put(('error', e))
+
+        task = asyncio.ensure_future(run_chain())
+        try:
+            while True:
+                kind, value = await events.get()
+                if kind == 'error':
+                    raise value
+                yield kind, value
+                if kind == 'result':
+                    return
+        finally:
+            # Client went away mid-answer: stop paying for tokens nobody reads
+            if not task.done():
+                task.cancel()
+
+    @staticmethod
+    def get_source_chunk_ids(chain_response):
+        """Chunk numbers of the documents a LangChain answer was built from"""
+        return [doc.metadata['chunk'] for doc in chain_response.get('source_documents', [])
+                if 'chunk' in getattr(doc, 'metadata', {})]
+
+    @staticmethod
+    def iter_response_sections(response):
+        """Split a finished fallback response into sentence-sized sections for streaming"""
+        # Split before the whitespace that follows a sentence end, so the sections join back exactly
+        for section in re.split(r'(?<=[.!?])(?=\s)', response):
+            if section:
+                yield section
+
     @staticmethod
     def search_relevant_content(vectorstore, question):
         """
         Search for relevant content chunks based on the question.
         Fallback implementation for when LangChain is not available.
         """
+        return [chunk for _, chunk in PDFProcessor.search_relevant_chunks(vectorstore, question)]
+
+    @staticmethod
+    def search_relevant_chunks(vectorstore, question, max_chunks=3):
+        """(chunk index, text) of the chunks most relevant to a question, best match first"""
+        if vectorstore is not None and not isinstance(vectorstore, dict):
+            # FAISS index searched without an LLM, e.g. built with a local embedding backend
+            documents = vectorstore.similarity_search(question, k=max_chunks)
+            return [(document.metadata.get('chunk'), document.page_content) for document in documents]
+        
+        chunks = vectorstore.get('chunks', []) if vectorstore else []
+        return [(i, chunks[i]) for i in PDFProcessor.search_relevant_chunk_ids(vectorstore, question, max_chunks)]
+
+    @staticmethod
+    def search_relevant_chunk_ids(vectorstore, question, max_chunks=3):
+        """Indexes of the chunks search_relevant_content returns, best match first"""
         if not vectorstore or not vectorstore.get('chunks'):
             return []
             
-        chunks = vectorstore.get('chunks', [])
+        chunks = vectorstore['chunks']
         question_lower = question.lower()
         
-        # Simple keyword-based scoring
-        scored_chunks = []
+        # One point per question word (longer than 2 characters) found in the chunk
+        query_terms = TermChunkMatrix.query_terms(question)
+        if not query_terms:
+            return []
+        scores = vectorstore['term_matrix'].score(query_terms)
         
-        for i, chunk in enumerate(chunks):
-            chunk_lower = chunk.lower()
-            score = 0
-            
-            # Split question into words for better matching
-            question_words = question_lower.split()
-            
-            # Score based on word matches
-            for word in question_words:
-                if len(word) > 2:  # Only consider words longer than 2 characters
-                    if word in chunk_lower:
-                        score += 1
-                    # Bonus for exact phrase match
-                    if question_lower in chunk_lower:
-                        score += 3
-            
-            if score > 0:
-                scored_chunks.append((chunk, score))
+        # Bonus of 3 per question word for the exact question; only chunks containing every word can have it
+        word_count = sum(query_terms.values())
+        for i in np.flatnonzero(scores == word_count):
+            if question_lower in chunks[i].lower():
+                scores[i] += 3 * word_count
         
-        # Sort by score and return top chunks
-        scored_chunks.sort(key=lambda x: x[1], reverse=True)
-          # Return top 3 most relevant chunks
-        return [chunk for chunk, score in scored_chunks[:3]]
+        candidates = np.flatnonzero(scores > 0)
+        if len(candidates) > max_chunks:
+            # Unique keys rank by score, then by position, like a stable sort would
+            keys = scores[candidates] * len(chunks) + (len(chunks) - 1 - candidates)
+            candidates = candidates[np.argpartition(-keys, max_chunks - 1)[:max_chunks]]
+        keys = scores[candidates] * len(chunks) + (len(chunks) - 1 - candidates)
+        return [int(i) for i in candidates[np.argsort(-keys)]]
     
     @staticmethod
     def generate_response(question, relevant_chunks):
@@ -279,20 +506,34 @@ class PDFProcessor:
         # Convert to string if it's not already
         text = str(chunk)
         
-        # Remove common PDF artifacts and metadata
-        text = re.sub(r'page_content[:\s]*[\'"]?', '', text, flags=re.IGNORECASE)
-        text = re.sub(r'metadata[:\s]*\{[^}]*\}', '', text, flags=re.IGNORECASE)
-        text = re.sub(r'source[:\s]*[\'"][^\'\"]*[\'"]', '', text, flags=re.IGNORECASE)
+        # Remove common PDF artifacts and metadata. Most answers have none, so each pattern
+        # only runs when its marker word occurs; removing one artifact can form another,
+        # so they are applied one after the other
+        lower = text.lower()
+        for marker, pattern in CHUNK_ARTIFACTS:
+            if marker in lower:
+                cleaned = pattern.sub('', text)
+                if cleaned != text:
+                    text = cleaned
+                    lower = text.lower()
         
-        # Remove page numbers at start/end
-        text = re.sub(r'^\s*\d+\s*\n', '', text)
-        text = re.sub(r'\n\s*\d+\s*$', '', text)
+        # Remove page numbers at start/end, only when there is a number to remove
+        stripped = text.strip()
+        if stripped[:1].isdigit():
+            match = LEADING_PAGE_NUMBER.match(text)
+            if match:
+                text = text[match.end():]
+        if stripped[-1:].isdigit():
+            text = TRAILING_PAGE_NUMBER.sub('', text, count=1)
         
-        # Clean up excessive whitespace
-        text = re.sub(r'\n\s*\n\s*\n+', '\n\n', text)
-        text = re.sub(r'\s+', ' ', text)
+        # Collapse whitespace runs to single spaces (str.split splits on the same characters as \s)
+        collapsed = ' '.join(text.split())
         
-        # Remove leading/trailing quotes or brackets
-        text = text.strip('\'"[]{}()')
+        # Remove leading/trailing quotes or brackets; an end that started with
+        # whitespace kept a space there, which shielded it from the strip
+        if not text[:1].isspace():
+            collapsed = collapsed.lstrip(CHUNK_STRIP_CHARS)
+        if not text[-1:].isspace():
+            collapsed = collapsed.rstrip(CHUNK_STRIP_CHARS)
         
-        return text.strip()
\ No newline at end of file
+        return collapsed.strip()
@@ -1,47 +1,66 @@
-from PyPDF2 import PdfReader
+from app.models.pdf_extraction import iter_pages
 import os
 import re
-from collections import Counter
+import math
+import logging
+
+import numpy as np
+
+from app.models.keyword_index import KeywordIndexBuilder, index_terms
+
+logger = logging.getLogger(__name__)
 
 # Set langchain as unavailable to avoid hanging imports
 LANGCHAIN_AVAILABLE = False
-print("PDF Processor loaded in enhanced simple mode")
+logger.info("PDF Processor loaded in enhanced simple mode")
+
+# BM25 ranking parameters
+BM25_K1 = 1.5
+BM25_B = 0.75
 
 class PDFProcessor:
     @staticmethod
-    def get_pdf_text(pdf_file):
-        """Extract text from PDF file with improved handling"""
-        text = ""
+    def iter_pdf_pages(pdf_file, progress_callback=None, workers=None):
+        """Yield the cleaned text of each PDF page, one page at a time"""
         try:
-            pdf_reader = PdfReader(pdf_file)
-            for page in pdf_reader.pages:
-                page_text = page.extract_text()
-                if page_text:
-                    # Clean text from unwanted characters
-                    cleaned_text = ' '.join(page_text.split())
-                    text += cleaned_text + "\n\n"  # Add separator between pages
+            # Large files are extracted page-parallel by a process pool
+            yield from iter_pages(pdf_file, progress_callback=progress_callback, workers=workers)
         except Exception as e:
-            print(f"Error extracting text from PDF: {str(e)}")
+            logger.error("Error extracting text from PDF: %s", e)
             raise
-        return text
+
+    @staticmethod
+    def get_pdf_text(pdf_file, progress_callback=None, workers=None):
+        """Extract text from PDF file with improved handling"""
+        # Add separator between pages
+        return "".join(page_text + "\n\n"
+                       for page_text in PDFProcessor.iter_pdf_pages(pdf_file, progress_callback, workers)
+                       if page_text)
 
     @staticmethod
     def get_text_chunks(text):
         """Split text into chunks with sentence-aware splitting"""
+        # Split by paragraphs first
+        return list(PDFProcessor.iter_text_chunks(text.split('\n\n')))
+
+    @staticmethod
+    def iter_text_chunks(paragraphs):
+        """
+        Sentence-aware chunking over a stream of paragraphs (e.g. extracted pages).
+        Chunks are yielded as soon as they are complete and the overlap is carried
+        across paragraph boundaries, so memory is bounded by the chunk size.
+        """
         # Enhanced chunking that tries to preserve sentence boundaries
         chunk_size = 1500
         chunk_overlap = 300
-        chunks = []
-        
-        # Split by paragraphs first
-        paragraphs = text.split('\n\n')
         current_chunk = ""
         
         for paragraph in paragraphs:
             # If adding this paragraph would exceed chunk size
             if len(current_chunk) + len(paragraph) > chunk_size:
                 if current_chunk:
-                    chunks.append(current_chunk.strip())
+                    if current_chunk.strip():
+                        yield current_chunk.strip()
                     # Start new chunk with overlap
                     current_chunk = current_chunk[-chunk_overlap:] + " " + paragraph
                 else:
@@ -50,11 +69,13 @@ class PDFProcessor:
                     for sentence in sentences:
                         if len(current_chunk) + len(sentence) > chunk_size:
                             if current_chunk:
-                                chunks.append(current_chunk.strip())
+                                if current_chunk.strip():
+                                    yield current_chunk.strip()
                                 current_chunk = sentence
                             else:
                                 # Even single sentence is too long, force split
-                                chunks.append(sentence[:chunk_size])
+                                if sentence[:chunk_size].strip():
+                                    yield sentence[:chunk_size]
                         else:
                             current_chunk += " " + sentence
             else:
@@ -62,30 +83,22 @@ class PDFProcessor:
         
         # Add the last chunk
         if current_chunk.strip():
-            chunks.append(current_chunk.strip())
-        
-        return [chunk for chunk in chunks if chunk.strip()]
+            yield current_chunk.strip()
 
     @staticmethod
     def get_vectorstore(text_chunks):
-        """Create enhanced simple vector store with keyword indexing"""
-        # Create keyword index for better searching
-        keyword_index = {}
-        
-        for i, chunk in enumerate(text_chunks):
-            # Extract important words (longer than 3 characters, not common words)
-            words = re.findall(r'\b[a-zA-Z]{4,}\b', chunk.lower())
-            common_words = {'that', 'this', 'with', 'have', 'will', 'from', 'they', 'been', 'were', 'said', 'each', 'which', 'their', 'time', 'would', 'there', 'could', 'other', 'more', 'very', 'what', 'know', 'just', 'first', 'get', 'over', 'think', 'also', 'its', 'our', 'out', 'many', 'then', 'them', 'these', 'so', 'some', 'her', 'would', 'make', 'like', 'into', 'him', 'has', 'two', 'more', 'go', 'no', 'way', 'could', 'my', 'than', 'first', 'been', 'call', 'who', 'its', 'now', 'find', 'long', 'down', 'day', 'did', 'get', 'come', 'made', 'may', 'part'}
-            
-            for word in words:
-                if word not in common_words:
-                    if word not in keyword_index:
-                        keyword_index[word] = []
-                    keyword_index[word].append(i)
+        """Create enhanced simple vector store with a BM25 inverted index (from a list or a stream of chunks)"""
+        # Chunks are indexed as they stream in, in a single pass
+        builder = KeywordIndexBuilder()
+        chunks = []
+        
+        for chunk in text_chunks:
+            chunks.append(chunk)
+            builder.add(chunk)
         
         return {
-            'chunks': text_chunks,
-            'keyword_index': keyword_index,
+            'chunks': chunks,
+            'keyword_index': builder.finish(),
             'type': 'enhanced_simple',
             'error': 'Enhanced simple mode - keyword-based search'
         }
@@ -102,44 +115,55 @@ class PDFProcessor:
 
     @staticmethod
     def search_relevant_content(vectorstore, query, max_chunks=3):
-        """Enhanced search function with scoring"""
+        """Enhanced search function with BM25 scoring over the inverted index"""
         if not isinstance(vectorstore, dict) or 'chunks' not in vectorstore:
             return []
             
         chunks = vectorstore['chunks']
-        keyword_index = vectorstore.get('keyword_index', {})
+        keyword_index = vectorstore['keyword_index']
+        total_chunks = keyword_index.chunk_count
         
-        # Prepare query words
-        query_words = re.findall(r'\b[a-zA-Z]{3,}\b', query.lower())
+        # Prepare query words the way chunks were indexed (lower-cased, without stop words)
+        query_words = set(index_terms(query))
         
-        # Score chunks based on keyword matches
-        chunk_scores = {}
+        # Accumulate BM25 scores from the postings of each query term, one array operation per term
+        chunk_scores = np.zeros(total_chunks)
+        length_norms = None
+        # Score of an average-length chunk holding each query term once; terms the document
+        # lacks count at the rarest term's weight, so they lower the relevance of every chunk
+        full_match_score = 0.0
         
         for word in query_words:
-            if word in keyword_index:
-                for chunk_idx in keyword_index[word]:
-                    if chunk_idx not in chunk_scores:
-                        chunk_scores[chunk_idx] = 0
-                    # Score based on word frequency and position
-                    chunk_scores[chunk_idx] += 1
-        
-        # Additional scoring based on direct text search
-        for i, chunk in enumerate(chunks):
-            chunk_lower = chunk.lower()
-            direct_matches = sum(1 for word in query_words if word in chunk_lower)
-            if direct_matches > 0:
-                if i not in chunk_scores:
-                    chunk_scores[i] = 0
-                chunk_scores[i] += direct_matches * 0.5
-        
-        # Sort chunks by score and return top matches
-        sorted_chunks = sorted(chunk_scores.items(), key=lambda x: x[1], reverse=True)
+            term_postings = keyword_index.term_postings(word)
+            if term_postings is None:
+                full_match_score += math.log(1 + (total_chunks + 0.5) / 0.5)
+                continue
+            if length_norms is None:
+                length_norms = keyword_index.length_norms(BM25_K1, BM25_B)
+            chunk_ids, term_frequencies = term_postings
+            document_frequency = len(chunk_ids)
+            idf = math.log(1 + (total_chunks - document_frequency + 0.5) / (document_frequency + 0.5))
+            full_match_score += idf
+            chunk_scores[chunk_ids] += \
+                idf * term_frequencies * (BM25_K1 + 1) / (term_frequencies + length_norms[chunk_ids])
+        
+        # Top-k by score; ties go to the earlier chunk. argpartition finds the k-th best score in
+        # linear time, so only chunks scoring at least that much (k plus any ties) are sorted
+        candidates = np.flatnonzero(chunk_scores > 0)
+        if len(candidates) > max_chunks:
+            scores = chunk_scores[candidates]
+            kth_score = scores[np.argpartition(-scores, max_chunks - 1)[max_chunks - 1]]
+            candidates = candidates[scores >= kth_score]
+        candidates = candidates[np.lexsort((candidates, -chunk_scores[candidates]))][:max_chunks]
+        top_chunks = [(int(i), float(chunk_scores[i])) for i in candidates]
+        
         relevant_chunks = []
         
-        for chunk_idx, score in sorted_chunks[:max_chunks]:
+        for chunk_idx, score in top_chunks:
             relevant_chunks.append({
                 'content': chunks[chunk_idx],
                 'score': score,
+                'relevance': score / full_match_score,
                 'index': chunk_idx
             })
         
@@ -203,11 +227,12 @@ class PDFProcessor:
                     content = content[:400] + "..."
                 response += f"**Informasi {i}:**\n{content}\n\n"
         
-        # Add confidence indicator
-        total_score = sum(chunk['score'] for chunk in relevant_chunks)
-        if total_score >= 3:
+        # Add confidence indicator; BM25 scores grow with the query and the document, so the best
+        # chunk's relevance (its score relative to a full match of the query terms) is used instead
+        relevance = max(chunk['relevance'] for chunk in relevant_chunks)
+        if relevance >= 0.8:
             confidence = "tinggi"
-        elif total_score >= 1.5:
+        elif relevance >= 0.4:
             confidence = "sedang"
         else:
             confidence = "rendah"
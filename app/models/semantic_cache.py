@@ -0,0 +1,172 @@
+from collections import OrderedDict
+import logging
+import re
+import threading
+import time
+
+import numpy as np
+
+from app.models.embedding_cache import HashingEmbeddings, get_embedder, get_embedding_backend
+
+logger = logging.getLogger(__name__)
+
+# Tokens that change what a question asks while barely moving its embedding:
+# numbers ("phase 1" / "phase 2") and negations ("allowed" / "not allowed")
+NUMBER_PATTERN = re.compile(r'\d+(?:[.,]\d+)*')
+NEGATION_PATTERN = re.compile(r"\b(?:not|no|never|none|nor|without|cannot|tidak|tak|bukan|belum|tanpa|jangan)\b|n't\b")
+
+
+def question_signature(question):
+    """Numbers and negations of a question; a cached answer only matches questions with the same ones"""
+    lowered = question.lower()
+    return (tuple(NUMBER_PATTERN.findall(lowered)),
+            tuple(sorted(match.group(0) for match in NEGATION_PATTERN.finditer(lowered))))
+
+
+class SemanticCache:
+    """
+    Per-document cache of answers looked up by question similarity.
+
+    Each document keeps a small matrix of L2-normalized question
+    embeddings. A new question is embedded once and compared against the
+    document's past questions with one matrix-vector product; the best
+    match above `threshold` (cosine) with the same numbers and negations
+    (question_signature) returns its cached answer. With at
+    most max_entries questions per document an exact scan is as fast as
+    an approximate index would be. Entries follow the same rules as
+    AnswerCache: only history-free answers, tied to the index version they
+    were answered from, invalidated with the index.
+    """
+
+    def __init__(self, embedder=None, threshold=0.9, max_entries=256, max_documents=1000, ttl=24 * 60 * 60):
+        self.embedder = embedder
+        self.threshold = threshold
+        self.max_entries = max_entries
+        self.max_documents = max_documents
+        self.ttl = ttl
+        self.enabled = True
+        self.documents = OrderedDict()  # document_key -> {'version', 'vectors': ndarray, 'entries': [...]}
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+
+    def init_app(self, app):
+        self.threshold = app.config.get('SEMANTIC_CACHE_THRESHOLD', self.threshold)
+        self.max_entries = app.config.get('SEMANTIC_CACHE_MAX_ENTRIES', self.max_entries)
+        self.ttl = app.config.get('ANSWER_CACHE_TTL_SECONDS', self.ttl)
+        self.enabled = app.config.get('SEMANTIC_CACHE_ENABLED', False)
+        self.embedder = None
+        if not self.enabled:
+            return
+
+        # 'model' uses the document embedding backend (one API call per question). Word hashing
+        # scores "phase 1?" and "phase 2?" as near duplicates, so it is only for tests, and a
+        # 'model' backend that resolves to it leaves the cache off
+        if app.config.get('SEMANTIC_CACHE_EMBEDDER', 'model') == 'hashing':
+            self.embedder = HashingEmbeddings()
+        elif get_embedding_backend(app) in ('hashing', 'fake'):
+            logger.warning("Semantic cache disabled: the embedding backend is not a language model")
+            self.enabled = False
+        else:
+            try:
+                self.embedder = get_embedder(app)
+            except ValueError as e:
+                logger.warning("Semantic cache disabled: %s", e)
+                self.enabled = False
+
+    def embed(self, question):
+        """Normalized float32 embedding of a question"""
+        vector = np.asarray(self.embedder.embed_query(question), dtype=np.float32)
+        norm = np.linalg.norm(vector)
+        return vector / norm if norm else vector
+
+    def embed_question(self, question):
+        """Embedding to pass to get() and then add(), so a miss embeds the question once; None when off"""
+        if not self.enabled or self.embedder is None:
+            return None
+        return self.embed(question)
+
+    def get(self, document_key, question, vector=None, version=None):
+        """Return the cached {'answer', 'chunk_ids', 'question', 'similarity'} closest to a question, or None"""
+        if not self.enabled or self.embedder is None:
+            return None
+        if vector is None:
+            vector = self.embed(question)
+
+        with self._lock:
+            index = self.documents.get(document_key)
+            match = None
+            if index is not None and index['version'] != version:
+                # Answered from an index that has since been rebuilt
+                del self.documents[document_key]
+                index = None
+            if index is not None and len(index['entries']):
+                similarities = index['vectors'] @ vector
+                signature = question_signature(question)
+                # Most similar first; the first candidate below the threshold ends the search
+                for best in np.argsort(-similarities):
+                    if similarities[best] < self.threshold:
+                        break
+                    entry = index['entries'][best]
+                    if entry['signature'] == signature and time.monotonic() - entry['stored_at'] <= self.ttl:
+                        match = dict(entry, similarity=float(similarities[best]))
+                        self.documents.move_to_end(document_key)
+                        break
+            if match is None:
+                self.misses += 1
+            else:
+                self.hits += 1
+            return match
+
+    def add(self, document_key, question, answer, chunk_ids=None, version=None, vector=None):
+        """Remember an answer under its question's embedding"""
+        if not self.enabled or self.embedder is None:
+            return
+        if vector is None:
+            vector = self.embed(question)
+        entry = {
+            'question': question,
+            'answer': answer,
+            'chunk_ids': list(chunk_ids or []),
+            'signature': question_signature(question),
+            'stored_at': time.monotonic()
+        }
+
+        with self._lock:
+            index = self.documents.get(document_key)
+            if index is None or index['version'] != version:
+                index = {'version': version, 'vectors': np.empty((0, vector.shape[0]), dtype=np.float32),
+                         'entries': []}
+                self.documents[document_key] = index
+            index['vectors'] = np.vstack([index['vectors'], vector])
+            index['entries'].append(entry)
+
+            # Oldest questions go first within a document, least recently used documents overall
+            if len(index['entries']) > self.max_entries:
+                index['vectors'] = index['vectors'][-self.max_entries:]
+                index['entries'] = index['entries'][-self.max_entries:]
+            self.documents.move_to_end(document_key)
+            while len(self.documents) > self.max_documents:
+                self.documents.popitem(last=False)
+
+    def invalidate(self, document_key):
+        with self._lock:
+            self.documents.pop(document_key, None)
+
+    def clear(self):
+        with self._lock:
+            self.documents.clear()
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'documents': len(self.documents),
+                'entries': sum(len(index['entries']) for index in self.documents.values()),
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_rate': round(self.hits / lookups, 4) if lookups else 0.0
+            }
+
+
+semantic_cache = SemanticCache()
@@ -0,0 +1,175 @@
+from collections import OrderedDict
+import sys
+import threading
+import time
+
+from app.models.chunk_store import ChunkStore
+
+# Rough fixed cost of a session beyond its data (chain objects, dicts, prompt)
+SESSION_OVERHEAD_BYTES = 64 * 1024
+
+
+def estimate_vectorstore_size(vectorstore):
+    """Approximate resident bytes of a vectorstore: chunk texts, keyword index and FAISS vectors"""
+    if vectorstore is None:
+        return 0
+
+    if isinstance(vectorstore, dict):
+        chunks = vectorstore.get('chunks', [])
+        if isinstance(chunks, ChunkStore):
+            # Memory-mapped from the index directory: page cache shared by all workers, not heap
+            size = sys.getsizeof(chunks)
+        else:
+            size = sum(sys.getsizeof(chunk) for chunk in chunks)
+        keyword_index = vectorstore.get('keyword_index')
+        if keyword_index is not None:
+            size += keyword_index.nbytes
+        term_matrix = vectorstore.get('term_matrix')
+        if term_matrix is not None:
+            size += term_matrix.nbytes + sum(sys.getsizeof(term) for term in term_matrix.vocabulary)
+        return size
+
+    # LangChain FAISS: float32 vectors plus the documents kept in its docstore
+    size = 0
+    index = getattr(vectorstore, 'index', None)
+    if index is not None:
+        size += index.ntotal * index.d * 4
+    documents = getattr(getattr(vectorstore, 'docstore', None), '_dict', {})
+    size += sum(sys.getsizeof(getattr(doc, 'page_content', '')) for doc in documents.values())
+    return size
+
+
+def estimate_session_size(session):
+    """Approximate resident bytes of a session: index, chunks and chat history"""
+    size = SESSION_OVERHEAD_BYTES
+    chain = session.get('conversation')
+
+    if isinstance(chain, dict):
+        size += estimate_vectorstore_size(chain.get('vectorstore'))
+    elif chain is not None:
+        retriever = getattr(chain, 'retriever', None)
+        size += estimate_vectorstore_size(getattr(retriever, 'vectorstore', None))
+        # ConversationBufferMemory keeps every exchange
+        messages = getattr(getattr(getattr(chain, 'memory', None), 'chat_memory', None), 'messages', [])
+        size += sum(sys.getsizeof(getattr(message, 'content', '')) for message in messages)
+
+    size += sum(sys.getsizeof(message.get('content', '')) for message in session.get('chat_history', []))
+    return size
+
+
+class SessionCache:
+    """
+    Bounded in-process cache of loaded AI sessions (conversation chain and chat history).
+
+    Entries are evicted least recently used first once their estimated size
+    exceeds max_bytes, and expire after ttl seconds without use. An evicted
+    session costs nothing but a reload: its index is persisted in the
+    IndexStore and get_document_session rebuilds it on the next question.
+    """
+
+    def __init__(self, max_bytes=256 * 1024 * 1024, ttl=60 * 60):
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self.entries = OrderedDict()  # key -> (session, size, last_used)
+        self.total_bytes = 0
+        self.evictions = 0
+        self._lock = threading.RLock()
+
+    def init_app(self, app):
+        self.max_bytes = app.config.get('SESSION_CACHE_MAX_BYTES', self.max_bytes)
+        self.ttl = app.config.get('SESSION_CACHE_TTL_SECONDS', self.ttl)
+
+    def __contains__(self, key):
+        return self.get(key) is not None
+
+    def __getitem__(self, key):
+        session = self.get(key)
+        if session is None:
+            raise KeyError(key)
+        return session
+
+    def __setitem__(self, key, session):
+        self.set(key, session)
+
+    def __len__(self):
+        with self._lock:
+            return len(self.entries)
+
+    def get(self, key, default=None):
+        """Return a live session and mark it as most recently used"""
+        with self._lock:
+            entry = self.entries.get(key)
+            if entry is None:
+                return default
+            session, size, last_used = entry
+            now = time.monotonic()
+            if now - last_used > self.ttl:
+                self._remove(key)
+                return default
+            self.entries[key] = (session, size, now)
+            self.entries.move_to_end(key)
+            return session
+
+    def set(self, key, session):
+        """Store a session, evicting others to stay within the byte budget"""
+        size = estimate_session_size(session)
+        with self._lock:
+            self._remove(key)
+            self.entries[key] = (session, size, time.monotonic())
+            self.total_bytes += size
+            self._evict(keep=key)
+
+    def resize(self, key):
+        """Re-measure a session after its chat history grew"""
+        with self._lock:
+            entry = self.entries.get(key)
+            if entry is None:
+                return
+            session, old_size, last_used = entry
+            size = estimate_session_size(session)
+            self.entries[key] = (session, size, last_used)
+            self.total_bytes += size - old_size
+            self._evict(keep=key)
+
+    def pop(self, key, default=None):
+        with self._lock:
+            entry = self._remove(key)
+            return entry[0] if entry else default
+
+    def clear(self):
+        with self._lock:
+            self.entries.clear()
+            self.total_bytes = 0
+
+    def _remove(self, key):
+        entry = self.entries.pop(key, None)
+        if entry is not None:
+            self.total_bytes -= entry[1]
+        return entry
+
+    def _evict(self, keep=None):
+        now = time.monotonic()
+        for key in [key for key, (_, _, last_used) in self.entries.items() if now - last_used > self.ttl]:
+            self._remove(key)
+            self.evictions += 1
+
+        # Oldest first; the session being used right now stays even if it alone exceeds the budget
+        while self.total_bytes > self.max_bytes and len(self.entries) > 1:
+            key = next(iter(self.entries))
+            if key == keep:
+                self.entries.move_to_end(key)
+                key = next(iter(self.entries))
+            self._remove(key)
+            self.evictions += 1
+
+    def stats(self):
+        with self._lock:
+            return {
+                'entries': len(self.entries),
+                'bytes': self.total_bytes,
+                'max_bytes': self.max_bytes,
+                'evictions': self.evictions
+            }
+
+
+session_cache = SessionCache()
@@ -0,0 +1,94 @@
+from collections import Counter
+import re
+
+import numpy as np
+
+# Terms are runs of word characters; a question word made of word characters occurs in a
+# chunk exactly when it is a substring of one of the chunk's terms
+TOKEN_PATTERN = re.compile(r'\w+')
+
+
+class TermChunkMatrix:
+    """
+    Sparse binary term x chunk matrix for simple-mode keyword search.
+
+    Stored column-compressed: the chunks containing vocabulary[t] are
+    chunk_ids[offsets[t]:offsets[t + 1]]. The vocabulary is also kept as
+    one newline-separated string, so the terms containing a question word
+    are found with a single C-level substring scan instead of a Python
+    loop over chunks.
+    """
+
+    def __init__(self, vocabulary, offsets, chunk_ids, chunk_count):
+        self.vocabulary = vocabulary
+        self.offsets = offsets
+        self.chunk_ids = chunk_ids
+        self.chunk_count = chunk_count
+        self.joined = '\n' + '\n'.join(vocabulary) + '\n'
+        lengths = np.fromiter((len(term) + 1 for term in vocabulary), dtype=np.int64, count=len(vocabulary))
+        # Position of each term in joined (just after its leading newline)
+        self.starts = np.concatenate(([1], 1 + np.cumsum(lengths)[:-1])) if len(vocabulary) else lengths
+
+    @classmethod
+    def build(cls, chunks):
+        postings = {}
+        chunk_count = 0
+        for chunk_idx, chunk in enumerate(chunks):
+            chunk_count += 1
+            for term in set(TOKEN_PATTERN.findall(chunk.lower())):
+                postings.setdefault(term, []).append(chunk_idx)
+
+        vocabulary = sorted(postings)
+        offsets = np.zeros(len(vocabulary) + 1, dtype=np.int64)
+        offsets[1:] = np.cumsum([len(postings[term]) for term in vocabulary])
+        chunk_ids = np.fromiter((chunk_idx for term in vocabulary for chunk_idx in postings[term]),
+                                dtype=np.int32, count=int(offsets[-1]))
+        return cls(vocabulary, offsets, chunk_ids, chunk_count)
+
+    @staticmethod
+    def query_terms(question):
+        """Question words counted like the original matcher: lower-cased, longer than 2 characters"""
+        return Counter(term for term in TOKEN_PATTERN.findall(question.lower()) if len(term) > 2)
+
+    def matching_terms(self, word):
+        """Ids of the vocabulary terms that contain word"""
+        positions = [match.start() for match in re.finditer(re.escape(word), self.joined)]
+        if not positions:
+            return np.empty(0, dtype=np.int64)
+        return np.unique(np.searchsorted(self.starts, positions, side='right') - 1)
+
+    def chunks_containing(self, word):
+        """Boolean mask of the chunks in which word occurs"""
+        mask = np.zeros(self.chunk_count, dtype=bool)
+        term_ids = self.matching_terms(word)
+        if len(term_ids):
+            mask[np.concatenate([self.chunk_ids[self.offsets[t]:self.offsets[t + 1]] for t in term_ids])] = True
+        return mask
+
+    def score(self, query_terms):
+        """Weighted count of the query words found in each chunk (the matrix-vector product)"""
+        scores = np.zeros(self.chunk_count, dtype=np.int64)
+        for word, weight in query_terms.items():
+            scores += weight * self.chunks_containing(word)
+        return scores
+
+    @property
+    def nbytes(self):
+        """Heap bytes; posting arrays memory-mapped from an index directory live in the shared page cache"""
+        arrays = sum(array.nbytes for array in (self.offsets, self.chunk_ids) if not isinstance(array, np.memmap))
+        return arrays + self.starts.nbytes + len(self.joined) * 2
+
+    def to_arrays(self):
+        """Arrays for np.savez; the vocabulary is stored as UTF-8 bytes"""
+        return {
+            'vocabulary': np.frombuffer(self.joined[1:-1].encode('utf-8'), dtype=np.uint8),
+            'offsets': self.offsets,
+            'chunk_ids': self.chunk_ids,
+            'chunk_count': np.array(self.chunk_count)
+        }
+
+    @classmethod
+    def from_arrays(cls, arrays):
+        joined = arrays['vocabulary'].tobytes().decode('utf-8')
+        vocabulary = joined.split('\n') if joined else []
+        return cls(vocabulary, arrays['offsets'], arrays['chunk_ids'], int(arrays['chunk_count']))
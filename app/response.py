@@ -1,11 +1,13 @@
 from flask import jsonify, make_response
 
-def success_response(data=None, message="Success", status_code=200):
+def success_response(data=None, message="Success", status_code=200, pagination=None):
     response = {
         "status": "success",
         "message": message,
         "data": data
     }
+    if pagination is not None:
+        response["pagination"] = pagination
     return make_response(jsonify(response), status_code)
 
 def error_response(message="Error", status_code=400):
@@ -1,7 +1,15 @@
-from flask import Blueprint, request, jsonify, current_app
+from flask import Blueprint, request, jsonify, current_app, Response, stream_with_context, send_file
 from flask_login import current_user, login_required
 from flask_jwt_extended import jwt_required, get_jwt_identity
 from app.models.pdf_processor import PDFProcessor
+from app.models.index_store import get_index_store
+from app.models.ingestion_queue import (ingestion_queue, build_vectorstore, ACTIVE_STATUSES, STATUS_PENDING,
+                                        STATUS_QUEUED, STATUS_READY, STATUS_FAILED)
+from app.models.session_cache import session_cache
+from app.models.answer_cache import answer_cache
+from app.models.semantic_cache import semantic_cache
+from app.models.embedding_cache import get_embedding_cache
+from app.models.metrics import metrics
 from app.models.documents import Document
 from app.models.conversation import Conversation
 from app.models.message import Message
@@ -9,14 +17,28 @@ from app.models.user import User
 from app import db, response
 from app.controller import usercontroller
 from werkzeug.utils import secure_filename
+from sqlalchemy import and_, or_
+from collections import Counter
+from contextlib import ExitStack
 from datetime import datetime, timezone
+import hashlib
+import json
+import logging
 import os
+import random
+import time
 import uuid
+import zipfile
+import zlib
 
 api = Blueprint('api', __name__)
+logger = logging.getLogger(__name__)
 
-# Store user sessions in memory (in production, should use a database)
-USER_SESSIONS = {}
+# Bytes read per block while streaming an upload to disk
+UPLOAD_BLOCK_SIZE = 1024 * 1024
+
+# Largest page the listing endpoints return for ?limit=
+MAX_PAGE_SIZE = 100
 
 # ============ AUTH API ENDPOINTS ============
 @api.route('/auth/register', methods=['POST'])
@@ -40,13 +62,12 @@ def get_profile():
     """Get user profile information"""
     try:
         user_id = get_jwt_identity()
-        print(f"JWT user_id: {user_id}")  # Debug log
         
         if not user_id:
             return response.error_response('User not authenticated', 401)
             
         user = User.query.get(user_id)
-        print(f"User found: {user}")  # Debug log
+        logger.debug("Profile requested", extra={'user_id': user_id, 'found': user is not None})
         
         if not user:
             return response.error_response('User not found', 404)
@@ -71,11 +92,10 @@ def get_profile():
             }
         }
         
-        print(f"Returning user data: {user_data}")  # Debug log
         return response.success_response(user_data, 'Profile retrieved successfully', 200)
         
     except Exception as e:
-        print(f"Error in get_profile: {str(e)}")  # Debug log
+        logger.exception("Error in get_profile")
         return response.error_response(f'Server error: {str(e)}', 500)
 
 @api.route('/auth/profile', methods=['PUT'])
@@ -213,6 +233,39 @@ def ping():
     """Health check endpoint"""
     return response.success_response('', 'API is running', 200)
 
+def collect_app_metrics():
+    """Cache counters, session store size and ingestion queue depth for the metrics endpoint"""
+    caches = {'answer': answer_cache.stats(), 'semantic': semantic_cache.stats()}
+    if current_app.config.get('EMBEDDING_CACHE_ENABLED', True):
+        caches['embedding'] = get_embedding_cache(current_app).stats()
+    sessions = session_cache.stats()
+    queue_depth = dict(db.session.query(Document.status, db.func.count(Document.id)).filter(
+        Document.status.in_(ACTIVE_STATUSES)).group_by(Document.status).all())
+    
+    return [
+        ('pdfchat_cache_hits_total', 'counter', 'Cache lookups that found an entry',
+         [({'cache': name}, stats['hits']) for name, stats in caches.items()]),
+        ('pdfchat_cache_misses_total', 'counter', 'Cache lookups that found nothing',
+         [({'cache': name}, stats['misses']) for name, stats in caches.items()]),
+        ('pdfchat_cache_entries', 'gauge', 'Entries held in each cache',
+         [({'cache': name}, stats['entries']) for name, stats in caches.items()]),
+        ('pdfchat_session_store_entries', 'gauge', 'AI sessions loaded in memory',
+         [({}, sessions['entries'])]),
+        ('pdfchat_session_store_bytes', 'gauge', 'Estimated size of the AI sessions loaded in memory',
+         [({}, sessions['bytes'])]),
+        ('pdfchat_session_store_evictions_total', 'counter', 'AI sessions evicted for size or age',
+         [({}, sessions['evictions'])]),
+        ('pdfchat_ingestion_queue_depth', 'gauge', 'Documents waiting for or in background processing',
+         [({'status': status}, queue_depth.get(status, 0)) for status in ACTIVE_STATUSES])
+    ]
+
+@api.route('/metrics', methods=['GET'])
+def get_metrics():
+    """Stage timings and app metrics of this worker process in Prometheus text format"""
+    if not metrics.enabled:
+        return response.error_response('Metrics are disabled', 404)
+    return Response(metrics.render(collect_app_metrics()), mimetype='text/plain; version=0.0.4')
+
 # Utility functions
 def allowed_file(filename):
     return '.' in filename and filename.rsplit('.', 1)[1].lower() == 'pdf'
@@ -230,24 +283,357 @@ def get_user_from_jwt():
     except (ValueError, TypeError):
         return None
 
+def parse_page_args(args, cursor_arg='after'):
+    """
+    Keyset pagination arguments (?after=<timestamp>,<id>&limit=) as (after, limit).
+    after is a (datetime, id) pair or None; limit is None when the client asked for
+    neither, which returns the whole listing. Raises ValueError on bad values.
+    """
+    after = args.get(cursor_arg)
+    limit = args.get('limit')
+    if after is None and limit is None:
+        return None, None
+
+    limit = min(int(limit), MAX_PAGE_SIZE) if limit is not None else MAX_PAGE_SIZE
+    if limit < 1:
+        raise ValueError('limit must be positive')
+
+    if after:
+        timestamp, row_id = after.rsplit(',', 1)
+        timestamp = datetime.fromisoformat(timestamp)
+        if timestamp.tzinfo is not None:
+            # Timestamps are stored as naive UTC
+            timestamp = timestamp.astimezone(timezone.utc).replace(tzinfo=None)
+        after = (timestamp, int(row_id))
+    return after or None, limit
+
+def parse_message_page_args(args):
+    """
+    Message history paging as (cursor, limit, newest_first). ?before=<cursor>&limit=
+    pages backwards from the newest message (an empty before asks for the newest
+    page); ?after= pages forwards from the oldest, like the other listings.
+    """
+    newest_first = 'before' in args
+    cursor, limit = parse_page_args(args, 'before' if newest_first else 'after')
+    return cursor, limit, newest_first
+
+def encode_cursor(timestamp, row_id):
+    return f"{timestamp.isoformat()},{row_id}"
+
+def keyset_condition(sort_column, id_column, after, descending=True):
+    """Rows strictly past the (timestamp, id) cursor in (sort_column, id_column) order"""
+    timestamp, row_id = after
+    if descending:
+        return or_(sort_column < timestamp, and_(sort_column == timestamp, id_column < row_id))
+    return or_(sort_column > timestamp, and_(sort_column == timestamp, id_column > row_id))
+
+def keyset_order(sort_column, id_column, descending=True):
+    if descending:
+        return sort_column.desc(), id_column.desc()
+    return sort_column.asc(), id_column.asc()
+
+def page_rows(rows, limit, cursor_key):
+    """
+    Trim rows fetched with limit + 1 to one page.
+    Returns (rows, pagination) where pagination holds the cursor of the next page, if any.
+    """
+    if limit is None:
+        return rows, None
+    has_more = len(rows) > limit
+    rows = rows[:limit]
+    next_cursor = encode_cursor(*cursor_key(rows[-1])) if has_more else None
+    return rows, {'limit': limit, 'next_cursor': next_cursor}
+
+def paginate(query, sort_column, id_column, after, limit, descending=True):
+    """Run a query one keyset page at a time (see parse_page_args); returns (rows, pagination)"""
+    if after is not None:
+        query = query.filter(keyset_condition(sort_column, id_column, after, descending))
+    query = query.order_by(*keyset_order(sort_column, id_column, descending))
+    if limit is not None:
+        query = query.limit(limit + 1)
+    return page_rows(query.all(), limit, lambda row: (getattr(row, sort_column.key), getattr(row, id_column.key)))
+
+def save_vectorstore(index_key, vectorstore):
+    """
+    Persist a vectorstore so other workers and restarts can reuse it.
+    Returns the vectorstore to keep in the session: for keyword indexes the
+    memory-mapped copy just saved, so its chunk texts leave the heap.
+    """
+    try:
+        index_store = get_index_store()
+        index_store.save(index_key, vectorstore)
+    except Exception as e:
+        # The in-memory session still works, it just won't survive a restart
+        logger.error("Error saving index %s: %s", index_key, e)
+        return vectorstore
+    if isinstance(vectorstore, dict):
+        return index_store.load(index_key) or vectorstore
+    return vectorstore
+
+def stream_to_temp(stream, upload_folder, max_bytes=None):
+    """Write a stream to a temp file while hashing it; returns (temp_path, sha256 hex digest)"""
+    digest = hashlib.sha256()
+    temp_path = os.path.join(upload_folder, f".upload-{uuid.uuid4()}.tmp")
+    size = 0
+    try:
+        with open(temp_path, 'wb') as out:
+            for block in iter(lambda: stream.read(UPLOAD_BLOCK_SIZE), b''):
+                size += len(block)
+                if max_bytes is not None and size > max_bytes:
+                    raise ValueError(f"File is larger than {max_bytes // (1024 * 1024)}MB")
+                digest.update(block)
+                out.write(block)
+    except Exception:
+        if os.path.exists(temp_path):
+            os.remove(temp_path)
+        raise
+    return temp_path, digest.hexdigest()
+
+def stream_upload_to_temp(file, upload_folder):
+    """Write an uploaded file to a temp file while hashing it; returns (temp_path, sha256 hex digest)"""
+    return stream_to_temp(file.stream, upload_folder)
+
+def is_zip_file(filename):
+    return '.' in filename and filename.rsplit('.', 1)[1].lower() == 'zip'
+
+def iter_batch_entries(files):
+    """
+    Yield (filename, stream, error) for every file of a batch upload.
+    Zip archives are opened from the request's spooled temp file and read one
+    member at a time, so neither an archive nor a member is held in memory.
+    """
+    for file in files:
+        if allowed_file(file.filename):
+            yield file.filename, file.stream, None
+            continue
+        if not is_zip_file(file.filename):
+            yield file.filename, None, 'Only PDF and zip files are allowed'
+            continue
+        
+        try:
+            archive = zipfile.ZipFile(file.stream)
+        except zipfile.BadZipFile:
+            yield file.filename, None, 'Not a valid zip archive'
+            continue
+        
+        with archive:
+            for member in archive.infolist():
+                name = os.path.basename(member.filename)
+                # Folders, macOS resource forks and hidden files are not uploads
+                if member.is_dir() or member.filename.startswith('__MACOSX/') or name.startswith('.'):
+                    continue
+                if not allowed_file(name):
+                    yield name, None, 'Only PDF files are allowed'
+                    continue
+                try:
+                    stream = archive.open(member)
+                except (RuntimeError, NotImplementedError, zipfile.BadZipFile) as e:
+                    # Encrypted or unsupported compression
+                    yield name, None, str(e)
+                    continue
+                with stream:
+                    yield name, stream, None
+
+def batch_documents(batch_id, user_id):
+    """Status columns of the documents of a batch upload, in upload order"""
+    return Document.query.filter_by(batch_id=batch_id, user_id=user_id).with_entities(
+        Document.id, Document.original_filename, Document.status, Document.progress,
+        Document.processed, Document.processing_error
+    ).order_by(Document.id).all()
+
+def batch_status_data(batch_id, documents):
+    """Per-file and overall processing state of a batch upload"""
+    statuses = Counter(document.status for document in documents)
+    return {
+        'batch_id': batch_id,
+        'total': len(documents),
+        'statuses': dict(statuses),
+        'progress': sum(document.progress for document in documents) // len(documents) if documents else 100,
+        # Pending documents of a batch wait for another job building the same index
+        'done': not any(statuses[status] for status in ACTIVE_STATUSES + (STATUS_PENDING,)),
+        'documents': [dict(document_status_data(document), filename=document.original_filename)
+                      for document in documents]
+    }
+
+def release_document_content(document):
+    """
+    Delete a document row and drop its file and index once no other document references them.
+    Documents with the same content_hash share one file and one index; the rows
+    referencing a hash are its reference count.
+    """
+    index_store = get_index_store()
+    with index_store.lock(document.index_key):
+        content_hash = document.content_hash
+        index_key = document.index_key
+        file_path = document.file_path
+        was_indexing = document.status in ACTIVE_STATUSES
+        
+        db.session.delete(document)
+        db.session.commit()
+        
+        if content_hash and Document.query.filter_by(content_hash=content_hash).count() > 0:
+            if was_indexing and not indexing_in_progress(content_hash):
+                # Uploads waiting for this document's job would never be settled; one of them builds the index
+                waiting = Document.query.filter_by(content_hash=content_hash, status=STATUS_PENDING) \
+                    .order_by(Document.id).first()
+                if waiting:
+                    ingestion_queue.enqueue(waiting)
+            return
+        
+        if file_path and os.path.exists(file_path):
+            os.remove(file_path)
+        index_store.delete(index_key)
+        answer_cache.invalidate(index_key)
+        semantic_cache.invalidate(index_key)
+
+def create_session(session_id, vectorstore, pdf_name, upload_time, index_version=None):
+    """Build a conversation chain for a vectorstore and cache it in the session cache"""
+    session = {
+        'conversation': PDFProcessor.get_conversation_chain(vectorstore),
+        'chat_history': [],
+        'pdf_name': pdf_name,
+        'upload_time': upload_time,
+        'index_version': index_version  # IndexStore.version() of the index the session was loaded from
+    }
+    session_cache.set(session_id, session)
+    return session
+
+def get_current_session(document, app=None):
+    """
+    Return the document's session from the session cache, or None.
+    A session loaded from an index that any worker has since rebuilt is dropped.
+    """
+    session = session_cache.get(document.session_id)
+    if session is None:
+        return None
+    if session['index_version'] == get_index_store(app).version(document.index_key):
+        return session
+    session_cache.pop(document.session_id, None)
+    return None
+
+def get_document_session(document):
+    """Return the AI session for a document, loading or rebuilding its index if needed"""
+    session = get_current_session(document)
+    if session is not None:
+        return session
+
+    # Lazily load the index persisted by whichever worker processed this content
+    index_store = get_index_store()
+    index_version = index_store.version(document.index_key)
+    vectorstore = index_store.load(document.index_key)
+
+    if vectorstore is None:
+        logger.info("Session not found, processing PDF", extra={'document_id': document.id})
+
+        if not os.path.exists(document.file_path):
+            raise FileNotFoundError('Document file not found')
+
+        vectorstore = build_vectorstore(document.file_path)
+        vectorstore = save_vectorstore(document.index_key, vectorstore)
+        index_version = index_store.version(document.index_key)
+
+    return create_session(
+        document.session_id,
+        vectorstore,
+        document.original_filename,
+        document.upload_date.strftime("%Y-%m-%d %H:%M:%S"),
+        index_version
+    )
+
+@ingestion_queue.on_processed
+def drop_stale_session(document_id, session_id):
+    """Forget the in-memory session and cached answers once a background job rebuilt the index"""
+    session_cache.pop(session_id, None)
+    document = Document.query.get(document_id)
+    if document:
+        answer_cache.invalidate(document.index_key)
+        semantic_cache.invalidate(document.index_key)
+
+@ingestion_queue.on_processed
+def settle_waiting_duplicates(document_id, session_id):
+    """Give uploads that waited for this job's index (same content, still pending) its outcome"""
+    document = Document.query.get(document_id)
+    if document is None or not document.content_hash or document.status not in (STATUS_READY, STATUS_FAILED):
+        return
+    if document.status == STATUS_READY:
+        result = {'status': STATUS_READY, 'progress': 100, 'processed': True, 'processing_error': None}
+    else:
+        result = {'status': STATUS_FAILED, 'processed': False, 'processing_error': document.processing_error}
+    result['status_updated_at'] = datetime.now(timezone.utc)
+    Document.query.filter(
+        Document.content_hash == document.content_hash,
+        Document.status == STATUS_PENDING
+    ).update(result, synchronize_session=False)
+    db.session.commit()
+
+def indexing_in_progress(content_hash):
+    """True while a queued or running job is building the index of content_hash"""
+    return db.session.query(Document.query.filter(
+        Document.content_hash == content_hash,
+        Document.status.in_(ACTIVE_STATUSES)
+    ).exists()).scalar()
+
+def document_in_progress(document):
+    """True while a job builds the document's index: its own, or that of a pending duplicate upload"""
+    if document.status in ACTIVE_STATUSES:
+        return True
+    return document.status == STATUS_PENDING and bool(document.content_hash) \
+        and indexing_in_progress(document.content_hash)
+
+def resume_pending_document(document):
+    """
+    Start processing a pending document that no job is building (e.g. one uploaded
+    before the ingestion queue), so clients polling its status see it finish.
+    """
+    if document.status != STATUS_PENDING:
+        return
+    index_store = get_index_store()
+    with index_store.lock(document.index_key):
+        if document_in_progress(document):
+            # Waits for a duplicate's job; settle_waiting_duplicates marks it
+            return
+        already_indexed = index_store.exists(document.index_key)
+    if already_indexed:
+        ingestion_queue.mark_ready(document)
+    else:
+        ingestion_queue.enqueue(document)
+
+def resume_pending_document_status(document_id):
+    """resume_pending_document() by id; returns the document's status data, or None if it is gone"""
+    document = Document.query.get(document_id)
+    if document is None:
+        return None
+    resume_pending_document(document)
+    return document_status_data(document)
+
+def document_status_data(document):
+    """Processing state of a document as returned by the status endpoint"""
+    return {
+        'document_id': document.id,
+        'status': document.status,
+        'progress': document.progress,
+        'processed': document.processed,
+        'error': document.processing_error
+    }
+
 @api.route('/upload', methods=['POST'])
 def upload_pdf():
     """Handle PDF upload (legacy endpoint)"""
-    print("Upload request received")
+    logger.debug("Upload request received")
     
     if 'pdf_file' not in request.files:
-        print("No file part in request")
+        logger.debug("No file part in request")
         return jsonify({"error": "No file part"}), 400
     
     pdf_file = request.files['pdf_file']
-    print(f"File received: {pdf_file.filename}")
+    logger.debug("File received: %s", pdf_file.filename)
     
     if pdf_file.filename == '':
-        print("Empty filename")
+        logger.debug("Empty filename")
         return jsonify({"error": "No file selected"}), 400
     
     if not pdf_file.filename.endswith('.pdf'):
-        print("Not a PDF file")
+        logger.debug("Not a PDF file")
         return jsonify({"error": "File must be a PDF"}), 400
 
 @api.route('/documents/upload', methods=['POST'])
@@ -268,67 +654,202 @@ def upload_document():
         if not allowed_file(file.filename):
             return response.error_response('Only PDF files are allowed', 400)
         
-        # Create a unique filename
         original_filename = secure_filename(file.filename)
-        unique_filename = f"{str(uuid.uuid4())}.pdf"
-        file_path = os.path.join(current_app.config['UPLOAD_FOLDER'], unique_filename)
-          # Save the file
-        file.save(file_path)
-          # Process the PDF for AI conversation
-        processed_successfully = False
-        try:
-            # Process PDF content for AI conversation
-            print(f"Processing PDF for AI: {original_filename}")
-            with open(file_path, 'rb') as pdf_file:
-                raw_text = PDFProcessor.get_pdf_text(pdf_file)
-                text_chunks = PDFProcessor.get_text_chunks(raw_text)
-                vectorstore = PDFProcessor.get_vectorstore(text_chunks)
-                conversation_chain = PDFProcessor.get_conversation_chain(vectorstore)
-            
-            # Generate session ID for conversation
-            session_id = str(uuid.uuid4())
-            
-            # Store session data for AI conversations
-            USER_SESSIONS[session_id] = {
-                'conversation': conversation_chain,
-                'chat_history': [],
-                'pdf_name': original_filename,
-                'upload_time': datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-            }
-            
-            processed_successfully = True
-            print(f"PDF processed successfully. Session ID: {session_id}")
-            
-        except Exception as e:
-            print(f"Error processing PDF for AI: {str(e)}")
-            # Continue without AI processing - document will still be uploaded
-            session_id = str(uuid.uuid4())
+        upload_folder = current_app.config['UPLOAD_FOLDER']
         
-        # Create a document record in the database
-        document = Document(
-            user_id=user.id,
-            filename=unique_filename,
-            original_filename=original_filename,
-            file_path=file_path,
-            file_size=os.path.getsize(file_path),
-            upload_date=datetime.now(timezone.utc),
-            session_id=session_id,
-            processed=processed_successfully  # Set processed status based on AI processing success
-        )
+        # Save the file while hashing it; identical uploads share one stored file
+        temp_path, content_hash = stream_upload_to_temp(file, upload_folder)
+        unique_filename = f"{content_hash}.pdf"
+        file_path = os.path.join(upload_folder, unique_filename)
         
-        db.session.add(document)
-        db.session.commit()
+        index_store = get_index_store()
+        with index_store.lock(content_hash):
+            if os.path.exists(file_path):
+                os.remove(temp_path)
+            else:
+                os.replace(temp_path, file_path)
+            
+            # Create a document record in the database
+            document = Document(
+                user_id=user.id,
+                filename=unique_filename,
+                original_filename=original_filename,
+                file_path=file_path,
+                file_size=os.path.getsize(file_path),
+                upload_date=datetime.now(timezone.utc),
+                session_id=str(uuid.uuid4()),
+                content_hash=content_hash,
+                processed=False  # Set by the ingestion worker once the AI index is built
+            )
+            
+            db.session.add(document)
+            db.session.commit()
+            already_indexed = index_store.exists(content_hash)
+            # Checked after the commit, so a job finishing meanwhile still settles this row
+            indexing = not already_indexed and indexing_in_progress(content_hash)
+        
+        if already_indexed:
+            # Same content was processed before (by any user); reuse its chunks and embeddings
+            ingestion_queue.mark_ready(document)
+        elif not indexing:
+            # Process the PDF for AI conversation in the background
+            ingestion_queue.enqueue(document)
+        # Otherwise another upload's job is building this index; the document stays pending
+        # until settle_waiting_duplicates marks it when that job finishes
         
         return response.success_response({
             'document_id': document.id,
             'filename': document.original_filename,
             'upload_date': document.upload_date.isoformat(),
-            'session_id': document.session_id
+            'session_id': document.session_id,
+            'status': document.status,
+            'progress': document.progress
         }, 'Document uploaded successfully', 201)
         
     except Exception as e:
         return response.error_response(str(e))
 
+@api.route('/documents/batch', methods=['POST'])
+@jwt_required()
+def upload_document_batch():
+    """Upload several PDFs, or zip archives of PDFs, as one batch"""
+    temp_paths = []
+    try:
+        user = get_user_from_jwt()
+        
+        files = [file for file in request.files.getlist('files') + request.files.getlist('file') if file.filename]
+        if not files:
+            return response.error_response('No selected file', 400)
+        
+        upload_folder = current_app.config['UPLOAD_FOLDER']
+        max_files = current_app.config['BATCH_MAX_FILES']
+        max_file_bytes = current_app.config['MAX_CONTENT_LENGTH']
+        
+        # Stream every PDF to disk first; a file that fails is reported and skipped
+        uploads = []
+        errors = []
+        entries = iter_batch_entries(files)
+        try:
+            for filename, stream, error in entries:
+                original_filename = secure_filename(filename)
+                if error is None and len(uploads) >= max_files:
+                    errors.append({'filename': original_filename, 'error': f"Batch limit of {max_files} files reached"})
+                    break
+                if error is None and not original_filename:
+                    error = 'Invalid filename'
+                if error is None:
+                    try:
+                        temp_path, content_hash = stream_to_temp(stream, upload_folder, max_file_bytes)
+                    except (ValueError, EOFError, zipfile.BadZipFile, zlib.error) as e:
+                        error = str(e)
+                if error is not None:
+                    errors.append({'filename': original_filename or filename, 'error': error})
+                    continue
+                temp_paths.append(temp_path)
+                uploads.append((original_filename, temp_path, content_hash))
+        finally:
+            entries.close()
+        
+        if not uploads:
+            message = errors[0]['error'] if len(errors) == 1 else 'No PDF files could be read from the upload'
+            return response.error_response(message, 400)
+        
+        batch_id = str(uuid.uuid4())
+        upload_date = datetime.now(timezone.utc)
+        index_store = get_index_store()
+        documents = []
+        
+        # Hold the lock of every content hash (in sorted order, so concurrent batches cannot
+        # deadlock) while the files move into place and all rows are committed together
+        with ExitStack() as locks:
+            content_hashes = sorted({content_hash for _, _, content_hash in uploads})
+            for content_hash in content_hashes:
+                locks.enter_context(index_store.lock(content_hash))
+            
+            for original_filename, temp_path, content_hash in uploads:
+                unique_filename = f"{content_hash}.pdf"
+                file_path = os.path.join(upload_folder, unique_filename)
+                if os.path.exists(file_path):
+                    os.remove(temp_path)
+                else:
+                    os.replace(temp_path, file_path)
+                
+                documents.append(Document(
+                    user_id=user.id,
+                    filename=unique_filename,
+                    original_filename=original_filename,
+                    file_path=file_path,
+                    file_size=os.path.getsize(file_path),
+                    upload_date=upload_date,
+                    session_id=str(uuid.uuid4()),
+                    content_hash=content_hash,
+                    batch_id=batch_id,
+                    processed=False
+                ))
+            
+            db.session.add_all(documents)
+            db.session.flush()
+            document_ids = [(document.id, document.content_hash) for document in documents]
+            db.session.commit()
+            
+            # Decided after the rows are committed (as for a single upload), so a job for the same
+            # content finishing meanwhile still settles the ones left pending
+            indexed = {content_hash for content_hash in content_hashes if index_store.exists(content_hash)}
+            indexing = {content_hash for content_hash in content_hashes
+                        if content_hash not in indexed and indexing_in_progress(content_hash)}
+        
+        # Content processed before is ready at once; one document per new content is queued, and
+        # copies of content being indexed wait as pending for settle_waiting_duplicates
+        ready_ids, queued_ids, queued_hashes = [], [], set()
+        for document_id, content_hash in document_ids:
+            if content_hash in indexed:
+                ready_ids.append(document_id)
+            elif content_hash not in indexing and content_hash not in queued_hashes:
+                queued_ids.append(document_id)
+                queued_hashes.add(content_hash)
+        now = datetime.now(timezone.utc)
+        if ready_ids:
+            Document.query.filter(Document.id.in_(ready_ids)).update({
+                'status': STATUS_READY, 'progress': 100, 'processed': True, 'status_updated_at': now
+            }, synchronize_session=False)
+        if queued_ids:
+            Document.query.filter(Document.id.in_(queued_ids)).update({
+                'status': STATUS_QUEUED, 'progress': 0, 'status_updated_at': now
+            }, synchronize_session=False)
+        db.session.commit()
+        
+        # Queued rows are committed, so the jobs can fan out over the ingestion workers
+        ingestion_queue.schedule(queued_ids)
+        
+        data = batch_status_data(batch_id, batch_documents(batch_id, user.id))
+        data['errors'] = errors
+        return response.success_response(data, f"{len(documents)} document(s) uploaded", 201)
+        
+    except Exception as e:
+        db.session.rollback()
+        return response.error_response(str(e))
+    finally:
+        for temp_path in temp_paths:
+            if os.path.exists(temp_path):
+                os.remove(temp_path)
+
+@api.route('/documents/batch/<batch_id>', methods=['GET'])
+@jwt_required()
+def get_document_batch(batch_id):
+    """Get the processing status of every document of a batch upload"""
+    try:
+        user = get_user_from_jwt()
+        
+        documents = batch_documents(batch_id, user.id)
+        
+        if not documents:
+            return response.error_response('Batch not found', 404)
+        
+        return response.success_response(batch_status_data(batch_id, documents), 'Batch status retrieved successfully', 200)
+        
+    except Exception as e:
+        return response.error_response(str(e))
+
 @api.route('/documents', methods=['GET'])
 @jwt_required()
 def get_documents():
@@ -336,7 +857,15 @@ def get_documents():
     try:
         user = get_user_from_jwt()
         
-        documents = Document.query.filter_by(user_id=user.id).all()
+        # Only the listed columns, newest first
+        query = Document.query.filter_by(user_id=user.id).with_entities(
+            Document.id, Document.original_filename, Document.upload_date, Document.processed,
+            Document.status, Document.progress, Document.page_count, Document.batch_id)
+        try:
+            after, limit = parse_page_args(request.args)
+        except ValueError:
+            return response.error_response('Invalid pagination parameters', 400)
+        documents, pagination = paginate(query, Document.upload_date, Document.id, after, limit)
         
         result = []
         for doc in documents:
@@ -345,10 +874,13 @@ def get_documents():
                 'filename': doc.original_filename,
                 'upload_date': doc.upload_date.isoformat(),
                 'processed': doc.processed,
-                'page_count': doc.page_count
+                'status': doc.status,
+                'progress': doc.progress,
+                'page_count': doc.page_count,
+                'batch_id': doc.batch_id
             })
         
-        return response.success_response(result, 'Documents retrieved successfully', 200)
+        return response.success_response(result, 'Documents retrieved successfully', 200, pagination)
         
     except Exception as e:
         return response.error_response(str(e))
@@ -370,23 +902,66 @@ def get_document(document_id):
             'filename': document.original_filename,
             'upload_date': document.upload_date.isoformat(),
             'processed': document.processed,
+            'status': document.status,
+            'progress': document.progress,
             'page_count': document.page_count
         }, 'Document retrieved successfully', 200)
         
     except Exception as e:
         return response.error_response(str(e))
+
+@api.route('/documents/<int:document_id>/file', methods=['GET'])
+@jwt_required()
+def get_document_file(document_id):
+    """Send the PDF of a document to its owner (uploads are not in the static folder)"""
+    try:
+        user = get_user_from_jwt()
+        
+        document = Document.query.filter_by(id=document_id, user_id=user.id).first()
+        
+        if not document:
+            return response.error_response('Document not found', 404)
+        
+        if not os.path.exists(document.file_path):
+            return response.error_response('Document file not found', 404)
+        
+        # Conditional, so the PDF viewer can fetch byte ranges
+        return send_file(document.file_path, mimetype=document.mime_type,
+                         download_name=document.original_filename, conditional=True)
+        
+    except Exception as e:
+        return response.error_response(str(e))
+
+@api.route('/documents/<int:document_id>/status', methods=['GET'])
+@jwt_required()
+def get_document_status(document_id):
+    """Get the background processing status of a document"""
+    try:
+        user = get_user_from_jwt()
+        
+        document = Document.query.filter_by(id=document_id, user_id=user.id).first()
+        
+        if not document:
+            return response.error_response('Document not found', 404)
+        
+        resume_pending_document(document)
+        
+        return response.success_response(document_status_data(document), 'Document status retrieved successfully', 200)
+        
+    except Exception as e:
+        return response.error_response(str(e))
     
     try:
         # Generate a unique session ID
         session_id = str(uuid.uuid4())
-        print(f"Generated session ID: {session_id}")
+        logger.debug("Generated session ID: %s", session_id)
         
         # Save PDF file for viewing first
         uploads_dir = os.path.join(current_app.static_folder, 'uploads')
         os.makedirs(uploads_dir, exist_ok=True)
         pdf_path = os.path.join(uploads_dir, f"{session_id}.pdf")
         pdf_file.save(pdf_path)
-        print(f"PDF saved to {pdf_path}")
+        logger.debug("PDF saved to %s", pdf_path)
         
         # Now reopen the file for processing
         try:
@@ -396,11 +971,11 @@ def get_document(document_id):
                 vectorstore = PDFProcessor.get_vectorstore(text_chunks)
                 conversation_chain = PDFProcessor.get_conversation_chain(vectorstore)
         except Exception as e:
-            print(f"Error processing PDF: {e}")
+            logger.error("Error processing PDF: %s", e)
             return jsonify({"error": f"Error processing PDF: {str(e)}"}), 500
         
         # Store session data
-        USER_SESSIONS[session_id] = {
+        session_cache[session_id] = {
             'conversation': conversation_chain,
             'chat_history': [],
             'pdf_name': pdf_file.filename,
@@ -439,13 +1014,12 @@ def delete_document(document_id):
             # Delete the conversation
             db.session.delete(conversation)
         
-        # Delete the file from storage
-        if document.file_path and os.path.exists(document.file_path):
-            os.remove(document.file_path)
+        # Drop the cached session for this document
+        if document.session_id:
+            session_cache.pop(document.session_id, None)
         
-        # Delete the document from database
-        db.session.delete(document)
-        db.session.commit()
+        # Delete the document from database, and its file and index if no other document shares them
+        release_document_content(document)
         
         return response.success_response({}, 'Document deleted successfully', 200)
         
@@ -461,24 +1035,29 @@ def get_all_conversations():
     try:
         user = get_user_from_jwt()
         
-        # Get all conversations for the user
-        conversations = Conversation.query.filter_by(user_id=user.id).order_by(Conversation.created_at.desc()).all()
+        # Conversations with their document name in one query, most recently active first
+        query = Conversation.query.filter_by(user_id=user.id).outerjoin(
+            Document, Document.id == Conversation.document_id).with_entities(
+            Conversation.id, Conversation.title, Conversation.document_id, Conversation.created_at,
+            Conversation.updated_at, Document.original_filename)
+        try:
+            after, limit = parse_page_args(request.args)
+        except ValueError:
+            return response.error_response('Invalid pagination parameters', 400)
+        conversations, pagination = paginate(query, Conversation.updated_at, Conversation.id, after, limit)
         
         result = []
         for conv in conversations:
-            # Get document info
-            document = Document.query.get(conv.document_id)
-            
             result.append({
                 'id': conv.id,
                 'title': conv.title,
                 'document_id': conv.document_id,
-                'document_name': document.original_filename if document else 'Unknown',
+                'document_name': conv.original_filename or 'Unknown',
                 'created_at': conv.created_at.isoformat(),
-                'updated_at': conv.updated_at.isoformat() if conv.updated_at else conv.created_at.isoformat()
+                'updated_at': conv.updated_at.isoformat()
             })
         
-        return response.success_response(result, 'Conversations retrieved successfully', 200)
+        return response.success_response(result, 'Conversations retrieved successfully', 200, pagination)
         
     except Exception as e:
         return response.error_response(str(e))
@@ -503,12 +1082,14 @@ def create_conversation():
         if not document:
             return response.error_response('Document not found', 404)
         
-        # Create conversation
+        # Create conversation; a new conversation sorts by its creation time until it has messages
+        now = datetime.now(timezone.utc)
         conversation = Conversation(
             user_id=user.id,
             document_id=document_id,
             title=title,
-            created_at=datetime.now(timezone.utc)
+            created_at=now,
+            updated_at=now
         )
         
         db.session.add(conversation)
@@ -535,7 +1116,8 @@ def get_conversations(document_id):
         if not document:
             return response.error_response('Document not found', 404)
         
-        conversations = Conversation.query.filter_by(document_id=document_id).all()
+        conversations = Conversation.query.filter_by(document_id=document_id).with_entities(
+            Conversation.id, Conversation.title, Conversation.created_at, Conversation.updated_at).all()
         
         result = []
         for conv in conversations:
@@ -554,7 +1136,7 @@ def get_conversations(document_id):
 @api.route('/conversation/<int:conversation_id>/messages', methods=['GET'])
 @jwt_required()
 def get_conversation_messages(conversation_id):
-    """Get all messages in a conversation"""
+    """Get the messages of a conversation, all of them or one page (see parse_message_page_args)"""
     try:
         user = get_user_from_jwt()
         conversation = Conversation.query.filter_by(id=conversation_id, user_id=user.id).first()
@@ -562,23 +1144,28 @@ def get_conversation_messages(conversation_id):
         if not conversation:
             return response.error_response('Conversation not found', 404)
         
-        messages = Message.query.filter_by(conversation_id=conversation_id).order_by(Message.created_at).all()
-        
+        query = Message.query.filter_by(conversation_id=conversation_id).with_entities(
+            Message.id, Message.content, Message.role, Message.created_at)
+        try:
+            cursor, limit, newest_first = parse_message_page_args(request.args)
+        except ValueError:
+            return response.error_response('Invalid pagination parameters', 400)
+        messages, pagination = paginate(query, Message.created_at, Message.id, cursor, limit, descending=newest_first)
+        if newest_first:
+            # Fetched newest first, returned in reading order
+            messages = messages[::-1]
+        
+        # Assistant messages are cleaned when they are stored
         result = []
         for msg in messages:
-            # Clean content on-the-fly for AI responses (to handle legacy raw chunks)
-            content = msg.content
-            if msg.role == 'assistant':
-                content = PDFProcessor.clean_chunk_text(content)
-            
             result.append({
                 'id': msg.id,
-                'content': content,
+                'content': msg.content,
                 'role': msg.role,
                 'created_at': msg.created_at.isoformat()
             })
         
-        return response.success_response(result, 'Messages retrieved successfully', 200)
+        return response.success_response(result, 'Messages retrieved successfully', 200, pagination)
         
     except Exception as e:
         return response.error_response(str(e))
@@ -679,6 +1266,152 @@ def create_message(conversation_id):
     except Exception as e:
         return response.error_response(str(e))
 
+def load_ai_session(user, data):
+    """
+    Validate an AI request and load the session for its conversation's document.
+    Returns (conversation, document, session_data, None), or an error response as the last item.
+    """
+    if not data or 'conversation_id' not in data or 'message' not in data:
+        return None, None, None, response.error_response('Conversation ID and message are required', 400)
+    
+    # Verify the conversation belongs to the user
+    conversation = Conversation.query.filter_by(id=data['conversation_id'], user_id=user.id).first()
+    
+    if not conversation:
+        return None, None, None, response.error_response('Conversation not found', 404)
+    
+    # Get the document for context
+    document = Document.query.get(conversation.document_id)
+    
+    if not document or not document.session_id:
+        return None, None, None, response.error_response('Document not found or not processed', 404)
+    
+    if not document.processed and document_in_progress(document):
+        return None, None, None, response.error_response('Document is still being processed. Please try again shortly.', 409)
+    
+    # Get the session for this document (memory, then persisted index, then full processing)
+    try:
+        session_data = get_document_session(document)
+    except FileNotFoundError:
+        return None, None, None, response.error_response('Document file not found', 404)
+    except Exception as process_error:
+        logger.error("Error processing PDF: %s", process_error, extra={'document_id': document.id})
+        return None, None, None, response.error_response(f'Could not process document for AI conversation: {str(process_error)}', 500)
+    
+    return conversation, document, session_data, None
+
+def generate_fallback_response(conversation_chain, user_message):
+    """Answer from the document chunks when no LangChain chain is available; returns (response, chunk_ids)"""
+    vectorstore = conversation_chain.get('vectorstore', {})
+    
+    # A FAISS index (semantic mode: embeddings but no LLM) is searched by similarity instead
+    if isinstance(vectorstore, dict) and not vectorstore.get('chunks'):
+        return "Maaf, saya tidak memiliki akses ke konten dokumen untuk menjawab pertanyaan Anda.", []
+    
+    # Use enhanced search algorithm
+    with metrics.timer('retrieval'):
+        relevant = PDFProcessor.search_relevant_chunks(vectorstore, user_message)
+    
+    if relevant:
+        # Generate enhanced response
+        chunk_ids = [chunk_id for chunk_id, _ in relevant if chunk_id is not None]
+        return PDFProcessor.generate_response(user_message, [chunk for _, chunk in relevant]), chunk_ids
+    return "Maaf, saya tidak menemukan informasi yang relevan dengan pertanyaan Anda dalam dokumen ini. Silakan coba dengan kata kunci yang berbeda atau lebih spesifik.", []
+
+def is_history_free(session_data):
+    """True when the next answer depends only on the document and the question, so it can be cached"""
+    conversation_chain = session_data['conversation']
+    if isinstance(conversation_chain, dict):
+        return True
+    # LangChain rewrites follow-up questions using the chat history
+    return not conversation_chain.memory.chat_memory.messages
+
+def get_cached_answer(document, session_data, user_message):
+    """
+    Look up a cached answer for a history-free question, recording it in the session on a hit.
+    Returns (answer or None, question_vector); pass question_vector on to record_answer so a
+    miss embeds the question only once (it is None unless the semantic cache embedded it).
+    """
+    # Exact (normalized) question first, then paraphrases of earlier questions, answered from this index version
+    index_version = session_data['index_version']
+    question_vector = None
+    entry = answer_cache.get(document.index_key, user_message, index_version)
+    if entry is None:
+        question_vector = semantic_cache.embed_question(user_message)
+        entry = semantic_cache.get(document.index_key, user_message, vector=question_vector, version=index_version)
+        if entry is None:
+            return None, question_vector
+        logger.debug("Semantic cache match %.2f: %s", entry['similarity'], entry['question'][:50])
+    
+    conversation_chain = session_data['conversation']
+    if isinstance(conversation_chain, dict):
+        session_data['chat_history'].extend([
+            {'role': 'user', 'content': user_message},
+            {'role': 'assistant', 'content': entry['answer']}
+        ])
+    else:
+        # Keep the chain's memory in step so follow-up questions still see this exchange
+        conversation_chain.memory.save_context({'question': user_message}, {'answer': entry['answer']})
+        session_data['chat_history'] = format_chain_history(conversation_chain.memory.chat_memory.messages)
+    session_cache.resize(document.session_id)
+    return entry['answer'], question_vector
+
+def record_answer(document, session_data, user_message, bot_response, chunk_ids, chain_response=None, cacheable=False,
+                  question_vector=None):
+    """Update the session's chat history after a fresh answer, and cache the answer if it is history-free"""
+    if chain_response is None:
+        # Simulate chat history for fallback mode
+        session_data['chat_history'].extend([
+            {'role': 'user', 'content': user_message},
+            {'role': 'assistant', 'content': bot_response}
+        ])
+    else:
+        # Update session chat history with formatted messages
+        session_data['chat_history'] = format_chain_history(chain_response.get('chat_history', []))
+    
+    # Chat history counts towards the session's share of the cache budget
+    session_cache.resize(document.session_id)
+    
+    if cacheable:
+        answer_cache.set(document.index_key, user_message, bot_response, chunk_ids, session_data['index_version'])
+        semantic_cache.add(document.index_key, user_message, bot_response, chunk_ids, session_data['index_version'],
+                           question_vector)
+
+def format_chain_history(chat_history):
+    """Convert LangChain message objects to our chat history format"""
+    formatted_history = []
+    for message in chat_history:
+        if hasattr(message, 'content'):
+            role = 'user' if hasattr(message, 'type') and message.type == 'human' else 'assistant'
+            # Also clean content in chat history
+            content = PDFProcessor.clean_chunk_text(message.content) if role == 'assistant' else message.content
+            formatted_history.append({
+                'role': role,
+                'content': content
+            })
+    return formatted_history
+
+def sse_event(event, data):
+    """Format one Server-Sent Event with a JSON payload"""
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
+
+# Substrings suggesting raw LangChain chunk text leaked into an answer
+RAW_CHUNK_INDICATORS = ('chunk', 'page_content', 'metadata', 'source')
+
+def log_raw_chunk_diagnostics(bot_response):
+    """Check a sample of answers for raw chunk text (RAW_CHUNK_DIAGNOSTICS_SAMPLE_RATE, off by default)"""
+    sample_rate = current_app.config.get('RAW_CHUNK_DIAGNOSTICS_SAMPLE_RATE', 0.0)
+    if not sample_rate or random.random() >= sample_rate:
+        return
+    
+    response_lower = bot_response.lower()
+    found_indicators = [indicator for indicator in RAW_CHUNK_INDICATORS if indicator in response_lower]
+    if found_indicators:
+        logger.warning("AI response contains raw chunk indicators",
+                       extra={'indicators': found_indicators, 'preview': bot_response[:200]})
+    else:
+        logger.debug("AI response appears natural")
+
 @api.route('/chat/ai-response', methods=['POST'])
 @jwt_required()
 def get_ai_response():
@@ -694,90 +1427,44 @@ def get_ai_response():
         if not data:
             return response.error_response('No data provided', 400)
         
-        if not data or 'conversation_id' not in data or 'message' not in data:
-            return response.error_response('Conversation ID and message are required', 400)
+        conversation, document, session_data, error = load_ai_session(user, data)
+        if error:
+            return error
         
-        conversation_id = data['conversation_id']
+        conversation_id = conversation.id
         user_message = data['message']
-        
-        # Verify the conversation belongs to the user
-        conversation = Conversation.query.filter_by(id=conversation_id, user_id=user.id).first()
-        
-        if not conversation:
-            return response.error_response('Conversation not found', 404)
-        
-        # Get the document for context
-        document = Document.query.get(conversation.document_id)
-        
-        if not document or not document.session_id:
-            return response.error_response('Document not found or not processed', 404)
-          # Check if we have a session for this document
-        if document.session_id not in USER_SESSIONS:
-            # Try to process the document automatically
-            try:
-                print(f"Session not found for document {document.id}. Processing PDF...")
-                
-                if not os.path.exists(document.file_path):
-                    return response.error_response('Document file not found', 404)
-                
-                # Process PDF content for AI conversation
-                with open(document.file_path, 'rb') as pdf_file:
-                    raw_text = PDFProcessor.get_pdf_text(pdf_file)
-                    text_chunks = PDFProcessor.get_text_chunks(raw_text)
-                    vectorstore = PDFProcessor.get_vectorstore(text_chunks)
-                    conversation_chain = PDFProcessor.get_conversation_chain(vectorstore)
-                
-                # Store session data for AI conversations
-                USER_SESSIONS[document.session_id] = {
-                    'conversation': conversation_chain,
-                    'chat_history': [],
-                    'pdf_name': document.original_filename,
-                    'upload_time': document.upload_date.strftime("%Y-%m-%d %H:%M:%S")
-                }
-                
-                print(f"PDF processed successfully for session {document.session_id}")
-                
-            except Exception as process_error:
-                print(f"Error processing PDF: {str(process_error)}")
-                return response.error_response(f'Could not process document for AI conversation: {str(process_error)}', 500)
         try:
             # Start timer to measure response time
             start_time = time.time()
             
             # Get response from conversation chain
-            print(f"Processing question for conversation {conversation_id}: {user_message[:50]}...")
-            session_data = USER_SESSIONS[document.session_id]
+            logger.info("Processing question", extra={'conversation_id': conversation_id})
             conversation_chain = session_data['conversation']
             
+            # We're in fallback mode - langchain not available
+            if isinstance(conversation_chain, dict) and not conversation_chain.get('ready', False):
+                error_msg = conversation_chain.get('error', 'AI functionality not available')
+                logger.warning("AI functionality not available: %s", error_msg)
+                return response.error_response(f'AI functionality is currently unavailable: {error_msg}', 503)
+            
+            # Questions asked before (on this document, without prior context) are answered from the cache
+            cacheable = is_history_free(session_data)
+            bot_response, question_vector = get_cached_answer(document, session_data, user_message) \
+                if cacheable else (None, None)
+            cached = bot_response is not None
+            
             # Check if we have a real langchain conversation chain or fallback mode
-            if isinstance(conversation_chain, dict):
-                # We're in fallback mode - langchain not available
-                if not conversation_chain.get('ready', False):
-                    error_msg = conversation_chain.get('error', 'AI functionality not available')
-                    print(f"AI functionality not available: {error_msg}")
-                    return response.error_response(f'AI functionality is currently unavailable: {error_msg}', 503)
-                  # Enhanced text-based response for fallback mode
-                vectorstore = conversation_chain.get('vectorstore', {})
-                
-                if not vectorstore.get('chunks'):
-                    bot_response = "Maaf, saya tidak memiliki akses ke konten dokumen untuk menjawab pertanyaan Anda."
-                else:
-                    # Use enhanced search algorithm
-                    relevant_chunks = PDFProcessor.search_relevant_content(vectorstore, user_message)
-                    
-                    if relevant_chunks:
-                        # Generate enhanced response
-                        bot_response = PDFProcessor.generate_response(user_message, relevant_chunks)
-                    else:
-                        bot_response = "Maaf, saya tidak menemukan informasi yang relevan dengan pertanyaan Anda dalam dokumen ini. Silakan coba dengan kata kunci yang berbeda atau lebih spesifik."
-                  # Simulate chat history for fallback mode
-                session_data['chat_history'].extend([
-                    {'role': 'user', 'content': user_message},
-                    {'role': 'assistant', 'content': bot_response}
-                ])            
+            if cached:
+                logger.debug("Answer served from cache")
+            elif isinstance(conversation_chain, dict):
+                # Enhanced text-based response for fallback mode
+                bot_response, chunk_ids = generate_fallback_response(conversation_chain, user_message)
+                record_answer(document, session_data, user_message, bot_response, chunk_ids, cacheable=cacheable,
+                              question_vector=question_vector)
             else:
                 # Real langchain conversation chain
-                chain_response = conversation_chain({'question': user_message})
+                chain_response = conversation_chain({'question': user_message},
+                                                    callbacks=PDFProcessor.get_chain_callbacks())
                 
                 # Extract the answer from the chain response
                 bot_response = chain_response.get('answer', '')
@@ -785,53 +1472,122 @@ def get_ai_response():
                 # CRITICAL: Clean the response to remove raw chunks
                 bot_response = PDFProcessor.clean_chunk_text(bot_response)
                 
-                # Get chat history and convert to our format
-                chat_history = chain_response.get('chat_history', [])
-                
-                # Convert LangChain message objects to our format
-                formatted_history = []
-                for message in chat_history:
-                    if hasattr(message, 'content'):
-                        role = 'user' if hasattr(message, 'type') and message.type == 'human' else 'assistant'
-                        # Also clean content in chat history
-                        content = PDFProcessor.clean_chunk_text(message.content) if role == 'assistant' else message.content
-                        formatted_history.append({
-                            'role': role,
-                            'content': content
-                        })
-                
-                # Update session chat history with formatted messages
-                session_data['chat_history'] = formatted_history
-              # Calculate response time
-            response_time = time.time() - start_time
-            
-            # DEBUG: Log the actual response being sent
-            print(f"🔍 DEBUG - AI Response Length: {len(bot_response)}")
-            print(f"🔍 DEBUG - Response Preview: {bot_response[:200]}...")
+                record_answer(document, session_data, user_message, bot_response,
+                              PDFProcessor.get_source_chunk_ids(chain_response), chain_response, cacheable,
+                              question_vector)
             
-            # Check for raw chunk indicators
-            raw_indicators = ['chunk', 'page_content', 'metadata', 'source']
-            has_raw = any(indicator in bot_response.lower() for indicator in raw_indicators)
+            # Calculate response time
+            response_time = time.time() - start_time
             
-            if has_raw:
-                print("❌ DEBUG - Backend response contains raw chunks!")
-                found_indicators = [ind for ind in raw_indicators if ind in bot_response.lower()]
-                print(f"❌ DEBUG - Found indicators: {found_indicators}")
-            else:
-                print("✅ DEBUG - Backend response appears natural")
+            logger.info("AI response generated", extra={
+                'conversation_id': conversation_id,
+                'response_length': len(bot_response),
+                'response_time': round(response_time, 3),
+                'cached': cached
+            })
+            log_raw_chunk_diagnostics(bot_response)
             
             return response.success_response({
                 'response': bot_response,
-                'response_time': f"{response_time:.2f}s"
+                'response_time': f"{response_time:.2f}s",
+                'cached': cached
             }, 'AI response generated successfully', 200)
             
         except Exception as e:
-            print(f"Error in AI processing: {str(e)}")
+            logger.exception("Error in AI processing")
             return response.error_response(f'AI processing error: {str(e)}', 500)
         
     except Exception as e:
         return response.error_response(str(e))
 
+@api.route('/chat/ai-response/stream', methods=['POST'])
+@jwt_required()
+def stream_ai_response():
+    """Stream an AI response as Server-Sent Events and store it as a message once complete"""
+    try:
+        user = get_user_from_jwt()
+        
+        if not user:
+            return response.error_response('User not found', 401)
+        
+        data = request.json
+        
+        if not data:
+            return response.error_response('No data provided', 400)
+        
+        conversation, document, session_data, error = load_ai_session(user, data)
+        if error:
+            return error
+        
+        conversation_chain = session_data['conversation']
+        if isinstance(conversation_chain, dict) and not conversation_chain.get('ready', False):
+            error_msg = conversation_chain.get('error', 'AI functionality not available')
+            return response.error_response(f'AI functionality is currently unavailable: {error_msg}', 503)
+    except Exception as e:
+        return response.error_response(str(e))
+    
+    conversation_id = conversation.id
+    user_message = data['message']
+    
+    def generate():
+        start_time = time.time()
+        try:
+            logger.info("Streaming answer", extra={'conversation_id': conversation_id})
+            
+            cacheable = is_history_free(session_data)
+            bot_response, question_vector = get_cached_answer(document, session_data, user_message) \
+                if cacheable else (None, None)
+            cached = bot_response is not None
+            
+            if cached or isinstance(conversation_chain, dict):
+                # Cached and fallback answers are complete at once; stream them sentence by sentence
+                if not cached:
+                    bot_response, chunk_ids = generate_fallback_response(conversation_chain, user_message)
+                    record_answer(document, session_data, user_message, bot_response, chunk_ids, cacheable=cacheable,
+                                  question_vector=question_vector)
+                for section in PDFProcessor.iter_response_sections(bot_response):
+                    yield sse_event('token', {'text': section})
+            else:
+                # Forward tokens as the LLM produces them
+                chain_response = {}
+                for kind, value in PDFProcessor.stream_chain_response(conversation_chain, user_message):
+                    if kind == 'token':
+                        yield sse_event('token', {'text': value})
+                    else:
+                        chain_response = value
+                
+                bot_response = PDFProcessor.clean_chunk_text(chain_response.get('answer', ''))
+                record_answer(document, session_data, user_message, bot_response,
+                              PDFProcessor.get_source_chunk_ids(chain_response), chain_response, cacheable,
+                              question_vector)
+            
+            # Store the complete answer; the client doesn't post it back
+            message = Message(
+                conversation_id=conversation_id,
+                content=bot_response,
+                role='assistant',
+                created_at=datetime.now(timezone.utc)
+            )
+            db.session.add(message)
+            Conversation.query.filter_by(id=conversation_id).update({'updated_at': datetime.now(timezone.utc)})
+            db.session.commit()
+            
+            yield sse_event('done', {
+                'message_id': message.id,
+                'response': bot_response,
+                'response_time': f"{time.time() - start_time:.2f}s",
+                'cached': cached
+            })
+        except Exception as e:
+            db.session.rollback()
+            logger.exception("Error in AI streaming")
+            yield sse_event('error', {'message': f'AI processing error: {str(e)}'})
+    
+    return Response(stream_with_context(generate()), mimetype='text/event-stream', headers={
+        'Cache-Control': 'no-cache',
+        'X-Accel-Buffering': 'no'  # Stop nginx from buffering the stream
+    })
+
 @api.route('/chat', methods=['POST'])
 def chat():
     """Handle chat messages (legacy endpoint)"""
@@ -846,15 +1602,23 @@ def chat():
     if not session_id or not user_question:
         return jsonify({"error": "Session ID and question are required"}), 400
     
-    if session_id not in USER_SESSIONS:
-        return jsonify({"error": "Session not found or expired"}), 404
+    session_data = session_cache.get(session_id)
+    if session_data is None:
+        document = Document.query.filter_by(session_id=session_id).first()
+        index_store = get_index_store()
+        index_version = index_store.version(document.index_key) if document else None
+        vectorstore = index_store.load(document.index_key) if document else None
+        if vectorstore is None:
+            return jsonify({"error": "Session not found or expired"}), 404
+        session_data = create_session(session_id, vectorstore, document.original_filename,
+                                      document.upload_date.strftime("%Y-%m-%d %H:%M:%S"), index_version)
     try:
         # Start timer to measure response time
         start_time = time.time()
         
         # Get response from conversation chain
-        print(f"Processing question for session {session_id}: {user_question[:50]}...")
-        conversation_chain = USER_SESSIONS[session_id]['conversation']
+        logger.info("Processing question", extra={'session_id': session_id})
+        conversation_chain = session_data['conversation']
         
         # Check if we have a real langchain conversation chain or fallback mode
         if isinstance(conversation_chain, dict):
@@ -865,11 +1629,12 @@ def chat():
               # Enhanced text-based response for fallback mode
             vectorstore = conversation_chain.get('vectorstore', {})
             
-            if not vectorstore.get('chunks'):
+            if isinstance(vectorstore, dict) and not vectorstore.get('chunks'):
                 bot_response = "Maaf, saya tidak memiliki akses ke konten dokumen untuk menjawab pertanyaan Anda."
             else:
                 # Use enhanced search algorithm
-                relevant_chunks = PDFProcessor.search_relevant_content(vectorstore, user_question)
+                with metrics.timer('retrieval'):
+                    relevant_chunks = PDFProcessor.search_relevant_content(vectorstore, user_question)
                 
                 if relevant_chunks:
                     # Generate enhanced response
@@ -878,12 +1643,13 @@ def chat():
                     bot_response = "Maaf, saya tidak menemukan informasi yang relevan dengan pertanyaan Anda dalam dokumen ini. Silakan coba dengan kata kunci yang berbeda atau lebih spesifik."
             
             # Simulate chat history for fallback mode
-            USER_SESSIONS[session_id]['chat_history'].extend([
+            session_data['chat_history'].extend([
                 {'role': 'user', 'content': user_question},
                 {'role': 'assistant', 'content': bot_response}
             ])        
             # Real langchain conversation chain
-            chain_response = conversation_chain({'question': user_question})
+            chain_response = conversation_chain({'question': user_question},
+                                                callbacks=PDFProcessor.get_chain_callbacks())
             
             # Extract the answer from the chain response
             bot_response = chain_response.get('answer', '')
@@ -902,7 +1668,9 @@ def chat():
                     })
             
             # Update session chat history with formatted messages
-            USER_SESSIONS[session_id]['chat_history'] = formatted_history
+            session_data['chat_history'] = formatted_history
+        
+        session_cache.resize(session_id)
         
         # Calculate response time
         response_time = time.time() - start_time
@@ -930,41 +1698,18 @@ def process_document_for_ai(document_id):
         if not os.path.exists(document.file_path):
             return response.error_response('Document file not found', 404)
         
-        try:
-            # Process PDF content for AI conversation
-            print(f"Processing PDF for AI: {document.original_filename}")
-            with open(document.file_path, 'rb') as pdf_file:
-                raw_text = PDFProcessor.get_pdf_text(pdf_file)
-                text_chunks = PDFProcessor.get_text_chunks(raw_text)
-                vectorstore = PDFProcessor.get_vectorstore(text_chunks)
-                conversation_chain = PDFProcessor.get_conversation_chain(vectorstore)
-            
-            # Use existing session_id or create new one
-            session_id = document.session_id or str(uuid.uuid4())
-            
-            # Store session data for AI conversations
-            USER_SESSIONS[session_id] = {
-                'conversation': conversation_chain,
-                'chat_history': [],
-                'pdf_name': document.original_filename,
-                'upload_time': document.upload_date.strftime("%Y-%m-%d %H:%M:%S")
-            }
-              # Update document with session_id and processed status
-            if not document.session_id:
-                document.session_id = session_id
-            document.processed = True  # Mark as processed after successful AI processing
-            db.session.commit()
-            
-            print(f"PDF processed successfully. Session ID: {session_id}")
-            
-            return response.success_response({
-                'session_id': session_id,
-                'message': 'Document processed successfully for AI conversation'
-            }, 'Document processed successfully', 200)
-            
-        except Exception as e:
-            print(f"Error processing PDF for AI: {str(e)}")
-            return response.error_response(f'Error processing PDF: {str(e)}', 500)
+        # A job for this document (or a duplicate upload it waits for) is already waiting or running
+        if document_in_progress(document):
+            return response.success_response(document_status_data(document), 'Document is already being processed', 202)
+        
+        # Use existing session_id or create new one
+        if not document.session_id:
+            document.session_id = str(uuid.uuid4())
+        
+        # Process PDF content for AI conversation in the background
+        ingestion_queue.enqueue(document)
+        
+        return response.success_response(document_status_data(document), 'Document queued for processing', 202)
         
     except Exception as e:
         return response.error_response(str(e))
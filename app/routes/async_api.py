@@ -0,0 +1,391 @@
+# Async (ASGI) versions of the chat, document status and message endpoints. They serve the
+# same URLs and JSON as the api blueprint but await the database and the LLM instead of
+# holding a thread; asgi.py forwards every other request to the Flask app.
+import asyncio
+import logging
+from datetime import datetime, timezone
+
+from flask_jwt_extended import decode_token
+from sqlalchemy import exists, select, update
+from starlette.concurrency import run_in_threadpool
+from starlette.responses import JSONResponse, StreamingResponse
+from starlette.routing import Route
+
+from app.models.conversation import Conversation
+from app.models.documents import Document
+from app.models.message import Message
+from app.models.user import User
+from app.models.pdf_processor import PDFProcessor
+from app.models.metrics import metrics
+from app.models.ingestion_queue import ACTIVE_STATUSES, STATUS_PENDING
+from app.routes.api import (get_document_session, generate_fallback_response, is_history_free,
+                            get_cached_answer, record_answer, document_status_data, sse_event,
+                            resume_pending_document_status, get_current_session,
+                            log_raw_chunk_diagnostics, parse_message_page_args, keyset_condition,
+                            keyset_order, page_rows)
+
+logger = logging.getLogger(__name__)
+
+
+def success_response(data=None, message="Success", status_code=200, pagination=None):
+    body = {"status": "success", "message": message, "data": data}
+    if pagination is not None:
+        body["pagination"] = pagination
+    return JSONResponse(body, status_code=status_code)
+
+
+def error_response(message="Error", status_code=400):
+    return JSONResponse({"status": "error", "message": message}, status_code=status_code)
+
+
+def run_in_app_context(flask_app, func, *args):
+    """Run blocking Flask-side code (index loading, PDF processing) in the thread pool"""
+    def call():
+        with flask_app.app_context():
+            return func(*args)
+    return run_in_threadpool(call)
+
+
+async def get_user(request, session):
+    """Return the user for the request's Bearer token, or None"""
+    header = request.headers.get('Authorization', '')
+    if not header.startswith('Bearer '):
+        return None
+
+    flask_app = request.app.state.flask_app
+    try:
+        with flask_app.app_context():
+            token = decode_token(header[len('Bearer '):])
+        if token.get('type') != 'access':
+            return None
+        # User IDs are stored as strings in the JWT identity
+        user_id = int(token[flask_app.config.get('JWT_IDENTITY_CLAIM', 'sub')])
+    except Exception:
+        return None
+    return await session.get(User, user_id)
+
+
+async def read_json(request):
+    try:
+        return await request.json()
+    except Exception:
+        return None
+
+
+async def get_document_status(request):
+    """Get the background processing status of a document"""
+    async with request.app.state.db_session() as session:
+        user = await get_user(request, session)
+        if not user:
+            return error_response('Missing or invalid token', 401)
+
+        document = (await session.execute(select(Document).filter_by(
+            id=request.path_params['document_id'], user_id=user.id))).scalar_one_or_none()
+
+        if not document:
+            return error_response('Document not found', 404)
+
+        data = document_status_data(document)
+
+    if document.status == STATUS_PENDING:
+        # May start processing it (see api.resume_pending_document); rare, so done on the Flask side
+        data = await run_in_app_context(request.app.state.flask_app, resume_pending_document_status, document.id)
+        if data is None:
+            return error_response('Document not found', 404)
+
+    return success_response(data, 'Document status retrieved successfully', 200)
+
+
+async def document_in_progress(session, document):
+    """Async counterpart of api.document_in_progress"""
+    if document.status in ACTIVE_STATUSES:
+        return True
+    if document.status != STATUS_PENDING or not document.content_hash:
+        return False
+    return (await session.execute(select(exists().where(
+        Document.content_hash == document.content_hash,
+        Document.status.in_(ACTIVE_STATUSES))))).scalar()
+
+
+async def get_conversation_messages(request):
+    """Get the messages of a conversation, all of them or one page"""
+    conversation_id = request.path_params['conversation_id']
+    async with request.app.state.db_session() as session:
+        user = await get_user(request, session)
+        if not user:
+            return error_response('Missing or invalid token', 401)
+
+        conversation = (await session.execute(select(Conversation).filter_by(
+            id=conversation_id, user_id=user.id))).scalar_one_or_none()
+
+        if not conversation:
+            return error_response('Conversation not found', 404)
+
+        try:
+            cursor, limit, newest_first = parse_message_page_args(request.query_params)
+        except ValueError:
+            return error_response('Invalid pagination parameters', 400)
+
+        statement = select(Message.id, Message.content, Message.role, Message.created_at).filter_by(
+            conversation_id=conversation_id)
+        if cursor is not None:
+            statement = statement.where(keyset_condition(Message.created_at, Message.id, cursor, newest_first))
+        statement = statement.order_by(*keyset_order(Message.created_at, Message.id, newest_first))
+        if limit is not None:
+            statement = statement.limit(limit + 1)
+        messages, pagination = page_rows((await session.execute(statement)).all(), limit,
+                                         lambda row: (row.created_at, row.id))
+        if newest_first:
+            # Fetched newest first, returned in reading order
+            messages = messages[::-1]
+
+    # Assistant messages are cleaned when they are stored
+    result = []
+    for msg in messages:
+        result.append({
+            'id': msg.id,
+            'content': msg.content,
+            'role': msg.role,
+            'created_at': msg.created_at.isoformat()
+        })
+
+    return success_response(result, 'Messages retrieved successfully', 200, pagination)
+
+
+async def create_message(request):
+    """Add a message to a conversation"""
+    conversation_id = request.path_params['conversation_id']
+    data = await read_json(request)
+
+    if not data or 'content' not in data or 'role' not in data:
+        return error_response('Content and role are required', 400)
+
+    async with request.app.state.db_session() as session:
+        user = await get_user(request, session)
+        if not user:
+            return error_response('Missing or invalid token', 401)
+
+        conversation = (await session.execute(select(Conversation).filter_by(
+            id=conversation_id, user_id=user.id))).scalar_one_or_none()
+
+        if not conversation:
+            return error_response('Conversation not found', 404)
+
+        # Clean content before storing (especially for AI responses)
+        content = data['content']
+        if data['role'] == 'assistant':
+            content = PDFProcessor.clean_chunk_text(content)
+
+        message = Message(
+            conversation_id=conversation_id,
+            content=content,
+            role=data['role'],
+            created_at=datetime.now(timezone.utc)
+        )
+        session.add(message)
+        conversation.updated_at = datetime.now(timezone.utc)
+        with metrics.timer('db_commit'):
+            await session.commit()
+
+    return success_response({
+        'id': message.id,
+        'content': message.content,
+        'role': message.role,
+        'created_at': message.created_at.isoformat()
+    }, 'Message created successfully', 201)
+
+
+async def load_ai_session(request, data):
+    """
+    Async counterpart of api.load_ai_session.
+    Returns (conversation, document, session_data, None), or an error response as the last item.
+    """
+    if not data or 'conversation_id' not in data or 'message' not in data:
+        return None, None, None, error_response('Conversation ID and message are required', 400)
+
+    async with request.app.state.db_session() as session:
+        user = await get_user(request, session)
+        if not user:
+            return None, None, None, error_response('User not found', 401)
+
+        conversation = (await session.execute(select(Conversation).filter_by(
+            id=data['conversation_id'], user_id=user.id))).scalar_one_or_none()
+
+        if not conversation:
+            return None, None, None, error_response('Conversation not found', 404)
+
+        document = await session.get(Document, conversation.document_id)
+        in_progress = document is not None and not document.processed \
+            and await document_in_progress(session, document)
+
+    if not document or not document.session_id:
+        return None, None, None, error_response('Document not found or not processed', 404)
+
+    if in_progress:
+        return None, None, None, error_response('Document is still being processed. Please try again shortly.', 409)
+
+    # Reads the index manifest (a few hundred bytes) to spot a rebuild by another worker
+    session_data = get_current_session(document, request.app.state.flask_app)
+    if session_data is None:
+        # Loading (or rebuilding) the index is disk and CPU bound; keep it off the event loop
+        try:
+            session_data = await run_in_app_context(request.app.state.flask_app, get_document_session, document)
+        except FileNotFoundError:
+            return None, None, None, error_response('Document file not found', 404)
+        except Exception as process_error:
+            logger.error("Error processing PDF: %s", process_error, extra={'document_id': document.id})
+            return None, None, None, error_response(
+                f'Could not process document for AI conversation: {str(process_error)}', 500)
+
+    conversation_chain = session_data['conversation']
+    if isinstance(conversation_chain, dict) and not conversation_chain.get('ready', False):
+        error_msg = conversation_chain.get('error', 'AI functionality not available')
+        return None, None, None, error_response(f'AI functionality is currently unavailable: {error_msg}', 503)
+
+    return conversation, document, session_data, None
+
+
+async def answer_question(document, session_data, user_message):
+    """Answer a question without streaming; returns (cleaned response, served from cache)"""
+    conversation_chain = session_data['conversation']
+
+    # The caches embed the question (possibly through the embeddings API) and size the
+    # session; like the fallback answer, that blocking work runs in the thread pool
+    cacheable = is_history_free(session_data)
+    bot_response, question_vector = await run_in_threadpool(get_cached_answer, document, session_data, user_message) \
+        if cacheable else (None, None)
+    if bot_response is not None:
+        return bot_response, True
+
+    if isinstance(conversation_chain, dict):
+        bot_response, chunk_ids = await run_in_threadpool(generate_fallback_response, conversation_chain, user_message)
+        await run_in_threadpool(record_answer, document, session_data, user_message, bot_response, chunk_ids,
+                                cacheable=cacheable, question_vector=question_vector)
+    else:
+        chain_response = await conversation_chain.acall({'question': user_message},
+                                                        callbacks=PDFProcessor.get_chain_callbacks())
+        bot_response = PDFProcessor.clean_chunk_text(chain_response.get('answer', ''))
+        await run_in_threadpool(record_answer, document, session_data, user_message, bot_response,
+                                PDFProcessor.get_source_chunk_ids(chain_response), chain_response, cacheable,
+                                question_vector)
+    return bot_response, False
+
+
+async def get_ai_response(request):
+    """Get AI response for a message in context of a conversation"""
+    data = await read_json(request)
+    if not data:
+        return error_response('No data provided', 400)
+
+    conversation, document, session_data, error = await load_ai_session(request, data)
+    if error:
+        return error
+
+    start_time = asyncio.get_running_loop().time()
+    try:
+        logger.info("Processing question", extra={'conversation_id': conversation.id})
+        bot_response, cached = await answer_question(document, session_data, data['message'])
+    except Exception as e:
+        logger.exception("Error in AI processing")
+        return error_response(f'AI processing error: {str(e)}', 500)
+
+    response_time = asyncio.get_running_loop().time() - start_time
+    logger.info("AI response generated", extra={
+        'conversation_id': conversation.id,
+        'response_length': len(bot_response),
+        'response_time': round(response_time, 3),
+        'cached': cached
+    })
+    with request.app.state.flask_app.app_context():
+        log_raw_chunk_diagnostics(bot_response)
+
+    return success_response({
+        'response': bot_response,
+        'response_time': f"{response_time:.2f}s",
+        'cached': cached
+    }, 'AI response generated successfully', 200)
+
+
+async def stream_ai_response(request):
+    """Stream an AI response as Server-Sent Events and store it as a message once complete"""
+    data = await read_json(request)
+    if not data:
+        return error_response('No data provided', 400)
+
+    conversation, document, session_data, error = await load_ai_session(request, data)
+    if error:
+        return error
+
+    db_session = request.app.state.db_session
+    conversation_chain = session_data['conversation']
+    user_message = data['message']
+
+    async def generate():
+        start_time = asyncio.get_running_loop().time()
+        try:
+            logger.info("Streaming answer", extra={'conversation_id': conversation.id})
+
+            cacheable = is_history_free(session_data)
+            bot_response, question_vector = await run_in_threadpool(
+                get_cached_answer, document, session_data, user_message) if cacheable else (None, None)
+            cached = bot_response is not None
+
+            if cached or isinstance(conversation_chain, dict):
+                # Cached and fallback answers are complete at once; stream them sentence by sentence
+                if not cached:
+                    bot_response, chunk_ids = await run_in_threadpool(generate_fallback_response,
+                                                                      conversation_chain, user_message)
+                    await run_in_threadpool(record_answer, document, session_data, user_message, bot_response,
+                                            chunk_ids, cacheable=cacheable, question_vector=question_vector)
+                for section in PDFProcessor.iter_response_sections(bot_response):
+                    yield sse_event('token', {'text': section})
+            else:
+                chain_response = {}
+                async for kind, value in PDFProcessor.astream_chain_response(conversation_chain, user_message):
+                    if kind == 'token':
+                        yield sse_event('token', {'text': value})
+                    else:
+                        chain_response = value
+
+                bot_response = PDFProcessor.clean_chunk_text(chain_response.get('answer', ''))
+                await run_in_threadpool(record_answer, document, session_data, user_message, bot_response,
+                                        PDFProcessor.get_source_chunk_ids(chain_response), chain_response, cacheable,
+                                        question_vector)
+
+            # Store the complete answer; the client doesn't post it back
+            async with db_session() as session:
+                message = Message(
+                    conversation_id=conversation.id,
+                    content=bot_response,
+                    role='assistant',
+                    created_at=datetime.now(timezone.utc)
+                )
+                session.add(message)
+                await session.execute(update(Conversation).filter_by(id=conversation.id).values(
+                    updated_at=datetime.now(timezone.utc)))
+                with metrics.timer('db_commit'):
+                    await session.commit()
+
+            yield sse_event('done', {
+                'message_id': message.id,
+                'response': bot_response,
+                'response_time': f"{asyncio.get_running_loop().time() - start_time:.2f}s",
+                'cached': cached
+            })
+        except Exception as e:
+            logger.exception("Error in AI streaming")
+            yield sse_event('error', {'message': f'AI processing error: {str(e)}'})
+
+    return StreamingResponse(generate(), media_type='text/event-stream', headers={
+        'Cache-Control': 'no-cache',
+        'X-Accel-Buffering': 'no'  # Stop nginx from buffering the stream
+    })
+
+
+routes = [
+    Route('/api/chat/ai-response', get_ai_response, methods=['POST']),
+    Route('/api/chat/ai-response/stream', stream_ai_response, methods=['POST']),
+    Route('/api/documents/{document_id:int}/status', get_document_status, methods=['GET']),
+    Route('/api/conversation/{conversation_id:int}/messages', get_conversation_messages, methods=['GET']),
+    Route('/api/conversation/{conversation_id:int}/message', create_message, methods=['POST'])
+]
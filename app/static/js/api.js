@@ -264,51 +264,79 @@ class APIHandler {
         try {
             const formData = new FormData();
             formData.append('file', file);
+            return await this.sendUpload('/api/documents/upload', formData, progressCallback);
+        } catch (error) {
+            console.error('Document upload failed:', error);
+            throw error;
+        }
+    }
 
-            // Custom fetch for upload progress
-            return new Promise((resolve, reject) => {
-                const xhr = new XMLHttpRequest();
-
-                // Progress tracking
-                if (progressCallback) {
-                    xhr.upload.addEventListener('progress', (e) => {
-                        if (e.lengthComputable) {
-                            const percentComplete = (e.loaded / e.total) * 100;
-                            progressCallback(percentComplete);
-                        }
-                    });
-                }
+    /**
+     * Upload several PDFs and/or zip archives of PDFs in one request
+     * @param {File[]} files - PDF or zip files to upload
+     * @param {Function} progressCallback - Progress callback function
+     * @returns {Promise} Batch response with a batch_id and per-file status
+     */
+    async uploadDocuments(files, progressCallback = null) {
+        try {
+            const formData = new FormData();
+            for (const file of files) {
+                formData.append('files', file);
+            }
+            return await this.sendUpload('/api/documents/batch', formData, progressCallback);
+        } catch (error) {
+            console.error('Batch upload failed:', error);
+            throw error;
+        }
+    }
 
-                xhr.addEventListener('load', () => {
-                    try {
-                        const response = JSON.parse(xhr.responseText);
-                        if (xhr.status >= 200 && xhr.status < 300) {
-                            resolve(response);
-                        } else {
-                            reject(new Error(response.message || `HTTP ${xhr.status}`));
-                        }
-                    } catch (error) {
-                        reject(new Error('Invalid response format'));
+    /**
+     * POST a multipart form with XMLHttpRequest, which reports upload progress
+     * @param {string} endpoint - API endpoint
+     * @param {FormData} formData - Form to send
+     * @param {Function} progressCallback - Progress callback function
+     * @returns {Promise} Parsed JSON response
+     */
+    sendUpload(endpoint, formData, progressCallback = null) {
+        return new Promise((resolve, reject) => {
+            const xhr = new XMLHttpRequest();
+
+            // Progress tracking
+            if (progressCallback) {
+                xhr.upload.addEventListener('progress', (e) => {
+                    if (e.lengthComputable) {
+                        const percentComplete = (e.loaded / e.total) * 100;
+                        progressCallback(percentComplete);
                     }
                 });
+            }
 
-                xhr.addEventListener('error', () => {
-                    reject(new Error('Upload failed'));
-                });
-
-                xhr.open('POST', `${this.baseURL}/api/documents/upload`);
-                
-                // Set authorization header
-                if (this.token) {
-                    xhr.setRequestHeader('Authorization', `Bearer ${this.token}`);
+            xhr.addEventListener('load', () => {
+                try {
+                    const response = JSON.parse(xhr.responseText);
+                    if (xhr.status >= 200 && xhr.status < 300) {
+                        resolve(response);
+                    } else {
+                        reject(new Error(response.message || `HTTP ${xhr.status}`));
+                    }
+                } catch (error) {
+                    reject(new Error('Invalid response format'));
                 }
+            });
 
-                xhr.send(formData);
+            xhr.addEventListener('error', () => {
+                reject(new Error('Upload failed'));
             });
-        } catch (error) {
-            console.error('Document upload failed:', error);
-            throw error;
-        }
+
+            xhr.open('POST', `${this.baseURL}${endpoint}`);
+
+            // Set authorization header
+            if (this.token) {
+                xhr.setRequestHeader('Authorization', `Bearer ${this.token}`);
+            }
+
+            xhr.send(formData);
+        });
     }
 
     /**
@@ -340,6 +368,36 @@ class APIHandler {
         }
     }
 
+    /**
+     * Get background processing status of a document
+     * @param {number} documentId - Document ID
+     * @returns {Promise} Status response
+     */
+    async getDocumentStatus(documentId) {
+        try {
+            const response = await this.get(`/api/documents/${documentId}/status`);
+            return response;
+        } catch (error) {
+            console.error('Failed to fetch document status:', error);
+            throw error;
+        }
+    }
+
+    /**
+     * Get the processing status of every document of a batch upload
+     * @param {string} batchId - Batch ID returned by uploadDocuments
+     * @returns {Promise} Batch status response
+     */
+    async getBatchStatus(batchId) {
+        try {
+            const response = await this.get(`/api/documents/batch/${batchId}`);
+            return response;
+        } catch (error) {
+            console.error('Failed to fetch batch status:', error);
+            throw error;
+        }
+    }
+
     /**
      * Delete document
      * @param {number} documentId - Document ID
@@ -428,11 +486,19 @@ class APIHandler {
     /**
      * Get conversation messages
      * @param {number} conversationId - Conversation ID
+     * @param {Object} [page] - Page of history to fetch: { before, limit }. An empty
+     *     `before` gets the newest messages; pass the returned pagination.next_cursor
+     *     to get the ones before them. Without it, all messages are returned.
      * @returns {Promise} Messages response
      */
-    async getConversationMessages(conversationId) {
+    async getConversationMessages(conversationId, page = null) {
         try {
-            const response = await this.get(`/api/conversation/${conversationId}/messages`);
+            let endpoint = `/api/conversation/${conversationId}/messages`;
+            if (page) {
+                const params = new URLSearchParams({ before: page.before || '', limit: page.limit || 30 });
+                endpoint += `?${params.toString()}`;
+            }
+            const response = await this.get(endpoint);
             return response;
         } catch (error) {
             console.error('Failed to fetch messages:', error);
@@ -488,6 +554,65 @@ class APIHandler {
         }
     }
 
+    /**
+     * Stream AI response for a user message over Server-Sent Events.
+     * The server stores the finished answer as an assistant message.
+     * @param {number} conversationId - Conversation ID
+     * @param {string} message - User message
+     * @param {Function} onToken - Called with each piece of text as it arrives
+     * @returns {Promise} Final event data ({message_id, response, response_time})
+     */
+    async streamAIResponse(conversationId, message, onToken) {
+        const response = await fetch(`${this.baseURL}/api/chat/ai-response/stream`, {
+            method: 'POST',
+            headers: this.getHeaders(),
+            body: JSON.stringify({
+                conversation_id: conversationId,
+                message: message
+            })
+        });
+
+        if (!response.ok) {
+            const data = await response.json().catch(() => ({}));
+            throw new Error(data.message || `HTTP ${response.status}`);
+        }
+
+        const reader = response.body.getReader();
+        const decoder = new TextDecoder();
+        let buffer = '';
+
+        while (true) {
+            const { value, done } = await reader.read();
+            if (done) break;
+            buffer += decoder.decode(value, { stream: true });
+
+            // Events are separated by a blank line
+            let boundary;
+            while ((boundary = buffer.indexOf('\n\n')) !== -1) {
+                const rawEvent = buffer.slice(0, boundary);
+                buffer = buffer.slice(boundary + 2);
+
+                let eventName = 'message';
+                let eventData = '';
+                rawEvent.split('\n').forEach(line => {
+                    if (line.startsWith('event:')) eventName = line.slice(6).trim();
+                    else if (line.startsWith('data:')) eventData += line.slice(5).trim();
+                });
+                const payload = eventData ? JSON.parse(eventData) : {};
+
+                if (eventName === 'token') {
+                    onToken(payload.text);
+                } else if (eventName === 'done') {
+                    return payload;
+                } else if (eventName === 'error') {
+                    throw new Error(payload.message || 'AI streaming failed');
+                }
+            }
+        }
+
+        throw new Error('AI response stream ended unexpectedly');
+    }
+
     // ========== UTILITY METHODS ==========
 
     /**
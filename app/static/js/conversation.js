@@ -10,6 +10,12 @@ class ConversationHandler {
         this.documentId = null;
         this.isLoading = false;
         
+        // Message history is loaded newest page first; older pages load on scroll
+        this.messagePageSize = 30;
+        this.olderMessagesCursor = null;
+        this.isLoadingOlder = false;
+        this.welcomeMessage = null;
+        
         // DOM elements
         this.chatForm = null;
         this.messageInput = null;
@@ -138,6 +144,13 @@ class ConversationHandler {
         window.addEventListener('resize', () => {
             this.adjustChatHeight();
         });
+
+        // Load older messages when scrolled near the top
+        this.chatMessages.addEventListener('scroll', () => {
+            if (this.chatMessages.scrollTop < 100) {
+                this.loadOlderMessages();
+            }
+        });
     }    /**
      * Load conversation messages
      */
@@ -150,10 +163,18 @@ class ConversationHandler {
         }
 
         try {
-            const response = await this.api.getConversationMessages(this.conversationId);
+            const response = await this.api.getConversationMessages(this.conversationId, {
+                before: '',
+                limit: this.messagePageSize
+            });
             
             if (response.status === 'success') {
                 this.displayMessages(response.data);
+                this.olderMessagesCursor = response.pagination?.next_cursor || null;
+                // A short first page leaves nothing to scroll; fetch older messages right away
+                if (this.chatMessages.scrollHeight <= this.chatMessages.clientHeight) {
+                    this.loadOlderMessages();
+                }
             } else {
                 this.showError('Failed to load conversation messages');
             }
@@ -163,6 +184,40 @@ class ConversationHandler {
         }
     }
 
+    /**
+     * Load the page of messages before the oldest one shown, keeping the scroll position
+     */
+    async loadOlderMessages() {
+        if (!this.olderMessagesCursor || this.isLoadingOlder) {
+            return;
+        }
+
+        this.isLoadingOlder = true;
+        try {
+            const response = await this.api.getConversationMessages(this.conversationId, {
+                before: this.olderMessagesCursor,
+                limit: this.messagePageSize
+            });
+
+            if (response.status === 'success') {
+                const previousHeight = this.chatMessages.scrollHeight;
+                const fragment = document.createDocumentFragment();
+                response.data.forEach(message => {
+                    fragment.appendChild(this.createMessageElement(message.role, message.content));
+                });
+                // Older messages go between the welcome message and the oldest message shown
+                const firstMessage = this.welcomeMessage ? this.welcomeMessage.nextSibling : this.chatMessages.firstChild;
+                this.chatMessages.insertBefore(fragment, firstMessage);
+                this.chatMessages.scrollTop += this.chatMessages.scrollHeight - previousHeight;
+                this.olderMessagesCursor = response.pagination?.next_cursor || null;
+            }
+        } catch (error) {
+            console.error('Error loading older messages:', error);
+        } finally {
+            this.isLoadingOlder = false;
+        }
+    }
+
     /**
      * Clear messages and show welcome message only
      */
@@ -207,6 +262,7 @@ class ConversationHandler {
         if (welcomeMessage) {
             this.chatMessages.appendChild(welcomeMessage);
         }
+        this.welcomeMessage = welcomeMessage;
 
         // Add all messages
         messages.forEach(message => {
@@ -248,44 +304,35 @@ class ConversationHandler {
         try {
             // Send user message to API
             await this.api.sendMessage(this.conversationId, message, 'user');
-              // Show AI thinking indicator
-            const loadingMessageId = this.addLoadingMessage();            try {
-                // Get AI response from the backend
-                const aiResponseData = await this.api.getAIResponse(this.conversationId, message);
-                
-                // DEBUG: Log the full response to console
-                console.log('🔍 DEBUG - Full AI Response:', aiResponseData);
-                console.log('🔍 DEBUG - Response Data:', aiResponseData.data);
-                console.log('🔍 DEBUG - AI Response Text:', aiResponseData.data?.response);
-                
-                this.removeLoadingMessage(loadingMessageId);
-                
-                if (aiResponseData.status === 'success') {
-                    const aiResponse = aiResponseData.data.response;
-                    
-                    // DEBUG: Check if response contains raw chunk indicators
-                    const rawIndicators = ['chunk', 'page_content', 'metadata', 'source'];
-                    const hasRawChunks = rawIndicators.some(indicator => 
-                        aiResponse.toLowerCase().includes(indicator));
-                    
-                    if (hasRawChunks) {
-                        console.error('❌ DEBUG - Response contains raw chunks!');
-                        console.error('Raw indicators found:', rawIndicators.filter(ind => 
-                            aiResponse.toLowerCase().includes(ind)));
-                    } else {
-                        console.log('✅ DEBUG - Response appears to be natural language');
+            // Show AI thinking indicator until the first token arrives
+            const loadingMessageId = this.addLoadingMessage();
+            let streamedDiv = null;
+            let streamedText = '';
+
+            try {
+                // Stream the AI response; the server stores the finished answer
+                const result = await this.api.streamAIResponse(this.conversationId, message, (text) => {
+                    if (!streamedDiv) {
+                        this.removeLoadingMessage(loadingMessageId);
+                        streamedDiv = this.addMessage('assistant', '');
                     }
-                    
-                    // Send AI response to API to store it
-                    await this.api.sendMessage(this.conversationId, aiResponse, 'assistant');
-                    
-                    // Add AI message to UI
-                    this.addMessage('assistant', aiResponse);
-                } else {
-                    throw new Error(aiResponseData.message || 'Failed to get AI response');
+                    streamedText += text;
+                    // Plain text while streaming; formatted once the answer is complete
+                    streamedDiv.querySelector('.text-gray-700').textContent = streamedText;
+                    this.scrollToBottom();
+                });
+
+                this.removeLoadingMessage(loadingMessageId);
+                if (!streamedDiv) {
+                    streamedDiv = this.addMessage('assistant', '');
                 }
+                streamedDiv.querySelector('.text-gray-700').innerHTML = this.formatMessageContent(result.response);
+                this.scrollToBottom();
             } catch (error) {
                 this.removeLoadingMessage(loadingMessageId);
+                if (streamedDiv) {
+                    streamedDiv.remove();
+                }
                 console.error('Error getting AI response:', error);
                 
                 // Fallback error message
@@ -360,6 +407,20 @@ class ConversationHandler {
      * Add a message to the chat display
      */
     addMessage(role, content, scroll = true) {
+        const messageDiv = this.createMessageElement(role, content);
+        this.chatMessages.appendChild(messageDiv);
+        
+        if (scroll) {
+            this.scrollToBottom();
+        }
+
+        return messageDiv;
+    }
+
+    /**
+     * Build the element for one chat message
+     */
+    createMessageElement(role, content) {
         const messageDiv = document.createElement('div');
         messageDiv.className = role === 'user' ? 'message-user p-4 rounded-lg mb-4' : 'message-ai p-4 rounded-lg mb-4';
 
@@ -392,12 +453,6 @@ class ConversationHandler {
             </div>
         `;
 
-        this.chatMessages.appendChild(messageDiv);
-        
-        if (scroll) {
-            this.scrollToBottom();
-        }
-
         return messageDiv;
     }
 
@@ -567,7 +622,16 @@ class ConversationHandler {
     /**
      * Download chat history
      */
-    downloadChatHistory() {
+    async downloadChatHistory() {
+        // Include the history that hasn't been scrolled into view yet
+        while (this.olderMessagesCursor) {
+            const cursor = this.olderMessagesCursor;
+            await this.loadOlderMessages();
+            if (this.olderMessagesCursor === cursor) {
+                break;
+            }
+        }
+
         const messages = this.chatMessages.querySelectorAll('.message-user, .message-ai');
         let chatText = "# Chat History with PDF Assistant\n\n";
         chatText += `Generated: ${new Date().toLocaleString()}\n\n`;
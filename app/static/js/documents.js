@@ -9,6 +9,8 @@ class DocumentHandler {
         this.filteredDocuments = [];
         this.currentSort = 'recent';
         this.searchQuery = '';
+        this.statusPollTimer = null;
+        this.statusPollInterval = 2000; // ms between processing status checks
         this.init();
     }
 
@@ -25,7 +27,7 @@ class DocumentHandler {
      */
     bindEvents() {
         // File upload inputs
-        const fileUploads = document.querySelectorAll('input[type="file"][accept=".pdf"]');
+        const fileUploads = document.querySelectorAll('input[type="file"][accept^=".pdf"]');
         fileUploads.forEach(input => {
             input.addEventListener('change', this.handleFileSelect.bind(this));
         });
@@ -59,6 +61,7 @@ class DocumentHandler {
                 this.documents = response.data || [];
                 this.filteredDocuments = [...this.documents];
                 this.renderDocuments();
+                this.pollProcessingStatus();
             } else {
                 this.showError('Failed to load documents');
             }
@@ -75,33 +78,133 @@ class DocumentHandler {
         }
     }
 
+    /**
+     * Check whether a document is still waiting for or in background processing
+     * @param {Object} doc - Document data
+     * @returns {boolean} True while pending, queued or processing
+     */
+    isProcessing(doc) {
+        // Pending documents wait for a job indexing the same content; the status endpoint
+        // starts processing any that nothing is building
+        return doc.status === 'pending' || doc.status === 'queued' || doc.status === 'processing';
+    }
+
+    /**
+     * Poll the status endpoint for documents that are still processing
+     */
+    pollProcessingStatus() {
+        if (this.statusPollTimer) return;
+
+        const poll = async () => {
+            this.statusPollTimer = null;
+            const pending = this.documents.filter(doc => this.isProcessing(doc));
+            if (pending.length === 0) return;
+
+            // Documents of a batch upload are polled with one request per batch
+            const batchIds = [...new Set(pending.filter(doc => doc.batch_id).map(doc => doc.batch_id))];
+            const single = pending.filter(doc => !doc.batch_id);
+
+            const applyStatus = (doc, data) => {
+                Object.assign(doc, {
+                    status: data.status,
+                    progress: data.progress,
+                    processed: data.processed
+                });
+                this.updateDocumentStatus(doc);
+            };
+
+            await Promise.all([
+                ...batchIds.map(async (batchId) => {
+                    try {
+                        const response = await window.api.getBatchStatus(batchId);
+                        if (response.status === 'success') {
+                            for (const data of response.data.documents) {
+                                const doc = this.documents.find(d => d.id === data.document_id);
+                                if (doc) applyStatus(doc, data);
+                            }
+                        }
+                    } catch (error) {
+                        console.error('Failed to poll batch status:', error);
+                    }
+                }),
+                ...single.map(async (doc) => {
+                    try {
+                        const response = await window.api.getDocumentStatus(doc.id);
+                        if (response.status === 'success') {
+                            applyStatus(doc, response.data);
+                        }
+                    } catch (error) {
+                        console.error('Failed to poll document status:', error);
+                    }
+                })
+            ]);
+
+            if (this.documents.some(doc => this.isProcessing(doc))) {
+                this.statusPollTimer = setTimeout(poll, this.statusPollInterval);
+            }
+        };
+
+        this.statusPollTimer = setTimeout(poll, this.statusPollInterval);
+    }
+
+    /**
+     * Re-render the status badge of a single document card
+     * @param {Object} doc - Document data
+     */
+    updateDocumentStatus(doc) {
+        const card = document.querySelector(`.document-card[data-document-id="${doc.id}"]`);
+        const badge = card?.querySelector('.document-status');
+        if (badge) {
+            badge.innerHTML = this.renderStatusBadge(doc);
+        }
+    }
+
+    /**
+     * Build the processing status badge for a document
+     * @param {Object} doc - Document data
+     * @returns {string} Badge HTML
+     */
+    renderStatusBadge(doc) {
+        if (doc.processed) {
+            return '<span class="inline-block bg-green-100 text-green-800 text-xs px-2 py-1 rounded-full">✓ Ready for Chat</span>';
+        }
+        if (doc.status === 'failed') {
+            return '<span class="inline-block bg-red-100 text-red-800 text-xs px-2 py-1 rounded-full">✕ Processing failed</span>';
+        }
+        const progress = this.isProcessing(doc) ? ` ${doc.progress || 0}%` : '';
+        return `<span class="inline-block bg-yellow-100 text-yellow-800 text-xs px-2 py-1 rounded-full">⏳ Processing...${progress}</span>`;
+    }
+
     /**
      * Handle file selection for upload
      * @param {Event} e - File input change event
      */
     async handleFileSelect(e) {
-        const files = e.target.files;
+        const files = Array.from(e.target.files);
         
         if (files.length === 0) return;
 
-        const file = files[0];
-
-        // Validate file type
-        if (!file.type.includes('pdf')) {
-            this.showError('Please select a PDF file');
+        // Validate file types: PDFs, or zip archives of PDFs
+        const isZip = (file) => file.name.toLowerCase().endsWith('.zip');
+        if (files.some(file => !file.type.includes('pdf') && !isZip(file))) {
+            this.showError('Please select PDF or zip files');
             e.target.value = ''; // Clear the input
             return;
         }
 
-        // Validate file size (max 50MB)
+        // Validate file size (max 50MB per PDF; the server checks the PDFs inside archives)
         const maxSize = 50 * 1024 * 1024; // 50MB in bytes
-        if (file.size > maxSize) {
+        if (files.some(file => !isZip(file) && file.size > maxSize)) {
             this.showError('File size must be less than 50MB');
             e.target.value = ''; // Clear the input
             return;
         }
 
-        await this.uploadDocument(file);
+        if (files.length === 1 && !isZip(files[0])) {
+            await this.uploadDocument(files[0]);
+        } else {
+            await this.uploadDocuments(files);
+        }
         e.target.value = ''; // Clear the input after upload
     }
 
@@ -135,6 +238,41 @@ class DocumentHandler {
         }
     }
 
+    /**
+     * Upload several files (PDFs and zip archives) as one batch
+     * @param {File[]} files - Files to upload
+     */
+    async uploadDocuments(files) {
+        try {
+            const label = files.length === 1 ? files[0].name : `${files.length} files`;
+            this.showUploadProgress(label, 0);
+
+            const response = await window.api.uploadDocuments(files, (progress) => {
+                this.updateUploadProgress(progress);
+            });
+            this.hideUploadProgress();
+
+            if (response.status === 'success') {
+                const { total, errors } = response.data;
+                if (errors.length > 0) {
+                    const skipped = errors.map(error => `${error.filename}: ${error.error}`).join(', ');
+                    this.showError(`Uploaded ${total} document(s); skipped ${errors.length}: ${skipped}`);
+                } else {
+                    this.showSuccess(`${total} document(s) uploaded successfully!`);
+                }
+                
+                // Reload documents to show the new ones
+                await this.loadDocuments();
+            } else {
+                this.showError(response.message || 'Upload failed');
+            }
+        } catch (error) {
+            console.error('Batch upload failed:', error);
+            this.hideUploadProgress();
+            this.showError(error.message || 'Upload failed. Please try again.');
+        }
+    }
+
     /**
      * Handle search input
      * @param {Event} e - Input event
@@ -332,11 +470,8 @@ class DocumentHandler {
                 <h2 class="font-semibold text-lg mb-1 line-clamp-2" title="${doc.filename}">${doc.filename}</h2>
                 <p class="text-sm text-gray-500 mb-4">Uploaded on ${uploadDate}</p>
                   <!-- Processing Status -->
-                <div class="mb-2">
-                    ${doc.processed 
-                        ? '<span class="inline-block bg-green-100 text-green-800 text-xs px-2 py-1 rounded-full">✓ Ready for Chat</span>' 
-                        : '<span class="inline-block bg-yellow-100 text-yellow-800 text-xs px-2 py-1 rounded-full">⏳ Processing...</span>'
-                    }
+                <div class="mb-2 document-status">
+                    ${this.renderStatusBadge(doc)}
                 </div>
                   <!-- Actions -->
                 <div class="mt-auto flex justify-between items-center">
@@ -0,0 +1,23 @@
+from a2wsgi import WSGIMiddleware
+from starlette.applications import Starlette
+from starlette.middleware import Middleware
+from starlette.routing import Mount
+
+from app import create_app
+from app.async_db import create_async_session_factory
+from app.routes.async_api import routes as async_routes
+from app.log import RequestIdMiddleware
+from app.models.ingestion_queue import ingestion_queue
+
+# Async serving mode: uvicorn asgi:app --workers 2
+# Chat, status and message endpoints run on the event loop (app/routes/async_api.py);
+# every other route is the unchanged Flask app, served from a thread pool.
+flask_app = create_app()
+# Pick up jobs left queued or abandoned by a previous server process
+ingestion_queue.recover_on_start()
+
+app = Starlette(routes=async_routes + [
+    Mount('/', app=WSGIMiddleware(flask_app, workers=flask_app.config.get('ASGI_WSGI_THREADS', 10)))
+], middleware=[Middleware(RequestIdMiddleware)])
+app.state.flask_app = flask_app
+app.state.db_session = create_async_session_factory(flask_app)
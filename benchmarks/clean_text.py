@@ -0,0 +1,97 @@
+"""
+Micro-benchmark for PDFProcessor.clean_chunk_text.
+
+Times the current cleaner against the original seven-regex version on
+deterministic LLM-style answers: plain prose, markdown lists, long answers
+and answers with raw chunk artifacts (LangChain Document reprs, page
+numbers). Both must produce identical output on every sample:
+
+    python -m benchmarks.clean_text --samples 2000 --repeat 5
+"""
+import argparse
+import random
+import re
+import sys
+import time
+
+from benchmarks.synthetic_pdf import make_sentence
+
+CASES = ('prose', 'markdown', 'long', 'artifacts')
+
+
+def reference_clean_chunk_text(chunk):
+    """clean_chunk_text as it was before the single-pass rewrite"""
+    text = str(chunk)
+    text = re.sub(r'page_content[:\s]*[\'"]?', '', text, flags=re.IGNORECASE)
+    text = re.sub(r'metadata[:\s]*\{[^}]*\}', '', text, flags=re.IGNORECASE)
+    text = re.sub(r'source[:\s]*[\'"][^\'\"]*[\'"]', '', text, flags=re.IGNORECASE)
+    text = re.sub(r'^\s*\d+\s*\n', '', text)
+    text = re.sub(r'\n\s*\d+\s*$', '', text)
+    text = re.sub(r'\n\s*\n\s*\n+', '\n\n', text)
+    text = re.sub(r'\s+', ' ', text)
+    text = text.strip('\'"[]{}()')
+    return text.strip()
+
+
+def paragraph(rng, sentences):
+    return ' '.join(make_sentence(rng) for _ in range(sentences))
+
+
+def make_answer(rng, case):
+    """One synthetic assistant answer of the given kind"""
+    if case == 'prose':
+        return '\n\n'.join(paragraph(rng, rng.randint(2, 4)) for _ in range(rng.randint(1, 3)))
+    if case == 'markdown':
+        items = '\n'.join(f"- **{make_sentence(rng).split()[0]}**: {make_sentence(rng)}" for _ in range(rng.randint(3, 6)))
+        return f"Berdasarkan dokumen, berikut informasi yang saya temukan:\n\n{items}\n\n{paragraph(rng, 2)}"
+    if case == 'long':
+        return '\n\n'.join(paragraph(rng, rng.randint(4, 8)) for _ in range(rng.randint(8, 15)))
+    # Answers that echo retrieved chunks verbatim
+    page = rng.randint(1, 300)
+    return (f"{page}\n\npage_content='{paragraph(rng, 3)}\n\n\n{paragraph(rng, 2)}' "
+            f"metadata={{'source': 'upload-{rng.randint(1000, 9999)}.pdf', 'page': {page}}}\n\n{page + 1}")
+
+
+def make_samples(count, seed=0):
+    rng = random.Random(seed)
+    return {case: [make_answer(rng, case) for _ in range(count)] for case in CASES}
+
+
+def time_cleaner(cleaner, samples, repeat):
+    """Best per-call time in microseconds over repeat passes"""
+    best = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        for text in samples:
+            cleaner(text)
+        elapsed = (time.perf_counter() - start) / len(samples)
+        best = elapsed if best is None else min(best, elapsed)
+    return best * 1e6
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Benchmark clean_chunk_text against the original implementation')
+    parser.add_argument('--samples', type=int, default=2000, help='Answers per case (default: 2000)')
+    parser.add_argument('--repeat', type=int, default=5, help='Timed passes; the best is reported (default: 5)')
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args(argv)
+
+    from app.models.pdf_processor import PDFProcessor
+
+    samples = make_samples(args.samples, args.seed)
+    print(f"{'case':<12}{'chars':>8}{'original us':>14}{'current us':>13}{'speedup':>10}")
+    for case in CASES:
+        texts = samples[case]
+        mismatches = sum(PDFProcessor.clean_chunk_text(text) != reference_clean_chunk_text(text) for text in texts)
+        if mismatches:
+            print(f"{case}: {mismatches} answers cleaned differently from the original", file=sys.stderr)
+            return 1
+        before = time_cleaner(reference_clean_chunk_text, texts, args.repeat)
+        after = time_cleaner(PDFProcessor.clean_chunk_text, texts, args.repeat)
+        average_chars = sum(map(len, texts)) // len(texts)
+        print(f"{case:<12}{average_chars:>8}{before:>14.2f}{after:>13.2f}{before / after:>9.1f}x")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
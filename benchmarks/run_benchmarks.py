@@ -0,0 +1,286 @@
+"""
+Ingestion and query benchmarks on synthetic PDFs.
+
+Measures extraction, chunking, indexing and query latency for both PDF
+processors (app/models/pdf_processor.py and pdf_processor_enhanced.py),
+and the full HTTP path (upload, background ingestion, AI answers) through
+the Flask test client. Results are written as JSON so runs can be compared:
+
+    python -m benchmarks.run_benchmarks --pages 10,100 --output before.json
+    python -m benchmarks.run_benchmarks --pages 10,100 --output after.json --compare before.json
+
+Embeddings use the local 'hashing' backend unless EMBEDDING_BACKEND is set,
+and the HTTP benchmark runs against a throwaway SQLite database unless
+--database-uri is given.
+"""
+import argparse
+import json
+import os
+import platform
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime, timezone
+
+# Must be set before the app modules read their configuration
+os.environ.setdefault('EMBEDDING_BACKEND', 'hashing')
+
+from benchmarks.synthetic_pdf import write_synthetic_pdf, make_queries
+
+STAGES = ('extraction', 'chunking', 'indexing', 'query')
+HTTP_STAGES = ('upload', 'ingestion', 'query_cold', 'query_cached', 'messages')
+
+
+def summarize(samples):
+    """Latency percentiles in milliseconds (nearest rank)"""
+    if not samples:
+        return {'count': 0}
+    ordered = sorted(samples)
+
+    def percentile(p):
+        return round(ordered[min(len(ordered) - 1, int(p / 100 * len(ordered)))] * 1000, 3)
+
+    return {
+        'count': len(ordered),
+        'mean_ms': round(sum(ordered) / len(ordered) * 1000, 3),
+        'min_ms': round(ordered[0] * 1000, 3),
+        'p50_ms': percentile(50),
+        'p90_ms': percentile(90),
+        'p95_ms': percentile(95),
+        'p99_ms': percentile(99),
+        'max_ms': round(ordered[-1] * 1000, 3)
+    }
+
+
+def timed(func, *args, **kwargs):
+    start = time.perf_counter()
+    result = func(*args, **kwargs)
+    return result, time.perf_counter() - start
+
+
+def search(processor, vectorstore, query):
+    if isinstance(vectorstore, dict):
+        return processor.search_relevant_content(vectorstore, query)
+    return vectorstore.similarity_search(query, k=4)
+
+
+def bench_processor(name, processor, pdf_path, queries, repeat, workers):
+    """Time each ingestion stage `repeat` times and every query against the last index"""
+    samples = {stage: [] for stage in STAGES}
+    vectorstore = None
+    chunks = []
+
+    for _ in range(repeat):
+        text, seconds = timed(processor.get_pdf_text, pdf_path, workers=workers)
+        samples['extraction'].append(seconds)
+        chunks, seconds = timed(processor.get_text_chunks, text)
+        samples['chunking'].append(seconds)
+        vectorstore, seconds = timed(processor.get_vectorstore, chunks)
+        samples['indexing'].append(seconds)
+
+    for _ in range(repeat):
+        for query in queries:
+            samples['query'].append(timed(search, processor, vectorstore, query)[1])
+
+    return {
+        'processor': name,
+        'mode': vectorstore.get('type') if isinstance(vectorstore, dict) else 'faiss',
+        'chunks': len(chunks),
+        'stages': {stage: summarize(samples[stage]) for stage in STAGES}
+    }
+
+
+def create_benchmark_app(workdir, database_uri=None):
+    """Flask app with uploads, indexes and (by default) the database in workdir"""
+    import config
+
+    if database_uri is None:
+        # The models use BIGINT keys, which SQLite only auto-increments as INTEGER
+        from sqlalchemy import BigInteger
+        from sqlalchemy.ext.compiler import compiles
+
+        @compiles(BigInteger, 'sqlite')
+        def compile_big_integer(type_, compiler, **kw):
+            return 'INTEGER'
+
+        database_uri = 'sqlite:///' + os.path.join(workdir, 'benchmark.sqlite3')
+
+    config.Config.SQLALCHEMY_DATABASE_URI = database_uri
+    config.Config.SQLALCHEMY_RECORD_QUERIES = False
+    config.Config.UPLOAD_FOLDER = os.path.join(workdir, 'uploads')
+    config.Config.INDEX_FOLDER = os.path.join(workdir, 'uploads', 'indexes')
+    config.Config.EMBEDDING_CACHE_PATH = os.path.join(workdir, 'embeddings.sqlite3')
+    config.Config.EMBEDDING_BACKEND = os.environ['EMBEDDING_BACKEND']
+    os.makedirs(config.Config.INDEX_FOLDER, exist_ok=True)
+
+    from app import create_app, db
+    app = create_app()
+    with app.app_context():
+        db.create_all()
+    return app
+
+
+def check(response, status=200):
+    if response.status_code != status:
+        raise RuntimeError(f"{response.request.method} {response.request.path} returned "
+                           f"{response.status_code}: {response.get_data(as_text=True)[:200]}")
+    return response.get_json()
+
+
+def bench_http(app, pdf_path, queries, repeat, timeout=600):
+    """Upload, wait for ingestion, ask every question twice (cold, then cached), list the messages, delete"""
+    client = app.test_client()
+    email = f"bench-{time.time_ns()}@example.com"
+    client.post('/api/auth/register', json={'first_name': 'Bench', 'last_name': 'Mark',
+                                            'email': email, 'password': 'benchmark'})
+    login = check(client.post('/api/auth/login', json={'email': email, 'password': 'benchmark'}))
+    headers = {'Authorization': 'Bearer ' + login['data']['access_token']}
+    samples = {stage: [] for stage in HTTP_STAGES}
+
+    for _ in range(repeat):
+        start = time.perf_counter()
+        with open(pdf_path, 'rb') as f:
+            upload = check(client.post('/api/documents/upload', headers=headers,
+                                       data={'file': (f, os.path.basename(pdf_path))}), 201)
+        samples['upload'].append(time.perf_counter() - start)
+        document_id = upload['data']['document_id']
+
+        # Ingestion runs on the background queue; poll until the index is ready
+        while True:
+            status = check(client.get(f'/api/documents/{document_id}/status', headers=headers))['data']
+            if status['processed'] or status['error']:
+                break
+            if time.perf_counter() - start > timeout:
+                raise RuntimeError(f"Document {document_id} not processed after {timeout}s")
+            time.sleep(0.01)
+        if status['error']:
+            raise RuntimeError(f"Ingestion failed: {status['error']}")
+        samples['ingestion'].append(time.perf_counter() - start)
+
+        conversation = check(client.post('/api/conversations', headers=headers,
+                                         json={'document_id': document_id}), 201)
+        conversation_id = conversation['data']['id']
+
+        for stage in ('query_cold', 'query_cached'):
+            for query in queries:
+                start = time.perf_counter()
+                answer = check(client.post('/api/chat/ai-response', headers=headers,
+                                           json={'conversation_id': conversation_id, 'message': query}))
+                samples[stage].append(time.perf_counter() - start)
+
+                # Store the exchange like the chat page does, so the message listing has content
+                for role, content in (('user', query), ('assistant', answer['data']['response'])):
+                    check(client.post(f'/api/conversation/{conversation_id}/message', headers=headers,
+                                      json={'role': role, 'content': content}), 201)
+
+        samples['messages'].append(timed(
+            client.get, f'/api/conversation/{conversation_id}/messages', headers=headers)[1])
+
+        # Deleting the last copy drops the index and cached answers, so the next round starts cold
+        check(client.delete(f'/api/documents/{document_id}', headers=headers))
+
+    return {'stages': {stage: summarize(samples[stage]) for stage in HTTP_STAGES}}
+
+
+def git_commit():
+    try:
+        return subprocess.check_output(['git', 'rev-parse', 'HEAD'], stderr=subprocess.DEVNULL,
+                                       text=True).strip()
+    except Exception:
+        return None
+
+
+def compare(results, baseline):
+    """Print the p50 of every stage next to the baseline run's"""
+    def index(run):
+        rows = {}
+        for item in run['results']:
+            prefix = f"{item['pages']}p x {item['words_per_page']}w {item['target']}"
+            for stage, stats in item['stages'].items():
+                rows[f"{prefix} {stage}"] = stats.get('p50_ms')
+        return rows
+
+    before = index(baseline)
+    print(f"\n{'p50 (ms)':<48}{'baseline':>12}{'current':>12}{'change':>10}")
+    for key, current in index(results).items():
+        previous = before.get(key)
+        change = f"{(current / previous - 1) * 100:+.1f}%" if previous and current is not None else '-'
+        print(f"{key:<48}{previous if previous is not None else '-':>12}{current:>12}{change:>10}")
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description='Benchmark PDF ingestion and querying on synthetic PDFs')
+    parser.add_argument('--pages', default='10,50', help='Comma-separated page counts (default: 10,50)')
+    parser.add_argument('--words-per-page', default='400', help='Comma-separated text densities (default: 400)')
+    parser.add_argument('--queries', type=int, default=20, help='Questions per document (default: 20)')
+    parser.add_argument('--repeat', type=int, default=3, help='Runs of each measurement (default: 3)')
+    parser.add_argument('--workers', type=int, default=None,
+                        help='PDF extraction processes (default: PDF_EXTRACT_WORKERS)')
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--targets', default='simple,enhanced,http',
+                        help='Comma-separated subset of simple,enhanced,http')
+    parser.add_argument('--database-uri', default=None, help='Database for the HTTP benchmark (default: temp SQLite)')
+    parser.add_argument('--output', default='benchmark-results.json', help='JSON results file')
+    parser.add_argument('--compare', default=None, help='Earlier results file to compare against')
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    page_counts = [int(n) for n in args.pages.split(',')]
+    densities = [int(n) for n in args.words_per_page.split(',')]
+    targets = args.targets.split(',')
+
+    from app.models import pdf_processor, pdf_processor_enhanced
+    processors = {
+        'simple': pdf_processor.PDFProcessor,
+        'enhanced': pdf_processor_enhanced.PDFProcessor
+    }
+
+    workdir = tempfile.mkdtemp(prefix='pdfchat-bench-')
+    app = create_benchmark_app(workdir, args.database_uri) if 'http' in targets else None
+    results = []
+
+    for page_count in page_counts:
+        for words_per_page in densities:
+            pdf_path = os.path.join(workdir, f"synthetic-{page_count}p-{words_per_page}w.pdf")
+            pages = write_synthetic_pdf(pdf_path, page_count, words_per_page, args.seed)
+            queries = make_queries(pages, args.queries, args.seed)
+            case = {'pages': page_count, 'words_per_page': words_per_page,
+                    'file_bytes': os.path.getsize(pdf_path)}
+
+            for target in targets:
+                print(f"Benchmarking {target}: {page_count} pages x {words_per_page} words", file=sys.stderr)
+                if target == 'http':
+                    result = bench_http(app, pdf_path, queries, args.repeat)
+                else:
+                    result = bench_processor(target, processors[target], pdf_path, queries,
+                                             args.repeat, args.workers)
+                results.append(dict(case, target=target, **result))
+
+    output = {
+        'meta': {
+            'timestamp': datetime.now(timezone.utc).isoformat(),
+            'git_commit': git_commit(),
+            'python': platform.python_version(),
+            'platform': platform.platform(),
+            'cpu_count': os.cpu_count(),
+            'langchain_available': pdf_processor.LANGCHAIN_AVAILABLE,
+            'embedding_backend': os.environ['EMBEDDING_BACKEND'],
+            'args': vars(args)
+        },
+        'results': results
+    }
+    with open(args.output, 'w') as f:
+        json.dump(output, f, indent=2)
+    print(f"Results written to {args.output}", file=sys.stderr)
+
+    if args.compare:
+        with open(args.compare) as f:
+            compare(output, json.load(f))
+    return output
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,127 @@
+"""
+Deterministic synthetic PDFs for the benchmarks.
+
+Pages are filled with pseudo-random sentences drawn from a fixed vocabulary,
+so runs with the same seed extract to exactly the same text. The file is
+written by hand (one Helvetica text block per page) to avoid depending on a
+PDF writing library; PyPDF2 extracts it like any other text PDF.
+"""
+import random
+
+VOCABULARY = (
+    'invoice payment deadline contract supplier customer delivery warranty service agreement '
+    'report quarter revenue budget forecast expense policy employee training safety procedure '
+    'network server database backup security access password account license software update '
+    'project milestone schedule resource risk review approval manager team meeting summary '
+    'product quality inspection shipment warehouse inventory order return refund discount price '
+    'research analysis method sample result conclusion evidence model data measurement error '
+    'energy solar battery voltage current circuit sensor signal frequency power efficiency '
+    'health patient treatment clinic doctor nurse dosage symptom diagnosis therapy recovery'
+).split()
+
+FILLER = 'the a of and to in for with on by is are was be this that from at as'.split()
+
+LINE_LENGTH = 90  # Characters per text line; dense pages run past the bottom margin, which extraction ignores
+
+
+def make_sentence(rng):
+    words = []
+    for _ in range(rng.randint(8, 18)):
+        words.append(rng.choice(FILLER) if rng.random() < 0.35 else rng.choice(VOCABULARY))
+    return words[0].capitalize() + ' ' + ' '.join(words[1:]) + '.'
+
+
+def make_page_text(rng, words_per_page):
+    """Sentences adding up to about words_per_page words"""
+    sentences = []
+    count = 0
+    while count < words_per_page:
+        sentence = make_sentence(rng)
+        sentences.append(sentence)
+        count += len(sentence.split())
+    return ' '.join(sentences)
+
+
+def make_pages(page_count, words_per_page, seed=0):
+    rng = random.Random(seed)
+    return [make_page_text(rng, words_per_page) for _ in range(page_count)]
+
+
+def wrap_lines(text, width=LINE_LENGTH):
+    lines = []
+    line = ''
+    for word in text.split():
+        if line and len(line) + len(word) + 1 > width:
+            lines.append(line)
+            line = word
+        else:
+            line = f"{line} {word}" if line else word
+    if line:
+        lines.append(line)
+    return lines
+
+
+def pdf_string(text):
+    return '(' + text.replace('\\', '\\\\').replace('(', '\\(').replace(')', '\\)') + ')'
+
+
+def build_pdf(pages):
+    """Return the bytes of a PDF with one page per text in pages"""
+    objects = []
+
+    def add(obj):
+        objects.append(obj)
+        return len(objects)
+
+    font_id = add(b'<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica >>')
+    # Each page adds a content stream and a page object; the page tree comes right after them
+    pages_id = font_id + 2 * len(pages) + 1
+    page_ids = []
+
+    for text in pages:
+        lines = wrap_lines(text)
+        operators = ' '.join(f"{pdf_string(line)} '" for line in lines)
+        stream = f"BT /F1 9 Tf 12 TL 40 760 Td {operators} ET".encode('latin-1')
+        content_id = add(b'<< /Length %d >>\nstream\n' % len(stream) + stream + b'\nendstream')
+        page_ids.append(add(
+            b'<< /Type /Page /Parent %d 0 R /MediaBox [0 0 612 792] /Contents %d 0 R '
+            b'/Resources << /Font << /F1 %d 0 R >> >> >>' % (pages_id, content_id, font_id)))
+
+    kids = b' '.join(b'%d 0 R' % page_id for page_id in page_ids)
+    add(b'<< /Type /Pages /Kids [%s] /Count %d >>' % (kids, len(page_ids)))
+    catalog_id = add(b'<< /Type /Catalog /Pages %d 0 R >>' % pages_id)
+
+    output = bytearray(b'%PDF-1.4\n')
+    offsets = []
+    for number, obj in enumerate(objects, 1):
+        offsets.append(len(output))
+        output += b'%d 0 obj\n' % number + obj + b'\nendobj\n'
+
+    xref_offset = len(output)
+    output += b'xref\n0 %d\n0000000000 65535 f \n' % (len(objects) + 1)
+    output += b''.join(b'%010d 00000 n \n' % offset for offset in offsets)
+    output += b'trailer\n<< /Size %d /Root %d 0 R >>\nstartxref\n%d\n%%%%EOF\n' % (
+        len(objects) + 1, catalog_id, xref_offset)
+    return bytes(output)
+
+
+def write_synthetic_pdf(path, page_count, words_per_page=400, seed=0):
+    """Write a synthetic PDF and return the page texts it contains"""
+    pages = make_pages(page_count, words_per_page, seed)
+    with open(path, 'wb') as f:
+        f.write(build_pdf(pages))
+    return pages
+
+
+def make_queries(pages, count, seed=0):
+    """Questions built from phrases that occur in the document, plus a few that match nothing"""
+    rng = random.Random(seed + 1)
+    queries = []
+    for i in range(count):
+        if i % 5 == 4:
+            queries.append('What does the document say about zebras and volcanoes?')
+            continue
+        words = [w.strip('.').lower() for w in rng.choice(pages).split() if w.strip('.').lower() in VOCABULARY]
+        start = rng.randrange(max(1, len(words) - 3))
+        queries.append('What is the ' + ' '.join(words[start:start + 3]) + '?')
+    return queries
@@ -29,8 +29,57 @@ class Config(object):
     JWT_REFRESH_TOKEN_EXPIRES = 60 * 60 * 24 * 30  # 30 days
     
     # Uploads
-    UPLOAD_FOLDER = os.path.join(basedir, 'app/static/uploads')
+    # Uploaded PDFs; served only through /api/documents/<id>/file to their owner, never as static files
+    UPLOAD_FOLDER = os.path.join(basedir, 'instance', 'uploads')
     MAX_CONTENT_LENGTH = 16 * 1024 * 1024  # 16MB max upload size
+    BATCH_MAX_CONTENT_LENGTH = int(os.environ.get('BATCH_MAX_CONTENT_LENGTH', 512 * 1024 * 1024))  # Request size for /api/documents/batch
+    BATCH_MAX_FILES = int(os.environ.get('BATCH_MAX_FILES', 200))  # PDFs per batch, counting zip members
+    # Persisted document indexes; kept out of the static folder, which Flask serves to anyone
+    INDEX_FOLDER = os.environ.get('INDEX_FOLDER', os.path.join(basedir, 'instance', 'indexes'))
+
+    # Background ingestion
+    INGESTION_WORKERS = int(os.environ.get('INGESTION_WORKERS', 2))
+    INGESTION_STALE_SECONDS = int(os.environ.get('INGESTION_STALE_SECONDS', 30 * 60))  # Requeue jobs abandoned by a dead worker
+    INGESTION_SWEEP_SECONDS = int(os.environ.get('INGESTION_SWEEP_SECONDS', 5 * 60))  # How often servers look for abandoned jobs; 0 only recovers at start
+    INGESTION_RECOVER_ON_START = os.environ.get('INGESTION_RECOVER_ON_START', 'false').lower() in ['true', 'on', '1']  # Also recover in create_app (CLI, scripts); server.py and asgi.py always do
+
+    # Async serving (asgi.py)
+    ASYNC_DB_POOL_SIZE = int(os.environ.get('ASYNC_DB_POOL_SIZE', 10))
+    ASGI_WSGI_THREADS = int(os.environ.get('ASGI_WSGI_THREADS', 10))  # Threads serving the Flask routes under ASGI
+    
+    # Loaded AI sessions kept in memory per worker (least recently used are evicted)
+    SESSION_CACHE_MAX_BYTES = int(os.environ.get('SESSION_CACHE_MAX_BYTES', 256 * 1024 * 1024))
+    SESSION_CACHE_TTL_SECONDS = int(os.environ.get('SESSION_CACHE_TTL_SECONDS', 60 * 60))
+    
+    # Answers to repeated questions, per document (per worker)
+    ANSWER_CACHE_MAX_ENTRIES = int(os.environ.get('ANSWER_CACHE_MAX_ENTRIES', 5000))
+    ANSWER_CACHE_TTL_SECONDS = int(os.environ.get('ANSWER_CACHE_TTL_SECONDS', 24 * 60 * 60))
+    SEMANTIC_CACHE_ENABLED = os.environ.get('SEMANTIC_CACHE_ENABLED', 'false').lower() in ['true', 'on', '1']
+    SEMANTIC_CACHE_EMBEDDER = os.environ.get('SEMANTIC_CACHE_EMBEDDER', 'model')  # 'model' (embedding backend); 'hashing' is for tests only
+    SEMANTIC_CACHE_THRESHOLD = float(os.environ.get('SEMANTIC_CACHE_THRESHOLD', 0.9))  # Cosine similarity for a match
+    SEMANTIC_CACHE_MAX_ENTRIES = int(os.environ.get('SEMANTIC_CACHE_MAX_ENTRIES', 256))  # Questions kept per document
+    
+    # Embeddings: 'auto' (OpenAI with an API key, else hashing), 'openai', 'hashing' (local, no model),
+    # 'huggingface' (local CPU model, needs sentence-transformers) or 'fake' for offline development
+    EMBEDDING_BACKEND = os.environ.get('EMBEDDING_BACKEND', 'auto')
+    HASHING_EMBEDDING_SIZE = int(os.environ.get('HASHING_EMBEDDING_SIZE', 768))
+    LOCAL_EMBEDDING_MODEL = os.environ.get('LOCAL_EMBEDDING_MODEL', 'sentence-transformers/all-MiniLM-L6-v2')
+    EMBEDDING_MODEL = os.environ.get('EMBEDDING_MODEL', 'text-embedding-ada-002')
+    EMBEDDING_API_BASE = os.environ.get('OPENAI_API_BASE')  # Point at a compatible server or a local stub
+    EMBEDDING_BATCH_TOKENS = int(os.environ.get('EMBEDDING_BATCH_TOKENS', 8000))  # Tokens per embeddings request
+    EMBEDDING_MAX_CONCURRENCY = int(os.environ.get('EMBEDDING_MAX_CONCURRENCY', 4))  # Requests in flight per process
+    EMBEDDING_CACHE_ENABLED = os.environ.get('EMBEDDING_CACHE_ENABLED', 'true').lower() in ['true', 'on', '1']
+    # Holds every user's chunk embeddings; must not live under the static folder
+    EMBEDDING_CACHE_PATH = os.environ.get('EMBEDDING_CACHE_PATH', os.path.join(basedir, 'instance', 'embeddings.sqlite3'))
+    EMBEDDING_CACHE_MAX_BYTES = int(os.environ.get('EMBEDDING_CACHE_MAX_BYTES', 512 * 1024 * 1024))  # LRU eviction above this
+    
+    # Logging: JSON lines (or 'text') written by a background thread; DEBUG adds per-request detail
+    LOG_LEVEL = os.environ.get('LOG_LEVEL', 'INFO').upper()
+    LOG_FORMAT = os.environ.get('LOG_FORMAT', 'json')
+    RAW_CHUNK_DIAGNOSTICS_SAMPLE_RATE = float(os.environ.get('RAW_CHUNK_DIAGNOSTICS_SAMPLE_RATE', 0.0))  # Share of answers checked for raw chunk text
+    
+    # Stage timing histograms and /api/metrics (Prometheus); off costs nothing
+    METRICS_ENABLED = os.environ.get('METRICS_ENABLED', 'false').lower() in ['true', 'on', '1']
     
     # Email settings for password reset
     MAIL_SERVER = os.environ.get('MAIL_SERVER', 'smtp.gmail.com')
@@ -0,0 +1,26 @@
+"""add batch_id to documents
+
+Revision ID: a3c7e9f1b5d2
+Revises: f5b1d8e3a6c2
+Create Date: 2026-10-18 15:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'a3c7e9f1b5d2'
+down_revision = 'f5b1d8e3a6c2'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.add_column('documents', sa.Column('batch_id', sa.String(length=36), nullable=True))
+    op.create_index('ix_documents_batch_id', 'documents', ['batch_id'], unique=False)
+
+
+def downgrade():
+    op.drop_index('ix_documents_batch_id', table_name='documents')
+    op.drop_column('documents', 'batch_id')
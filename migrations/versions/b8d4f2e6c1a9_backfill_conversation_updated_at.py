@@ -0,0 +1,39 @@
+"""backfill conversations.updated_at and make it NOT NULL
+
+Revision ID: b8d4f2e6c1a9
+Revises: a3c7e9f1b5d2
+Create Date: 2026-10-18 18:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'b8d4f2e6c1a9'
+down_revision = 'a3c7e9f1b5d2'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # updated_at sorts the conversation listing; NULL rows fell out of keyset pages.
+    # Use the last message, else the creation time
+    op.execute("""
+        UPDATE conversations
+        SET updated_at = COALESCE(
+            (SELECT MAX(messages.created_at) FROM messages WHERE messages.conversation_id = conversations.id),
+            created_at,
+            CURRENT_TIMESTAMP)
+        WHERE updated_at IS NULL
+    """)
+    op.execute("UPDATE conversations SET created_at = updated_at WHERE created_at IS NULL")
+    with op.batch_alter_table('conversations', schema=None) as batch_op:
+        batch_op.alter_column('updated_at', existing_type=sa.DateTime(), nullable=False)
+        batch_op.alter_column('created_at', existing_type=sa.DateTime(), nullable=False)
+
+
+def downgrade():
+    with op.batch_alter_table('conversations', schema=None) as batch_op:
+        batch_op.alter_column('created_at', existing_type=sa.DateTime(), nullable=True)
+        batch_op.alter_column('updated_at', existing_type=sa.DateTime(), nullable=True)
@@ -0,0 +1,33 @@
+"""add document processing status
+
+Revision ID: c4e8a1f2d9b3
+Revises: b53d5591f374
+Create Date: 2026-10-18 10:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'c4e8a1f2d9b3'
+down_revision = 'b53d5591f374'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.add_column('documents', sa.Column('status', sa.String(length=20), nullable=False, server_default='pending'))
+    op.add_column('documents', sa.Column('progress', sa.Integer(), nullable=False, server_default=sa.text('0')))
+    op.add_column('documents', sa.Column('processing_error', sa.Text(), nullable=True))
+    op.add_column('documents', sa.Column('status_updated_at', sa.DateTime(), nullable=True))
+
+    # Documents processed before the queue existed are ready to chat
+    op.execute("UPDATE documents SET status = 'ready', progress = 100 WHERE processed = 1")
+
+
+def downgrade():
+    op.drop_column('documents', 'status_updated_at')
+    op.drop_column('documents', 'processing_error')
+    op.drop_column('documents', 'progress')
+    op.drop_column('documents', 'status')
@@ -0,0 +1,26 @@
+"""add document content hash
+
+Revision ID: d7f3b2a9e1c4
+Revises: c4e8a1f2d9b3
+Create Date: 2026-10-18 11:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'd7f3b2a9e1c4'
+down_revision = 'c4e8a1f2d9b3'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.add_column('documents', sa.Column('content_hash', sa.String(length=64), nullable=True))
+    op.create_index('ix_documents_content_hash', 'documents', ['content_hash'], unique=False)
+
+
+def downgrade():
+    op.drop_index('ix_documents_content_hash', table_name='documents')
+    op.drop_column('documents', 'content_hash')
@@ -0,0 +1,38 @@
+"""add indexes for hot lookup paths
+
+Revision ID: e2a6c9d4f871
+Revises: d7f3b2a9e1c4
+Create Date: 2026-10-18 12:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'e2a6c9d4f871'
+down_revision = 'd7f3b2a9e1c4'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # Document listing: user_id filter ordered by (upload_date, id) for keyset pages
+    op.create_index('ix_documents_user_id_upload_date', 'documents', ['user_id', 'upload_date', 'id'], unique=False)
+    op.create_index('ix_documents_session_id', 'documents', ['session_id'], unique=False)
+    # Ingestion queue recovery and queue depth metrics
+    op.create_index('ix_documents_status', 'documents', ['status'], unique=False)
+    # Conversation listing, most recently active first
+    op.create_index('ix_conversations_user_id_updated_at', 'conversations', ['user_id', 'updated_at', 'id'], unique=False)
+    op.create_index('ix_conversations_document_id', 'conversations', ['document_id'], unique=False)
+    # Message history in (created_at, id) order
+    op.create_index('ix_messages_conversation_id_created_at', 'messages', ['conversation_id', 'created_at', 'id'], unique=False)
+
+
+def downgrade():
+    op.drop_index('ix_messages_conversation_id_created_at', table_name='messages')
+    op.drop_index('ix_conversations_document_id', table_name='conversations')
+    op.drop_index('ix_conversations_user_id_updated_at', table_name='conversations')
+    op.drop_index('ix_documents_status', table_name='documents')
+    op.drop_index('ix_documents_session_id', table_name='documents')
+    op.drop_index('ix_documents_user_id_upload_date', table_name='documents')
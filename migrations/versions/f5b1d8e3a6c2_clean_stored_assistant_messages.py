@@ -0,0 +1,69 @@
+"""clean stored assistant messages
+
+Revision ID: f5b1d8e3a6c2
+Revises: e2a6c9d4f871
+Create Date: 2026-10-18 13:00:00.000000
+
+"""
+import re
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'f5b1d8e3a6c2'
+down_revision = 'e2a6c9d4f871'
+branch_labels = None
+depends_on = None
+
+BATCH_SIZE = 500
+
+messages = sa.table(
+    'messages',
+    sa.column('id', sa.BigInteger),
+    sa.column('role', sa.String),
+    sa.column('content', sa.Text)
+)
+
+
+def clean_message_text(text):
+    """
+    PDFProcessor.clean_chunk_text as of this revision, copied so the migration
+    does not change when the application code does
+    """
+    text = re.sub(r'page_content[:\s]*[\'"]?', '', text, flags=re.IGNORECASE)
+    text = re.sub(r'metadata[:\s]*\{[^}]*\}', '', text, flags=re.IGNORECASE)
+    text = re.sub(r'source[:\s]*[\'"][^\'"]*[\'"]', '', text, flags=re.IGNORECASE)
+    text = re.sub(r'^\s*\d+\s*\n', '', text)
+    text = re.sub(r'\n\s*\d+\s*$', '', text)
+    text = re.sub(r'\n\s*\n\s*\n+', '\n\n', text)
+    text = re.sub(r'\s+', ' ', text)
+    text = text.strip('\'"[]{}()')
+    return text.strip()
+
+
+def upgrade():
+    # Assistant messages are now cleaned once when stored instead of on every read;
+    # clean the ones stored raw by older versions
+    connection = op.get_bind()
+    last_id = 0
+    while True:
+        rows = connection.execute(
+            sa.select(messages.c.id, messages.c.content)
+            .where(messages.c.role == 'assistant', messages.c.id > last_id)
+            .order_by(messages.c.id)
+            .limit(BATCH_SIZE)
+        ).all()
+        if not rows:
+            break
+        for message_id, content in rows:
+            cleaned = clean_message_text(content)
+            if cleaned != content:
+                connection.execute(messages.update().where(messages.c.id == message_id).values(content=cleaned))
+        last_id = rows[-1].id
+
+
+def downgrade():
+    # The raw text is gone; cleaned messages read the same under the old code
+    pass
@@ -1,7 +1,10 @@
 from app import create_app
+from app.models.ingestion_queue import ingestion_queue
 import os
 
 app = create_app()
+# Pick up jobs left queued or abandoned by a previous server process
+ingestion_queue.recover_on_start()
 
 if __name__ == '__main__':
     try:
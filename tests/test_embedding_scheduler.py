@@ -0,0 +1,129 @@
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from types import SimpleNamespace
+
+import pytest
+
+from app.models import embedding_scheduler
+from app.models.embedding_cache import get_embedder
+
+RETRY_AFTER = 0.3
+BATCH_TOKENS = 40
+RESPONSE_SECONDS = 0.05  # Successful responses take a while, the 429 comes back at once
+
+
+class StubEmbeddingsServer(ThreadingHTTPServer):
+    """Local stand-in for the OpenAI /embeddings endpoint; rate limits the first request"""
+
+    def __init__(self):
+        super().__init__(('127.0.0.1', 0), StubEmbeddingsHandler)
+        self.requests = []  # (received_at, headers, body, status)
+        self.lock = threading.Lock()
+
+    @property
+    def url(self):
+        return f"http://127.0.0.1:{self.server_address[1]}/v1"
+
+
+class StubEmbeddingsHandler(BaseHTTPRequestHandler):
+
+    def do_POST(self):
+        body = json.loads(self.rfile.read(int(self.headers['Content-Length'])))
+        with self.server.lock:
+            status = 429 if not self.server.requests else 200
+            self.server.requests.append((time.monotonic(), dict(self.headers), body, status))
+
+        if status == 429:
+            self.send_response(429)
+            self.send_header('Retry-After', str(RETRY_AFTER))
+            self.end_headers()
+            self.wfile.write(b'{"error": {"message": "Rate limit reached"}}')
+            return
+
+        time.sleep(RESPONSE_SECONDS)
+        # Each vector encodes its text's number; sent in reverse to check the client reorders by index
+        data = [{'index': index, 'embedding': [float(text.split()[1]), 1.0]}
+                for index, text in enumerate(body['input'])]
+        payload = json.dumps({'data': data[::-1]}).encode('utf-8')
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(payload)))
+        self.end_headers()
+        self.wfile.write(payload)
+
+    def log_message(self, format, *args):
+        pass
+
+
+@pytest.fixture
+def stub_server():
+    server = StubEmbeddingsServer()
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield server
+    server.shutdown()
+    server.server_close()
+
+
+@pytest.fixture
+def embedder(stub_server, monkeypatch):
+    monkeypatch.setenv('OPENAI_API_KEY', 'test-key')
+    monkeypatch.setenv('OPENAI_API_BASE', stub_server.url)
+    monkeypatch.setattr(embedding_scheduler, '_scheduler', None)
+    app = SimpleNamespace(config={
+        'EMBEDDING_BACKEND': 'openai',
+        'EMBEDDING_CACHE_ENABLED': False,
+        'EMBEDDING_MODEL': 'stub-embedding-model',
+        'EMBEDDING_BATCH_TOKENS': BATCH_TOKENS,
+        'EMBEDDING_MAX_CONCURRENCY': 2
+    })
+    return get_embedder(app)
+
+
+def make_texts():
+    # Uneven lengths, so batches hold different numbers of texts
+    return [f"chunk {i} " + 'word ' * (i % 7) * 3 for i in range(40)]
+
+
+def test_batches_follow_the_token_budget_and_keep_input_order(embedder, stub_server):
+    texts = make_texts()
+
+    vectors = embedder.embed_documents(texts)
+
+    assert [vector[0] for vector in vectors] == [float(i) for i in range(len(texts))]
+
+    count_tokens = embedder.scheduler.count_tokens
+    batches = [body['input'] for _, _, body, status in stub_server.requests if status == 200]
+    assert len(batches) > 1
+    # Every text was sent exactly once by a successful request
+    assert sorted(text for batch in batches for text in batch) == sorted(texts)
+    for batch in batches:
+        assert sum(count_tokens(text) for text in batch) <= BATCH_TOKENS
+        # Packed greedily: the text after a batch would not have fit in it
+        following = texts.index(batch[-1]) + 1
+        if following < len(texts):
+            assert sum(count_tokens(text) for text in batch) + count_tokens(texts[following]) > BATCH_TOKENS
+
+    for _, headers, body, _ in stub_server.requests:
+        assert headers['Authorization'] == 'Bearer test-key'
+        assert body['model'] == 'stub-embedding-model'
+
+
+def test_rate_limited_batch_is_retried_after_retry_after(embedder, stub_server):
+    texts = make_texts()
+
+    embedder.embed_documents(texts)
+
+    limited_at, _, limited_body, _ = stub_server.requests[0]
+    retries = [received_at for received_at, _, body, status in stub_server.requests[1:]
+               if body['input'] == limited_body['input']]
+    assert len(retries) == 1
+    assert retries[0] - limited_at >= RETRY_AFTER
+
+    # Every sender waited out the backoff; only the batch already in flight beside the limited one got through
+    assert embedder.scheduler.stats()['throttled'] == 1
+    during_backoff = [received_at for received_at, _, _, _ in stub_server.requests[1:]
+                      if received_at - limited_at < RETRY_AFTER]
+    assert len(during_backoff) <= 1
@@ -0,0 +1,124 @@
+"""
+Query plans of the hot API endpoints.
+
+Calls each endpoint through the Flask test client against a throwaway
+SQLite database, records every SQL statement it runs, and asks SQLite for
+the plan of each one (EXPLAIN QUERY PLAN). No statement may read a whole
+table or sort its rows instead of walking an index.
+
+SQLite plans without table statistics as if tables were large, so the
+plans are meaningful on the nearly empty database the test creates. They
+come from a database created from the models, so indexes added to a
+migration must also be declared on the model.
+"""
+import re
+import time
+from datetime import datetime, timezone
+
+from benchmarks.run_benchmarks import create_benchmark_app, check
+
+# Plan details that mean work proportional to the table size: walking a whole table
+# (or a whole index of it) instead of searching, or sorting rows an index could deliver in order
+FULL_SCAN = re.compile(r'^SCAN (?!CONSTANT ROW)')
+TEMP_SORT = re.compile(r'USE TEMP B-TREE FOR ORDER BY')
+
+
+def seed(app, client):
+    """A user with a document, a conversation and a few messages; returns auth headers and ids"""
+    from app import db
+    from app.models.documents import Document
+
+    email = f"plans-{time.time_ns()}@example.com"
+    check(client.post('/api/auth/register', json={'first_name': 'Query', 'last_name': 'Plan',
+                                                  'email': email, 'password': 'queryplan'}), 201)
+    login = check(client.post('/api/auth/login', json={'email': email, 'password': 'queryplan'}))
+    headers = {'Authorization': 'Bearer ' + login['data']['access_token']}
+    user_id = check(client.get('/api/auth/profile', headers=headers))['data']['user']['id']
+
+    with app.app_context():
+        document = Document(user_id=user_id, filename='plan.pdf', original_filename='plan.pdf',
+                            file_path='/nonexistent/plan.pdf', file_size=1, status='ready', processed=True,
+                            session_id=f"plan-{time.time_ns()}", batch_id='plan-batch',
+                            upload_date=datetime.now(timezone.utc))
+        db.session.add(document)
+        db.session.commit()
+        document_id = document.id
+
+    conversation_id = check(client.post('/api/conversations', headers=headers,
+                                        json={'document_id': document_id}), 201)['data']['id']
+    for role in ('user', 'assistant'):
+        check(client.post(f'/api/conversation/{conversation_id}/message', headers=headers,
+                          json={'role': role, 'content': f'{role} message'}), 201)
+    return headers, document_id, conversation_id
+
+
+def hot_requests(document_id, conversation_id):
+    """(method, path, json) of the endpoints every page load or chat message goes through"""
+    cursor = f"{datetime(2100, 1, 1).isoformat()},999999"
+    return [
+        ('GET', '/api/auth/profile', None),
+        ('GET', '/api/documents', None),
+        ('GET', f'/api/documents?limit=20&after={cursor}', None),
+        ('GET', f'/api/documents/{document_id}', None),
+        ('GET', f'/api/documents/{document_id}/status', None),
+        ('GET', '/api/documents/batch/plan-batch', None),
+        ('GET', '/api/conversations', None),
+        ('GET', f'/api/conversations?limit=20&after={cursor}', None),
+        ('GET', f'/api/conversations/{document_id}', None),
+        ('GET', f'/api/conversation/{conversation_id}/messages', None),
+        ('GET', f'/api/conversation/{conversation_id}/messages?limit=50&after=2000-01-01T00:00:00,0', None),
+        ('GET', f'/api/conversation/{conversation_id}/messages?limit=30&before=', None),
+        ('GET', f'/api/conversation/{conversation_id}/messages?limit=30&before={cursor}', None),
+        ('POST', f'/api/conversation/{conversation_id}/message', {'role': 'user', 'content': 'hello'}),
+        ('POST', '/api/messages', {'conversation_id': conversation_id, 'role': 'user', 'content': 'hello'}),
+        ('DELETE', f'/api/documents/{document_id}', None),
+    ]
+
+
+def capture_statements(engine, func):
+    """Run func and return the (statement, parameters) of the SELECT/UPDATE/DELETE statements it executed"""
+    from sqlalchemy import event
+
+    statements = []
+
+    def record(conn, cursor, statement, parameters, context, executemany):
+        if statement.lstrip().split(None, 1)[0].upper() in ('SELECT', 'UPDATE', 'DELETE'):
+            statements.append((statement, parameters))
+
+    event.listen(engine, 'before_cursor_execute', record)
+    try:
+        func()
+    finally:
+        event.remove(engine, 'before_cursor_execute', record)
+    return statements
+
+
+def query_plan(engine, statement, parameters):
+    with engine.connect() as conn:
+        return [row[-1] for row in conn.exec_driver_sql('EXPLAIN QUERY PLAN ' + statement, parameters)]
+
+
+def check_plans(app):
+    """Return the list of (request, statement, plan) that scan a table or sort without an index"""
+    from app import db
+
+    client = app.test_client()
+    headers, document_id, conversation_id = seed(app, client)
+    with app.app_context():
+        engine = db.engine
+
+    problems = []
+    for method, path, body in hot_requests(document_id, conversation_id):
+        statements = capture_statements(engine, lambda: check(
+            client.open(path, method=method, headers=headers, json=body), 201 if method == 'POST' else 200))
+        for statement, parameters in statements:
+            plan = query_plan(engine, statement, parameters)
+            if any(FULL_SCAN.search(step) or TEMP_SORT.search(step) for step in plan):
+                problems.append((f"{method} {path}", ' '.join(statement.split()), plan))
+    return problems
+
+
+def test_hot_endpoint_queries_use_indexes(tmp_path):
+    app = create_benchmark_app(str(tmp_path))
+
+    assert check_plans(app) == []
@@ -0,0 +1,85 @@
+from types import SimpleNamespace
+
+import pytest
+
+from app.models.embedding_cache import HashingEmbeddings
+from app.models.semantic_cache import SemanticCache
+
+DOCUMENT = 'document-hash'
+
+NEAR_MISSES = [
+    ("What is the deadline for phase 1?", "What is the deadline for phase 2?"),
+    ("What is the penalty for late payment in 2023?", "What is the penalty for late payment in 2024?"),
+    ("Is smoking allowed in the building?", "Is smoking not allowed in the building?"),
+    ("Can employees work remotely?", "Can't employees work remotely?"),
+]
+
+
+def make_cache(threshold=0.9):
+    return SemanticCache(embedder=HashingEmbeddings(), threshold=threshold)
+
+
+@pytest.mark.parametrize('cached_question, question', NEAR_MISSES)
+def test_questions_differing_by_a_number_or_negation_do_not_match(cached_question, question):
+    cache = make_cache()
+    cache.add(DOCUMENT, cached_question, 'cached answer')
+
+    # The embeddings alone would call these the same question
+    assert float(cache.embed(cached_question) @ cache.embed(question)) >= cache.threshold
+    assert cache.get(DOCUMENT, question) is None
+
+
+def test_same_question_still_matches():
+    cache = make_cache()
+    cache.add(DOCUMENT, "What is the deadline for phase 1?", 'cached answer')
+
+    match = cache.get(DOCUMENT, "what is the deadline for phase 1")
+    assert match is not None
+    assert match['answer'] == 'cached answer'
+
+
+def test_match_skips_a_closer_entry_with_other_numbers():
+    cache = make_cache(threshold=0.8)
+    cache.add(DOCUMENT, "What is the deadline for phase 2?", 'phase 2 answer')
+    cache.add(DOCUMENT, "The deadline for phase 1?", 'phase 1 answer')
+
+    assert cache.get(DOCUMENT, "What is the deadline for phase 1?")['answer'] == 'phase 1 answer'
+
+
+def test_answers_from_a_rebuilt_index_do_not_match():
+    cache = make_cache()
+    cache.add(DOCUMENT, "What is the deadline for phase 1?", 'old answer', version='2026-01-01T00:00:00')
+
+    # Another worker rebuilt the index, so its manifest has a new creation time
+    assert cache.get(DOCUMENT, "What is the deadline for phase 1?", version='2026-02-01T00:00:00') is None
+    assert cache.get(DOCUMENT, "What is the deadline for phase 1?", version='2026-01-01T00:00:00') is None
+
+
+def test_a_miss_embeds_the_question_once():
+    cache = make_cache()
+    calls = []
+    embed_query = cache.embedder.embed_query
+    cache.embedder.embed_query = lambda text: calls.append(text) or embed_query(text)
+
+    vector = cache.embed_question("What is the deadline for phase 1?")
+    assert cache.get(DOCUMENT, "What is the deadline for phase 1?", vector=vector) is None
+    cache.add(DOCUMENT, "What is the deadline for phase 1?", 'cached answer', vector=vector)
+
+    assert len(calls) == 1
+    assert cache.get(DOCUMENT, "What is the deadline for phase 1?")['answer'] == 'cached answer'
+
+
+def test_disabled_by_default():
+    cache = SemanticCache()
+    cache.init_app(SimpleNamespace(config={}))
+
+    assert not cache.enabled
+    assert cache.get(DOCUMENT, "What is the deadline for phase 1?") is None
+
+
+def test_model_embedder_backed_by_word_hashing_stays_off():
+    cache = SemanticCache()
+    cache.init_app(SimpleNamespace(config={'SEMANTIC_CACHE_ENABLED': True, 'EMBEDDING_BACKEND': 'hashing'}))
+
+    assert not cache.enabled
+    assert cache.embedder is None